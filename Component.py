@@ -10,7 +10,6 @@ import math
 import os
 
 import numpy as np
-from PIL import Image
 
 import GLBuffer
 from Material import Material
@@ -20,6 +19,10 @@ from Displayable import Displayable
 from Quaternion import Quaternion
 from GLUtility import GLUtility
 from GLBuffer import Texture
+from InstanceGroup import InstanceGroup
+from MemoryBudget import MemoryBudget
+from MeshArena import MeshArena
+from TextureCache import TextureCache
 
 try:
     import OpenGL
@@ -81,6 +84,8 @@ class Component:
     postRotationMat = None
 
     texture = None
+    virtualTexture = None  # VirtualTexture sampled instead of texture when set
+    instanceGroup = None  # InstanceGroup drawn instead of the Displayable alone, see setInstances
     textureOn = False
     material = None
     renderingRouting = None
@@ -144,10 +149,14 @@ class Component:
 
     def clear(self):
         """
-        remove all children and destroy them
+        remove all children and destroy them, their shared meshes are released and their textures freed
         """
-        for c in self.children:
+        for c in list(self.children):
             c.clear()
+            if isinstance(c.displayObj, Displayable):
+                c.displayObj.release()
+            TextureCache.release(c.texture)
+            c.clearInstances()
             self.children.remove(c)
             del c
 
@@ -168,24 +177,66 @@ class Component:
         self.update()
 
     def draw(self, shaderProg):
+        """
+        Draw this Component and its children. When MeshArena is active, Displayables drawing a shared mesh are only
+        submitted, call MeshArena.flush(shaderProg) after the top level Component is drawn.
+        """
         if isinstance(self.displayObj, Displayable):
-            shaderProg.setMat4("modelMat", self.transformationMat)
-            shaderProg.setVec4("diffuse", self.material.diffuse)
-            shaderProg.setVec4("specular", self.material.specular)
-            shaderProg.setVec4("ambient", self.material.ambient)
-            shaderProg.setFloat("highlight", self.material.highLight)
-            shaderProg.setFragmentShaderRouting(self.renderingRouting)
-            if self.textureOn:
-                shaderProg.use()
-                self.texture.bind(shaderProg.getUniformLocation("textureImage"))
+            modelMat = self.displayObj.modelMatrix(self.transformationMat)
+            self.displayObj.selectLod(modelMat)
+            if self.instanceGroup is not None:
+                self.useMesh()
+                self.applyDrawState(shaderProg)
+                self.instanceGroup.draw(shaderProg, self.displayObj, self.transformationMat)
+            elif MeshArena.active() and self.displayObj.batchable():
+                MeshArena.submit(shaderProg, self.displayObj.mesh, self.displayObj.vertexLayout,
+                                 MeshArena.drawRow(modelMat, self.displayObj.meshColor, self.material),
+                                 self.drawState(), self.applyDrawState)
             else:
-                shaderProg.use()
-                self.texture.unbind(shaderProg.getUniformLocation("textureImage"))
-            self.displayObj.draw()
+                self.useMesh()
+                shaderProg.setMat4("modelMat", modelMat)
+                shaderProg.setVec3("meshColor", self.displayObj.meshColor)
+                shaderProg.setVec4("diffuse", self.material.diffuse)
+                shaderProg.setVec4("specular", self.material.specular)
+                shaderProg.setVec4("ambient", self.material.ambient)
+                shaderProg.setFloat("highlight", self.material.highLight)
+                self.applyDrawState(shaderProg)
+                self.displayObj.draw()
 
         for c in self.children:
             c.draw(shaderProg)
 
+    def useMesh(self):
+        """
+        Tell MemoryBudget the buffers of the mesh are drawn from, not needed for draws from a MeshArena
+        """
+        if not self.displayObj.mesh.procedural:
+            MemoryBudget.use(self.displayObj.mesh)
+
+    def drawState(self):
+        """
+        Key of the state applyDrawState sets, Components with equal keys can be drawn in one batch
+
+        :rtype: tuple
+        """
+        textureSource = None
+        if self.textureOn:
+            textureSource = self.virtualTexture if self.virtualTexture is not None else self.texture
+        return self.renderingRouting, textureSource
+
+    def applyDrawState(self, shaderProg):
+        """
+        Set rendering routing and bind the texture of this Component
+        """
+        shaderProg.setFragmentShaderRouting(self.renderingRouting)
+        if self.textureOn and self.virtualTexture is not None:
+            self.virtualTexture.bind(shaderProg)
+        elif self.textureOn:
+            self.texture.bind(shaderProg)
+        elif "texture" in self.renderingRouting.lower():
+            # sample nothing, rather than the texture of the Component drawn before
+            self.texture.unbind(shaderProg)
+
     def update(self, parentTransformationMat=None):
         """
         Apply translation, rotation and scaling to this component and all its children
@@ -296,17 +347,58 @@ class Component:
             result = max(result, low_bound)
         return result
 
-    def setTexture(self, shaderProg, imgFilePath, textureOn=True):
-        # apply texturek
+    def setTexture(self, shaderProg, imgFilePath, textureOn=True, packed=False):
+        """
+        :param packed: put the image in a layer of a TextureArray shared with the other packed textures of the same
+                       size, so they all draw from one bound texture
+        """
         if not os.path.isfile(imgFilePath):
             raise TypeError("Image File doesn't exist")
 
         shaderProg.use()
-        texture_image = Image.open(imgFilePath).convert("RGB")
-        texture_image = np.array(texture_image, dtype=np.uint8)
-        self.texture.setTextureImage(texture_image)
+        # shared with the Components using the same file, decoded in the background and uploaded over the next frames,
+        # a placeholder is shown until then
+        texture = TextureCache.acquire(imgFilePath, packed)
+        TextureCache.release(self.texture)
+        self.texture = texture
+        self.virtualTexture = None
+        self.textureOn = textureOn
+
+    def setVirtualTexture(self, shaderProg, virtualTexture, textureOn=True):
+        """
+        Sample a VirtualTexture, for images too large for setTexture. One VirtualTexture can be set on many
+        Components, it is freed with the scene which created it.
+        """
+        shaderProg.use()
+        self.virtualTexture = virtualTexture
         self.textureOn = textureOn
 
+    def setInstances(self, modelMats, colors=None, materials=None, materialIndices=None):
+        """
+        Draw the Displayable of this Component once per model matrix, all in one instanced draw call.
+        Call it again to move the instances, or after changing the Displayable.
+
+        :param modelMats: (N, 4, 4) column-major model matrices of the instances, relative to this Component
+        :type modelMats: numpy.ndarray
+        :param colors: (N, 3) vertex color multipliers of the instances, the Displayable's mesh color if None
+        :param materials: list<Material> the instances pick from, the material of this Component if None
+        :param materialIndices: (N,) index in materials of every instance, all 0 if None
+        """
+        if not isinstance(self.displayObj, Displayable):
+            raise TypeError("Instances need a Displayable to draw")
+        if self.instanceGroup is None:
+            self.instanceGroup = InstanceGroup()
+        self.instanceGroup.setInstances(self.displayObj, modelMats, colors,
+                                        [self.material] if materials is None else materials, materialIndices)
+
+    def clearInstances(self):
+        """
+        Draw the Displayable once again, at the Component transformation
+        """
+        if self.instanceGroup is not None:
+            self.instanceGroup.delete()
+            self.instanceGroup = None
+
     def setMaterial(self, material: Material):
         if not isinstance(material, Material):
             raise TypeError("Error, material must has type Material")
@@ -6,11 +6,38 @@ First version in 09/26/2018
 :version: 2021.1.1
 """
 
+import numpy as np
+
+from GLBuffer import VertexLayout
+from GLUtility import GLUtility
+from LevelOfDetail import LevelOfDetail
+from MemoryBudget import MemoryBudget
+from MeshRegistry import MeshRegistry
+
 
 class Displayable:
     """
     Interface for displayable object
     """
+    mesh = None  # shared Mesh from MeshRegistry, holds vao, vbo, ebo, vertices and indices, or a ProceduralMesh
+
+    # Level of detail chain, finest first. mesh is lodMeshes[lodLevel]
+    lodMeshes = None
+    lodLevel = 0
+    lodChordErrors = None  # LevelOfDetail.chordError of each level, None if this Displayable has no LOD
+
+    # In unit mesh mode the mesh is generated once at unit size in white,
+    # size goes to meshScaleMat and color to meshColor, and both are applied per draw
+    unitMesh = False
+    meshScaleMat = None  # 4x4 column-major scaling applied before the Component transformation
+    meshColor = np.ones(3, dtype=np.float32)  # multiplies vertex color in vertex shader
+
+    # In procedural mode the mesh is a ProceduralMesh, rebuilt by the vertex shader from the shape parameters
+    procedural = False
+
+    # how vertices are packed into the VBO, subclasses override it if their vertex array has other columns
+    vertexLayout = VertexLayout.standard()
+
     def __init__(self):
         pass
 
@@ -19,3 +46,180 @@ class Displayable:
 
     def initialize(self):
         raise NotImplementedError
+
+    def batchable(self):
+        """
+        Whether draw does nothing but draw the shared mesh, so MeshArena may draw it with other Displayables instead
+        """
+        return not self.mesh.procedural and self.mesh.uploaded
+
+    def setUnitTransform(self, sx, sy, sz, color):
+        """
+        Record the size and color a unit mesh should be drawn with
+
+        :param sx: scaling along x
+        :param sy: scaling along y
+        :param sz: scaling along z
+        :param color: vertex color multiplier
+        :type color: ColorType
+        """
+        self.meshScaleMat = GLUtility.scale(sx, sy, sz)
+        self.meshColor = np.array(tuple(color), dtype=np.float32)
+
+    def modelMatrix(self, transformationMat):
+        """
+        Model matrix to draw with, the Component transformation with unit mesh scaling applied first
+
+        :param transformationMat: the owner Component's transformation matrix, column-major
+        :type transformationMat: numpy.ndarray
+        :rtype: numpy.ndarray
+        """
+        if self.meshScaleMat is None:
+            return transformationMat
+        return self.meshScaleMat @ transformationMat
+
+    def acquireMesh(self, params, builder):
+        """
+        Point this Displayable to the shared mesh for its type and params, and drop the mesh it used before.
+        vao, vbo, ebo, vertices and indices are set from the shared mesh.
+
+        :param params: hashable generation parameters, same params on the same type give the same mesh
+        :param builder: callable with no arguments which returns (vertices, indices), only called on a cache miss
+        """
+        self.acquireLodChain([params], [builder])
+
+    def acquireLodChain(self, paramsList, builders, segments=None):
+        """
+        Same as acquireMesh, but for a chain of tessellations from finest to coarsest. Every level is a shared mesh.
+
+        :param paramsList: generation parameters of each level
+        :param builders: builder of each level
+        :param segments: segments around a full circle at each level, which bounds the tessellation error.
+                         If None, level 0 is always drawn
+        """
+        self.setLodChain([MeshRegistry.acquire((type(self).__name__, getattr(self, "shaderProg", None), params),
+                                               builder)
+                          for params, builder in zip(paramsList, builders)], segments)
+
+    def setLodChain(self, meshes, segments=None):
+        """
+        Use meshes as the level of detail chain, finest first, and release the meshes used before.
+        Meshes are shared ones from MeshRegistry or ProceduralMesh, which need no buffers.
+
+        :param meshes: mesh of each level
+        :param segments: segments around a full circle at each level, see acquireLodChain
+        """
+        oldMeshes = self.lodMeshes or []
+        self.lodMeshes = meshes
+        # levels finer than the coarsest are evicted first, they are only drawn up close
+        for level, mesh in enumerate(meshes):
+            if not mesh.procedural:
+                mesh.priority = max(mesh.priority,
+                                    MemoryBudget.DETAIL if level < len(meshes) - 1 else MemoryBudget.RESIDENT)
+        for oldMesh in oldMeshes:
+            if not oldMesh.procedural:
+                MeshRegistry.release(oldMesh)
+
+        self.lodChordErrors = None if segments is None else LevelOfDetail.chordError(segments)
+        self.setLodLevel(0)
+
+    def setLodLevel(self, level):
+        """
+        Switch mesh, vao, vbo, ebo, vertices and indices to the given level of the chain
+        """
+        self.lodLevel = level
+        self.mesh = self.lodMeshes[level]
+        self.vao = self.mesh.vao
+        self.vbo = self.mesh.vbo
+        self.ebo = self.mesh.ebo
+        self.vertices = self.mesh.vertices
+        self.indices = self.mesh.indices
+
+    def selectLod(self, modelMat):
+        """
+        Pick the level to draw from the current camera in LevelOfDetail
+
+        :param modelMat: column-major model matrix this Displayable is drawn with
+        :type modelMat: numpy.ndarray
+        """
+        if self.lodChordErrors is None or len(self.lodMeshes) == 1:
+            return
+        level = LevelOfDetail.select(modelMat, self.lodMeshes[0].boundingRadius, self.lodChordErrors)
+        if level != self.lodLevel:
+            self.setLodLevel(level)
+
+    def privateMesh(self, level):
+        """
+        Mesh of the given level which only this Displayable holds, uploaded to a dynamic VBO, so its vertices can be
+        modified. A shared or static mesh is swapped for a private copy under the key ("private", id(self)), plus
+        the level for coarser levels, which costs one full upload.
+
+        :rtype: Mesh
+        """
+        mesh = self.lodMeshes[level]
+        if mesh.refCount == 1 and mesh.uploaded and mesh.vbo.packed is not None:
+            return mesh
+        params = ("private", id(self)) + ((level,) if level else ())
+        mesh = MeshRegistry.privateCopy(mesh, (type(self).__name__, getattr(self, "shaderProg", None), params))
+        mesh.vao.bind()
+        mesh.vbo.setVertices(mesh.vertices, self.vertexLayout, self.shaderProg)
+        mesh.ebo.setBuffer(mesh.indices, mesh.restartIndex)
+        mesh.vao.unbind()
+        mesh.uploaded = True
+        self.lodMeshes[level] = mesh
+        self.setLodLevel(self.lodLevel)
+        return mesh
+
+    def setVertexAttribute(self, name, values, firstVertex=0, level=0):
+        """
+        Rewrite one vertex attribute, like "vertexColor" or "vertexTexture", of the vertices from firstVertex on.
+        Only the rows of those vertices are packed and uploaded with glBufferSubData, nothing is generated again.
+        The first call on a shared mesh makes a private copy of it, see privateMesh.
+
+        :param name: attribute name in vertexLayout
+        :param values: (N, size) new values, or one value for every vertex from firstVertex on
+        :param firstVertex: index of the first vertex to rewrite, in the welded vertices of the mesh
+        :param level: level of detail to rewrite, vertex counts differ between levels
+        """
+        attribute = self.vertexLayout.attribute(name)
+        if attribute is None:
+            raise ValueError(f"{type(self).__name__} has no vertex attribute {name}")
+        mesh = self.privateMesh(level)
+        values = np.asarray(values, dtype=mesh.vertices.dtype)
+        if values.ndim < 2:
+            values = np.broadcast_to(values, (mesh.vertices.shape[0] - firstVertex, attribute.size))
+        rows = mesh.vertices[firstVertex:firstVertex + values.shape[0]]
+        rows[:, attribute.column:attribute.column + attribute.size] = values
+        # an evicted mesh is uploaded again from its vertices when it is drawn on its own
+        if not mesh.evicted:
+            mesh.vbo.updateAttribute(name, values, firstVertex)
+        if mesh.arena is not None and not mesh.arenaStale:
+            mesh.arena.writeVertices(mesh, firstVertex, values.shape[0])
+
+    def setColor(self, color):
+        """
+        Change the color of the whole shape. Unit and procedural meshes only change the color uniform they are drawn
+        with, other meshes get their vertex colors rewritten in place at every level, see setVertexAttribute.
+
+        :param color: new color
+        :type color: ColorType
+        """
+        self.color = color
+        if self.unitMesh:
+            self.meshColor = np.array(tuple(color), dtype=np.float32)
+        elif self.mesh.procedural:
+            for mesh in self.lodMeshes:
+                mesh.color = np.array(tuple(color), dtype=np.float32)
+        else:
+            for level in range(len(self.lodMeshes)):
+                self.setVertexAttribute("vertexColor", tuple(color), level=level)
+
+    def release(self):
+        """
+        Give back the shared meshes, their GPU buffers are freed once no Displayable holds them
+        """
+        for mesh in self.lodMeshes or []:
+            if not mesh.procedural:
+                MeshRegistry.release(mesh)
+        self.lodMeshes = None
+        self.mesh = None
@@ -1,5 +1,5 @@
 """
-Define displayable cube here. Current version only use VBO
+Define displayable cube here. Its vertices are welded and drawn through EBO
 First version in 10/20/2021
 
 :author: micou(Zezhou Sun)
@@ -7,7 +7,8 @@ First version in 10/20/2021
 """
 
 from Displayable import Displayable
-from GLBuffer import VAO, VBO, EBO
+from MeshOptimizer import MeshOptimizer
+from ResourceManager import ResourceManager
 import numpy as np
 import ColorType
 
@@ -46,20 +47,20 @@ class DisplayableCube(Displayable):
     vertices = None  # array to store vertices information
     indices = None  # stores triangle indices to vertices
 
+    texture_id = None
+    textureResource = None  # tracking record of texture_id in ResourceManager
+
     # stores current cube's information, read-only
     length = None
     width = None
     height = None
     color = None
 
-    def __init__(self, shaderProg, length=1, width=1, height=1, color=ColorType.BLUE):
+    def __init__(self, shaderProg, length=1, width=1, height=1, color=ColorType.BLUE, unitMesh=False):
         super(DisplayableCube, self).__init__()
         self.shaderProg = shaderProg
-        self.shaderProg.use()
-
-        self.vao = VAO()
-        self.vbo = VBO()  # vbo can only be initiate with glProgram activated
-        self.ebo = EBO()
+        self.unitMesh = unitMesh
+        self.shaderProg.use()  # vbo can only be initiate with glProgram activated
 
         self.generate(length, width, height, color)
 
@@ -68,59 +69,62 @@ class DisplayableCube(Displayable):
         self.width = width
         self.height = height
         self.color = color
-        frontcolor = ColorType.GREENYELLOW
-
-        self.vertices = np.zeros([36, 11])
-        vl = np.array([
-            # back face
-            -length/2, -width/2, -height/2, 0, 0, -1, *color,
-            -length/2, width/2, -height/2, 0, 0, -1, *color,
-            length/2, width/2, -height/2, 0, 0, -1, *color,
-
-            
-            -length / 2, -width / 2, -height / 2, 0, 0, -1, *color,
-            length / 2, width / 2, -height / 2, 0, 0, -1, *color,
-            length/2, -width/2, -height/2, 0, 0, -1, *color,
-            # front face
-            -length/2, -width/2, height/2, 0, 0, 1, *frontcolor,
-            length/2, -width/2, height/2, 0, 0, 1, *frontcolor,
-            length/2, width/2, height/2, 0, 0, 1, *frontcolor,
-            -length / 2, -width / 2, height / 2, 0, 0, 1, *frontcolor,
-            length / 2, width / 2, height / 2, 0, 0, 1, *frontcolor,
-            -length/2, width/2, height/2, 0, 0, 1, *color,
-            # left face
-            -length/2, -width/2, -height/2, -1, 0, 0, *color,
-            -length/2, -width/2, height/2, -1, 0, 0, *color,
-            -length/2, width/2, height/2, -1, 0, 0, *color,
-            -length / 2, -width / 2, -height / 2, -1, 0, 0, *color,
-            -length / 2, width / 2, height / 2, -1, 0, 0, *color,
-            -length/2, width/2, -height/2, -1, 0, 0, *color,
-            # right face
-            length/2, -width/2, height/2, 1, 0, 0, *color,
-            length/2, -width/2, -height/2, 1, 0, 0, *color,
-            length/2, width/2, -height/2, 1, 0, 0, *color,
-            length / 2, -width / 2, height / 2, 1, 0, 0, *color,
-            length / 2, width / 2, -height / 2, 1, 0, 0, *color,
-            length/2, width/2, height/2, 1, 0, 0, *color,
-            # top face
-            -length/2, width/2, height/2, 0, 1, 0, *color,
-            length/2, width/2, height/2, 0, 1, 0, *color,
-            length/2, width/2, -height/2, 0, 1, 0, *color,
-            -length / 2, width / 2, height / 2, 0, 1, 0, *color,
-            length / 2, width / 2, -height / 2, 0, 1, 0, *color,
-            -length/2, width/2, -height/2, 0, 1, 0, *color,
-            # bottom face
-            -length/2, -width/2, -height/2, 0, -1, 0, *color,
-            length/2, -width/2, -height/2, 0, -1, 0, *color,
-            length/2, -width/2, height/2, 0, -1, 0, *color,
-            -length / 2, -width / 2, -height / 2, 0, -1, 0, *color,
-            length / 2, -width / 2, height / 2, 0, -1, 0, *color,
-            -length/2, -width/2, height/2, 0, -1, 0, *color,
-        ]).reshape((36, 9))
-        self.vertices[0:36, 0:9] = vl
-
-        self.indices = np.array([x for x in range(36)])
 
+        if self.unitMesh:
+            self.setUnitTransform(length, width, height, color)
+            self.acquireMesh(("unit",),
+                             lambda: self.buildMesh(1, 1, 1, ColorType.WHITE, ColorType.WHITE))
+        else:
+            self.acquireMesh((length, width, height, tuple(color)),
+                             lambda: self.buildMesh(length, width, height, color))
+
+    # corner signs of the two counterclockwise triangles of each face, seen from outside
+    faceCorners = np.array([
+        # back face
+        [-1, -1, -1], [-1, 1, -1], [1, 1, -1], [-1, -1, -1], [1, 1, -1], [1, -1, -1],
+        # front face
+        [-1, -1, 1], [1, -1, 1], [1, 1, 1], [-1, -1, 1], [1, 1, 1], [-1, 1, 1],
+        # left face
+        [-1, -1, -1], [-1, -1, 1], [-1, 1, 1], [-1, -1, -1], [-1, 1, 1], [-1, 1, -1],
+        # right face
+        [1, -1, 1], [1, -1, -1], [1, 1, -1], [1, -1, 1], [1, 1, -1], [1, 1, 1],
+        # top face
+        [-1, 1, 1], [1, 1, 1], [1, 1, -1], [-1, 1, 1], [1, 1, -1], [-1, 1, -1],
+        # bottom face
+        [-1, -1, -1], [1, -1, -1], [1, -1, 1], [-1, -1, -1], [1, -1, 1], [-1, -1, 1],
+    ], dtype=np.float32)
+    faceNormals = np.array([[0, 0, -1], [0, 0, 1], [-1, 0, 0], [1, 0, 0], [0, 1, 0], [0, -1, 0]], dtype=np.float32)
+
+    @staticmethod
+    def buildMesh(length, width, height, color, frontcolor=ColorType.GREENYELLOW):
+        """
+        Build the cube from two triangles per face, then weld the corners each face's triangles share
+
+        :return: vertices in (24, 11) float32 and flattened triangle indices
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        vertices = np.zeros((36, 11), dtype=np.float32)
+        vertices[:, 0:3] = DisplayableCube.faceCorners * np.array([length, width, height], dtype=np.float32) / 2
+        vertices[:, 3:6] = np.repeat(DisplayableCube.faceNormals, 6, axis=0)
+        vertices[:, 6:9] = tuple(color)
+        # the front face is highlighted except for its top left corner
+        vertices[6:11, 6:9] = tuple(frontcolor)
+
+        vertices, indices, _ = MeshOptimizer.weld(vertices, np.arange(36))
+        return vertices, indices
+
+    def setColor(self, color):
+        """
+        Same as Displayable.setColor, but the front face keeps its highlight color
+        """
+        if self.unitMesh:
+            super(DisplayableCube, self).setColor(color)
+            return
+        self.color = color
+        vertices, _ = self.buildMesh(self.length, self.width, self.height, color)
+        if self.mesh.weldKept is not None and vertices.shape[0] == self.mesh.generatedVertexNum:
+            vertices = vertices[self.mesh.weldKept]
+        self.setVertexAttribute("vertexColor", vertices[:, 6:9])
 
     def draw(self):
         if self.texture_id:  # Bind the texture if available
@@ -146,6 +150,9 @@ class DisplayableCube(Displayable):
 
             # Generate texture
             texture_id = gl.glGenTextures(1)
+            self.textureResource = ResourceManager.track("texture", texture_id,
+                                                         lambda: gl.glDeleteTextures([texture_id]),
+                                                         img.width * img.height * 4)
             gl.glBindTexture(gl.GL_TEXTURE_2D, texture_id)
 
             # Pass the image data to OpenGL
@@ -175,22 +182,31 @@ class DisplayableCube(Displayable):
         in systems that don't enable a default VAO after GLProgram compilation
         """
         self.vao.bind()
-        self.vbo.setBuffer(self.vertices, 11)
-        self.ebo.setBuffer(self.indices)
-
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexPos"),
-                                  stride=11, offset=0, attribSize=3)
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexNormal"),
-                                  stride=11, offset=3, attribSize=3)
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexColor"),
-                                  stride=11, offset=6, attribSize=3)
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexTexture"),
-                              stride=11, offset=9, attribSize=2)
+        # the mesh is shared, only the first cube holding it uploads the buffers
+        if not self.mesh.uploaded:
+            self.vbo.setVertices(self.vertices, self.vertexLayout, self.shaderProg)
+            self.ebo.setBuffer(self.indices, self.mesh.restartIndex)
+            self.mesh.uploaded = True
         # TODO/BONUS 6.1 is at here, you need to set attribPointer for texture coordinates
         # you should check the corresponding variable name in GLProgram and set the pointer
         texture_path = "C:/Users/Owner/Downloads/PA4_Fall2024/PA4_Fall2024/assets/earth.jpg"
+        self.releaseTexture()
         self.texture_id = self.load_texture(texture_path)
         self.vao.unbind()
 
+    def batchable(self):
+        # the texture of texture_id is bound by draw
+        return self.texture_id is None and super(DisplayableCube, self).batchable()
+
+    def releaseTexture(self):
+        if self.textureResource is not None:
+            ResourceManager.destroy(self.textureResource)
+            self.textureResource = None
+        self.texture_id = None
+
+    def release(self):
+        self.releaseTexture()
+        super(DisplayableCube, self).release()
+
 
 
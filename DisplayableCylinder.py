@@ -1,6 +1,8 @@
 
 from Displayable import Displayable
-from GLBuffer import VAO, VBO, EBO
+from LevelOfDetail import LevelOfDetail
+from GLBuffer import EBO, VertexLayout
+from ProceduralMesh import ProceduralMesh
 from Point import Point
 import numpy as np
 import ColorType
@@ -45,14 +47,17 @@ class DisplayableCylinder(Displayable):
     vertices = None
     indices = None
 
-    def __init__(self, shaderProg, radius=0.5, height=1, nsides=36, stacks=1, color=ColorType.SOFTBLUE):
+    lodLevels = 4  # most tessellations kept in the level of detail chain
+
+    vertexLayout = VertexLayout.standard(texture=False)  # cylinder has no texture coordinates
+
+    def __init__(self, shaderProg, radius=0.5, height=1, nsides=36, stacks=1, color=ColorType.SOFTBLUE,
+                 unitMesh=False, procedural=False):
         super(DisplayableCylinder, self).__init__()
         self.shaderProg = shaderProg
-        self.shaderProg.use()
-
-        self.vao = VAO()
-        self.vbo = VBO()  # vbo can only be initiate with glProgram activated
-        self.ebo = EBO()
+        self.unitMesh = unitMesh
+        self.procedural = procedural
+        self.shaderProg.use()  # vbo can only be initiate with glProgram activated
 
         self.generate(radius, height, nsides, color)
 
@@ -62,51 +67,68 @@ class DisplayableCylinder(Displayable):
         self.nsides = nsides
         self.color = color
 
-        # Prepare vertices and indices
-        self.vertices = np.zeros([(nsides + 1) * 2 + 2, 11])  # Sides + 1 extra for closing + top/bottom centers
-        self.indices = []
-
-        # Generate side vertices (top and bottom)
-        for i in range(nsides + 1):
-            angle = 2 * math.pi * i / nsides
-            x = radius * math.cos(angle)
-            y = radius * math.sin(angle)
-
-            # Bottom vertex (-z)
-            self.vertices[i][:9] = [x, y, -height / 2, x, y, 0, *color]
-
-            # Top vertex (+z)
-            self.vertices[i + nsides + 1][:9] = [x, y, height / 2, x, y, 0, *color]
-
-        # Generate indices for the sides
-        for i in range(nsides):
-            self.indices.extend([
-                [i, (i + 1) % nsides, i + nsides + 1],
-                [(i + 1) % nsides, (i + 1) % nsides + nsides + 1, i + nsides + 1]
-            ])
-
-        # Bottom center vertex (-z)
-        botCenterIdx = len(self.vertices) - 2
-        self.vertices[botCenterIdx][:9] = [0, 0, -height / 2, 0, 0, -1, *color]
-
-        # Generate indices for the bottom cap
-        for i in range(nsides):
-            self.indices.append([botCenterIdx, i, (i + 1) % nsides])
-
-        # Top center vertex (+z)
-        topCenterIdx = len(self.vertices) - 1
-        self.vertices[topCenterIdx][:9] = [0, 0, height / 2, 0, 0, 1, *color]
-
-        # Generate indices for the top cap
-        for i in range(nsides):
-            self.indices.append([topCenterIdx, (i + 1) % nsides + nsides + 1, i + nsides + 1])
-
-        # Convert indices to NumPy array
-        self.indices = np.array(self.indices)
-
+        # halve nsides at each coarser level
+        chain = [n for n, in LevelOfDetail.halvingChain((nsides,), (6,), self.lodLevels)]
+        if self.procedural:
+            # vertices come from gl_VertexID, nothing to generate or upload
+            self.setLodChain([ProceduralMesh(ProceduralMesh.CYLINDER, (radius, height), 0, n, color) for n in chain],
+                             chain)
+        elif self.unitMesh:
+            self.setUnitTransform(radius, radius, height, color)
+            self.acquireLodChain([("unit", n) for n in chain],
+                                 [lambda n=n: self.buildMesh(1, 1, n, ColorType.WHITE) for n in chain],
+                                 chain)
+        else:
+            self.acquireLodChain([(radius, height, n, tuple(color)) for n in chain],
+                                 [lambda n=n: self.buildMesh(radius, height, n, color) for n in chain],
+                                 chain)
+
+    @staticmethod
+    def buildMesh(radius, height, nsides, color):
+        """
+        Tessellate the cylinder side and its two caps
 
+        :return: vertices in (N, 11) float32 and flattened triangle indices
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        # Sides + 1 extra for closing + top/bottom centers
+        vertexCount = (nsides + 1) * 2 + 2
+        vertices = np.zeros([vertexCount, 11], dtype=np.float32)
+
+        # Generate side vertices, bottom ring (-z) first and then top ring (+z)
+        angle = 2 * math.pi * np.arange(nsides + 1, dtype=np.float64) / nsides
+        x = radius * np.cos(angle)
+        y = radius * np.sin(angle)
+        for ring, z in enumerate((-height / 2, height / 2)):
+            side = vertices[ring * (nsides + 1):(ring + 1) * (nsides + 1)]
+            side[:, 0] = x
+            side[:, 1] = y
+            side[:, 2] = z
+            side[:, 3] = x
+            side[:, 4] = y
+            side[:, 6:9] = tuple(color)
+
+        # Bottom center vertex (-z) and top center vertex (+z)
+        botCenterIdx = vertexCount - 2
+        vertices[botCenterIdx, :9] = [0, 0, -height / 2, 0, 0, -1, *color]
+        topCenterIdx = vertexCount - 1
+        vertices[topCenterIdx, :9] = [0, 0, height / 2, 0, 0, 1, *color]
+
+        i = np.arange(nsides)
+        iNext = (i + 1) % nsides
+        sides = np.stack([i, iNext, i + nsides + 1,
+                          iNext, iNext + nsides + 1, i + nsides + 1], axis=1).reshape((-1, 3))
+        bottomCap = np.stack([np.full(nsides, botCenterIdx), i, iNext], axis=1)
+        topCap = np.stack([np.full(nsides, topCenterIdx), iNext + nsides + 1, i + nsides + 1], axis=1)
+
+        # Sides, then bottom cap, then top cap
+        indices = np.concatenate([sides, bottomCap, topCap]).ravel().astype(EBO.indexDtype(vertexCount))
+        return vertices, indices
 
     def draw(self):
+        if self.mesh.procedural:
+            self.mesh.draw(self.shaderProg)
+            return
         self.vao.bind()
         self.ebo.draw()
         self.vao.unbind()
@@ -116,15 +138,14 @@ class DisplayableCylinder(Displayable):
         Remember to bind VAO before this initialization. If VAO is not bind, program might throw an error
         in systems which don't enable a default VAO after GLProgram compilation
         """
-        self.vao.bind()
-        self.vbo.setBuffer(self.vertices, 11)
-        self.ebo.setBuffer(self.indices)
-
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexPos"),
-                                  stride=11, offset=0, attribSize=3)
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexNormal"),
-                                  stride=11, offset=3, attribSize=3)
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexColor"),
-                                  stride=11, offset=6, attribSize=3)
-
-        self.vao.unbind()
\ No newline at end of file
+        # upload every level of the chain which is not uploaded yet
+        for level in range(len(self.lodMeshes)):
+            self.setLodLevel(level)
+            if self.mesh.uploaded:
+                continue
+            self.vao.bind()
+            self.vbo.setVertices(self.vertices, self.vertexLayout, self.shaderProg)
+            self.ebo.setBuffer(self.indices, self.mesh.restartIndex)
+            self.vao.unbind()
+            self.mesh.uploaded = True
+        self.setLodLevel(0)
\ No newline at end of file
@@ -7,7 +7,9 @@ First version in 12/03/2024
 """
 
 from Displayable import Displayable
-from GLBuffer import VAO, VBO, EBO
+from LevelOfDetail import LevelOfDetail
+from GLBuffer import EBO
+from ProceduralMesh import ProceduralMesh
 import numpy as np
 import ColorType
 import math
@@ -53,14 +55,15 @@ class DisplayableEllipsoid(Displayable):
     vertices = None
     indices = None
 
-    def __init__(self, shaderProg, radiusX=0.6, radiusY=0.3, radiusZ=0.9, stacks=18, slices=36, color=ColorType.SOFTBLUE):
+    lodLevels = 4  # most tessellations kept in the level of detail chain
+
+    def __init__(self, shaderProg, radiusX=0.6, radiusY=0.3, radiusZ=0.9, stacks=18, slices=36, color=ColorType.SOFTBLUE,
+                 unitMesh=False, procedural=False):
         super(DisplayableEllipsoid, self).__init__()
         self.shaderProg = shaderProg
-        self.shaderProg.use()
-
-        self.vao = VAO()
-        self.vbo = VBO()  # VBO requires active GLProgram
-        self.ebo = EBO()
+        self.unitMesh = unitMesh
+        self.procedural = procedural
+        self.shaderProg.use()  # VBO requires active GLProgram
 
         self.generate(radiusX, radiusY, radiusZ, stacks, slices, color)
 
@@ -72,43 +75,74 @@ class DisplayableEllipsoid(Displayable):
         self.slices = slices
         self.color = color
 
-        vertex_count = (stacks + 1) * (slices + 1)
-        self.vertices = np.zeros((vertex_count, 11))
-        indices = []
-
-        for i in range(stacks + 1):
-            phi = math.pi * i / stacks  # Latitude angle
-            for j in range(slices + 1):
-                theta = 2 * math.pi * j / slices  # Longitude angle
-
-                x = radiusX * math.sin(phi) * math.cos(theta)
-                y = radiusY * math.cos(phi)
-                z = radiusZ * math.sin(phi) * math.sin(theta)
-
-                nx = x / radiusX
-                ny = y / radiusY
-                nz = z / radiusZ
-                length = math.sqrt(nx**2 + ny**2 + nz**2)
-                nx, ny, nz = nx / length, ny / length, nz / length
+        # halve stacks and slices at each coarser level, stacks only cover half a circle
+        chain = LevelOfDetail.halvingChain((stacks, slices), (3, 6), self.lodLevels)
+        segments = [min(2 * st, sl) for st, sl in chain]
+        if self.procedural:
+            # vertices come from gl_VertexID, nothing to generate or upload
+            self.setLodChain([ProceduralMesh(ProceduralMesh.ELLIPSOID, (radiusX, radiusY, radiusZ), st, sl, color)
+                              for st, sl in chain], segments)
+        elif self.unitMesh:
+            # unit sphere, radii go to the model matrix whose inverse transpose gives the ellipsoid normals
+            self.setUnitTransform(radiusX, radiusY, radiusZ, color)
+            self.acquireLodChain([("unit", st, sl) for st, sl in chain],
+                                 [lambda st=st, sl=sl: self.buildMesh(1, 1, 1, st, sl, ColorType.WHITE)
+                                  for st, sl in chain],
+                                 segments)
+        else:
+            self.acquireLodChain([(radiusX, radiusY, radiusZ, st, sl, tuple(color)) for st, sl in chain],
+                                 [lambda st=st, sl=sl: self.buildMesh(radiusX, radiusY, radiusZ, st, sl, color)
+                                  for st, sl in chain],
+                                 segments)
+
+    @staticmethod
+    def buildMesh(radiusX, radiusY, radiusZ, stacks, slices, color):
+        """
+        Tessellate the ellipsoid
 
-                u = j / slices
-                v = i / stacks
+        :return: vertices in (N, 11) float32 and flattened triangle indices
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        # Evaluate the whole (stacks + 1) x (slices + 1) grid at once, row i is latitude, column j is longitude
+        i = np.arange(stacks + 1, dtype=np.float64).reshape((-1, 1))
+        j = np.arange(slices + 1, dtype=np.float64).reshape((1, -1))
+        phi = math.pi * i / stacks  # Latitude angle
+        theta = 2 * math.pi * j / slices  # Longitude angle
 
-                vertex_index = i * (slices + 1) + j
-                self.vertices[vertex_index][:9] = [x, y, z, nx, ny, nz, *color]
-                self.vertices[vertex_index][9:] = [u, v]
+        x = radiusX * np.sin(phi) * np.cos(theta)
+        y = radiusY * np.cos(phi) * np.ones_like(theta)
+        z = radiusZ * np.sin(phi) * np.sin(theta)
 
-                if i < stacks and j < slices:
-                    p0 = i * (slices + 1) + j
-                    p1 = p0 + 1
-                    p2 = p0 + (slices + 1)
-                    p3 = p2 + 1
-                    indices.append([p0, p2, p1])
-                    indices.append([p1, p2, p3])
+        nx = x / radiusX
+        ny = y / radiusY
+        nz = z / radiusZ
+        length = np.sqrt(nx ** 2 + ny ** 2 + nz ** 2)
 
-        self.indices = np.array(indices).flatten()
+        vertex_count = (stacks + 1) * (slices + 1)
+        vertices = np.empty((stacks + 1, slices + 1, 11), dtype=np.float32)
+        vertices[..., 0] = x
+        vertices[..., 1] = y
+        vertices[..., 2] = z
+        vertices[..., 3] = nx / length
+        vertices[..., 4] = ny / length
+        vertices[..., 5] = nz / length
+        vertices[..., 6:9] = tuple(color)
+        vertices[..., 9] = j / slices
+        vertices[..., 10] = i / stacks
+        vertices = vertices.reshape((vertex_count, 11))
+
+        # Two triangles per quad, emitted in the same row-major order as the per-quad loop
+        p0 = (np.arange(stacks).reshape((-1, 1)) * (slices + 1) + np.arange(slices).reshape((1, -1))).ravel()
+        p1 = p0 + 1
+        p2 = p0 + (slices + 1)
+        p3 = p2 + 1
+        indices = np.stack([p0, p2, p1, p1, p2, p3], axis=1).ravel().astype(EBO.indexDtype(vertex_count))
+        return vertices, indices
 
     def draw(self):
+        if self.mesh.procedural:
+            self.mesh.draw(self.shaderProg)
+            return
         self.vao.bind()
         self.ebo.draw()
         self.vao.unbind()
@@ -118,16 +152,14 @@ class DisplayableEllipsoid(Displayable):
         Remember to bind VAO before this initialization. If VAO is not bound, the program might throw an error
         in systems that don't enable a default VAO after GLProgram compilation.
         """
-        self.vao.bind()
-        self.vbo.setBuffer(self.vertices, 11)
-        self.ebo.setBuffer(self.indices)
-
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexPos"),
-                                  stride=11, offset=0, attribSize=3)
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexNormal"),
-                                  stride=11, offset=3, attribSize=3)
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexColor"),
-                                  stride=11, offset=6, attribSize=3)
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexTexture"),
-                                  stride=11, offset=9, attribSize=2)
-        self.vao.unbind()
+        # upload every level of the chain which is not uploaded yet
+        for level in range(len(self.lodMeshes)):
+            self.setLodLevel(level)
+            if self.mesh.uploaded:
+                continue
+            self.vao.bind()
+            self.vbo.setVertices(self.vertices, self.vertexLayout, self.shaderProg)
+            self.ebo.setBuffer(self.indices, self.mesh.restartIndex)
+            self.vao.unbind()
+            self.mesh.uploaded = True
+        self.setLodLevel(0)
@@ -0,0 +1,231 @@
+"""
+Define icosphere here. A geodesic sphere from a subdivided icosahedron, scaled into an ellipsoid.
+Its triangles are spread evenly over the surface, so it needs about half the triangles of DisplayableEllipsoid
+for the same tessellation error.
+
+:author: agent
+:version: 2026.10.18
+"""
+
+from Displayable import Displayable
+from GLBuffer import EBO
+import numpy as np
+import ColorType
+import math
+
+try:
+    import OpenGL
+
+    try:
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+    except ImportError:
+        from ctypes import util
+
+        orig_util_find_library = util.find_library
+
+        def new_util_find_library(name):
+            res = orig_util_find_library(name)
+            if res:
+                return res
+            return '/System/Library/Frameworks/' + name + '.framework/' + name
+
+        util.find_library = new_util_find_library
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+except ImportError:
+    raise ImportError("Required dependency PyOpenGL not present")
+
+
+class DisplayableIcosphere(Displayable):
+    vao = None
+    vbo = None
+    ebo = None
+    shaderProg = None
+
+    # Stores current icosphere's information, read-only
+    subdivisions = 0
+    radiusX = 0
+    radiusY = 0
+    radiusZ = 0
+    color = None
+
+    vertices = None
+    indices = None
+
+    lodLevels = 4  # most subdivision levels kept in the level of detail chain
+
+    # subdivisions -> (unit sphere positions, triangles), shared by every icosphere whatever its radii
+    subdivisionCache = {}
+
+    def __init__(self, shaderProg, radiusX=0.6, radiusY=0.3, radiusZ=0.9, subdivisions=3, color=ColorType.SOFTBLUE,
+                 unitMesh=False):
+        super(DisplayableIcosphere, self).__init__()
+        self.shaderProg = shaderProg
+        self.unitMesh = unitMesh
+        self.shaderProg.use()  # VBO requires active GLProgram
+
+        self.generate(radiusX, radiusY, radiusZ, subdivisions, color)
+
+    def generate(self, radiusX=0.6, radiusY=0.3, radiusZ=0.9, subdivisions=3, color=ColorType.SOFTBLUE):
+        self.radiusX = radiusX
+        self.radiusY = radiusY
+        self.radiusZ = radiusZ
+        self.subdivisions = subdivisions
+        self.color = color
+
+        # one subdivision less at each coarser level, every level has 4 times fewer triangles
+        chain = list(range(subdivisions, max(subdivisions - self.lodLevels, 0), -1)) or [subdivisions]
+        segments = [self.equivalentSegments(s) for s in chain]
+        if self.unitMesh:
+            self.setUnitTransform(radiusX, radiusY, radiusZ, color)
+            self.acquireLodChain([("unit", s) for s in chain],
+                                 [lambda s=s: self.buildMesh(1, 1, 1, s, ColorType.WHITE) for s in chain],
+                                 segments)
+        else:
+            self.acquireLodChain([(radiusX, radiusY, radiusZ, s, tuple(color)) for s in chain],
+                                 [lambda s=s: self.buildMesh(radiusX, radiusY, radiusZ, s, color) for s in chain],
+                                 segments)
+
+    @staticmethod
+    def icosahedron():
+        """
+        :return: unit icosahedron positions and its 20 counterclockwise triangles
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        t = (1 + math.sqrt(5)) / 2
+        positions = np.array([[-1, t, 0], [1, t, 0], [-1, -t, 0], [1, -t, 0],
+                              [0, -1, t], [0, 1, t], [0, -1, -t], [0, 1, -t],
+                              [t, 0, -1], [t, 0, 1], [-t, 0, -1], [-t, 0, 1]], dtype=np.float64)
+        positions /= np.linalg.norm(positions, axis=1, keepdims=True)
+        triangles = np.array([[0, 11, 5], [0, 5, 1], [0, 1, 7], [0, 7, 10], [0, 10, 11],
+                              [1, 5, 9], [5, 11, 4], [11, 10, 2], [10, 7, 6], [7, 1, 8],
+                              [3, 9, 4], [3, 4, 2], [3, 2, 6], [3, 6, 8], [3, 8, 9],
+                              [4, 9, 5], [2, 4, 11], [6, 2, 10], [8, 6, 7], [9, 8, 1]], dtype=np.int64)
+        return positions, triangles
+
+    @staticmethod
+    def subdivide(positions, triangles):
+        """
+        Split every triangle into 4, with new vertices at edge midpoints pushed out to the unit sphere.
+        Both triangles sharing an edge get the same midpoint vertex.
+
+        :return: new positions and triangles
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        triangleNum = triangles.shape[0]
+        # edges of all triangles as (a->b, b->c, c->a) blocks, deduplicated regardless of direction
+        edges = np.concatenate([triangles[:, [0, 1]], triangles[:, [1, 2]], triangles[:, [2, 0]]])
+        uniqueEdges, edgeIds = np.unique(np.sort(edges, axis=1), axis=0, return_inverse=True)
+        edgeIds = edgeIds.ravel() + positions.shape[0]
+
+        midpoints = positions[uniqueEdges[:, 0]] + positions[uniqueEdges[:, 1]]
+        midpoints /= np.linalg.norm(midpoints, axis=1, keepdims=True)
+
+        ab = edgeIds[:triangleNum]
+        bc = edgeIds[triangleNum:2 * triangleNum]
+        ca = edgeIds[2 * triangleNum:]
+        a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+        newTriangles = np.concatenate([np.stack([a, ab, ca], axis=1),
+                                       np.stack([b, bc, ab], axis=1),
+                                       np.stack([c, ca, bc], axis=1),
+                                       np.stack([ab, bc, ca], axis=1)])
+        return np.concatenate([positions, midpoints]), newTriangles
+
+    @classmethod
+    def unitSphere(cls, subdivisions):
+        """
+        Unit geodesic sphere, every level is computed once from the cached level below it
+
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        if subdivisions not in cls.subdivisionCache:
+            if subdivisions == 0:
+                cls.subdivisionCache[0] = cls.icosahedron()
+            else:
+                cls.subdivisionCache[subdivisions] = cls.subdivide(*cls.unitSphere(subdivisions - 1))
+        return cls.subdivisionCache[subdivisions]
+
+    @classmethod
+    def equivalentSegments(cls, subdivisions):
+        """
+        Segments of a circle with the same largest gap to the unit sphere as this subdivision level,
+        which is what LevelOfDetail measures error with
+
+        :rtype: float
+        """
+        positions, triangles = cls.unitSphere(subdivisions)
+        p = positions[triangles]
+        faceNormals = np.cross(p[:, 1] - p[:, 0], p[:, 2] - p[:, 0])
+        faceNormals /= np.linalg.norm(faceNormals, axis=1, keepdims=True)
+        # the farthest point from the sphere is where the face plane is closest to the center
+        gap = 1 - np.abs((faceNormals * p[:, 0]).sum(axis=1)).min()
+        return math.pi / math.acos(1 - gap)
+
+    @staticmethod
+    def buildMesh(radiusX, radiusY, radiusZ, subdivisions, color):
+        """
+        Tessellate the icosphere. Texture coordinates follow DisplayableEllipsoid, u goes around y and v from +y
+        to -y. Vertices on the u seam and at the poles are duplicated, so no triangle wraps around the texture.
+
+        :return: vertices in (N, 11) float32 and flattened triangle indices
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        positions, triangles = DisplayableIcosphere.unitSphere(subdivisions)
+        x, y, z = positions[:, 0], positions[:, 1], positions[:, 2]
+        u = np.mod(np.arctan2(z, x) / (2 * math.pi), 1.0)
+        pole = x ** 2 + z ** 2 < 1e-12
+
+        # per triangle corner u, shifted by 1 on triangles crossing the seam, and averaged at the poles
+        cornerU = u[triangles]
+        cornerPole = pole[triangles]
+        high = np.where(cornerPole, -np.inf, cornerU).max(axis=1)
+        low = np.where(cornerPole, np.inf, cornerU).min(axis=1)
+        wrap = (high - low > 0.5)[:, None]
+        cornerU = np.where(wrap & (cornerU < 0.5) & ~cornerPole, cornerU + 1, cornerU)
+        poleU = np.where(cornerPole, 0, cornerU).sum(axis=1) / np.maximum((~cornerPole).sum(axis=1), 1)
+        cornerU = np.where(cornerPole, poleU[:, None], cornerU)
+
+        # one vertex per distinct (position, u) pair
+        keys = np.stack([triangles.ravel().astype(np.float64), cornerU.ravel()], axis=1)
+        uniqueKeys, cornerIds = np.unique(keys, axis=0, return_inverse=True)
+        source = uniqueKeys[:, 0].astype(np.int64)
+        unit = positions[source]
+
+        radii = np.array([radiusX, radiusY, radiusZ], dtype=np.float64)
+        # ellipsoid normal is the unit sphere normal divided by the radii
+        normals = unit / np.where(radii == 0, 1, radii)
+        normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+
+        vertex_count = source.shape[0]
+        vertices = np.empty((vertex_count, 11), dtype=np.float32)
+        vertices[:, 0:3] = unit * radii
+        vertices[:, 3:6] = normals
+        vertices[:, 6:9] = tuple(color)
+        vertices[:, 9] = uniqueKeys[:, 1]
+        vertices[:, 10] = np.arccos(np.clip(unit[:, 1], -1, 1)) / math.pi
+
+        indices = cornerIds.ravel().astype(EBO.indexDtype(vertex_count))
+        return vertices, indices
+
+    def draw(self):
+        self.vao.bind()
+        self.ebo.draw()
+        self.vao.unbind()
+
+    def initialize(self):
+        """
+        Remember to bind VAO before this initialization. If VAO is not bound, the program might throw an error
+        in systems that don't enable a default VAO after GLProgram compilation.
+        """
+        # upload every level of the chain which is not uploaded yet
+        for level in range(len(self.lodMeshes)):
+            self.setLodLevel(level)
+            if self.mesh.uploaded:
+                continue
+            self.vao.bind()
+            self.vbo.setVertices(self.vertices, self.vertexLayout, self.shaderProg)
+            self.ebo.setBuffer(self.indices, self.mesh.restartIndex)
+            self.vao.unbind()
+            self.mesh.uploaded = True
+        self.setLodLevel(0)
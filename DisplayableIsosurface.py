@@ -0,0 +1,363 @@
+"""
+Define isosurface here. Marching cubes over a signed distance function or a scalar volume, so implicit shapes
+can be drawn as meshes in the lit pipeline.
+
+:author: agent
+:version: 2026.10.18
+"""
+
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+from Displayable import Displayable
+from GLBuffer import EBO
+import numpy as np
+import ColorType
+
+try:
+    import OpenGL
+
+    try:
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+    except ImportError:
+        from ctypes import util
+
+        orig_util_find_library = util.find_library
+
+        def new_util_find_library(name):
+            res = orig_util_find_library(name)
+            if res:
+                return res
+            return '/System/Library/Frameworks/' + name + '.framework/' + name
+
+        util.find_library = new_util_find_library
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+except ImportError:
+    raise ImportError("Required dependency PyOpenGL not present")
+
+
+class DisplayableIsosurface(Displayable):
+    """
+    Surface where field == iso. Values below iso are inside, normals follow the field gradient.
+    Cells are processed in slabs along z. Every edge vertex is computed once and shared by all cells around it,
+    vertex ids come from per plane counts so slabs can run in any order, also in worker processes.
+    """
+    vao = None
+    vbo = None
+    ebo = None
+    shaderProg = None
+
+    # Stores current isosurface's information, read-only
+    field = None
+    bounds = None
+    resolution = None
+    iso = 0
+    color = None
+
+    vertices = None
+    indices = None
+
+    chunkSize = 32  # cell layers along z processed together
+    workers = 0  # worker processes for slabs, 0 runs them in this process
+
+    # cube corner n is at offset (n & 1, n >> 1 & 1, n >> 2 & 1). Edge e is along edgeAxes[e] from edgeOffsets[e]
+    edgeAxes = None
+    edgeOffsets = None
+    # (256, 3 * most triangles) local edge ids of each case's triangles, padded with -1
+    caseTable = None
+
+    def __init__(self, shaderProg, field, bounds=((-1.0, -1.0, -1.0), (1.0, 1.0, 1.0)), resolution=64, iso=0.0,
+                 color=ColorType.SOFTBLUE, workers=0):
+        """
+        :param field: vectorized callable (x, y, z) -> values, like a signed distance function, or a 3D array of
+                      values indexed by (x, y, z) on a grid spanning bounds. A callable must be defined at module
+                      level to run in worker processes
+        :param bounds: (min corner, max corner) of the sampled box
+        :param resolution: grid points along each axis, one int or (nx, ny, nz). Ignored for arrays
+        :param iso: surface value
+        :param workers: worker processes for slabs, 0 runs everything in this process
+        """
+        super(DisplayableIsosurface, self).__init__()
+        self.shaderProg = shaderProg
+        self.workers = workers
+        self.shaderProg.use()  # VBO requires active GLProgram
+
+        self.generate(field, bounds, resolution, iso, color)
+
+    def generate(self, field, bounds=((-1.0, -1.0, -1.0), (1.0, 1.0, 1.0)), resolution=64, iso=0.0,
+                 color=ColorType.SOFTBLUE):
+        self.field = field
+        self.bounds = (tuple(bounds[0]), tuple(bounds[1]))
+        if isinstance(field, np.ndarray):
+            resolution = field.shape
+            # arrays are not hashable, their content is
+            fieldKey = ("volume", field.shape, hashlib.sha1(np.ascontiguousarray(field)).hexdigest())
+        else:
+            fieldKey = field
+        self.resolution = tuple(np.broadcast_to(resolution, 3).tolist())
+        self.iso = iso
+        self.color = color
+
+        self.acquireMesh((fieldKey, self.bounds, self.resolution, iso, tuple(color)),
+                         lambda: self.buildMesh(field, self.bounds, self.resolution, iso, color,
+                                                self.chunkSize, self.workers))
+
+    @classmethod
+    def buildCaseTable(cls):
+        """
+        Triangles of all 256 corner cases. On each cube face the surface crosses the edges between inside and
+        outside corners. A face with two diagonal inside corners cuts both corners off, and since a face is
+        shared by two cubes, both pick the same segments and the surface has no cracks. Segments are chained
+        into loops, every loop is fanned into triangles facing from inside corners to outside corners.
+        """
+        if cls.caseTable is not None:
+            return cls.caseTable
+        corners = np.array([(n & 1, n >> 1 & 1, n >> 2 & 1) for n in range(8)], dtype=np.float64)
+        edges = []  # (corner, corner) with the first corner at the lower end
+        for axis in range(3):
+            for n in range(8):
+                if not n >> axis & 1:
+                    edges.append((n, n | 1 << axis))
+        edgeIds = {}
+        for e, (a, b) in enumerate(edges):
+            edgeIds[(a, b)] = e
+            edgeIds[(b, a)] = e
+        midpoints = np.array([(corners[a] + corners[b]) / 2 for a, b in edges])
+
+        faces = []  # 4 corners of each face in cyclic order
+        for axis in range(3):
+            b, c = [x for x in range(3) if x != axis]
+            for side in (0, 1):
+                faces.append([side << axis | p << b | q << c for p, q in ((0, 0), (1, 0), (1, 1), (0, 1))])
+
+        cases = []
+        for case in range(256):
+            inside = [bool(case >> n & 1) for n in range(8)]
+            neighbours = {}
+            for face in faces:
+                faceEdges = [edgeIds[(face[k], face[(k + 1) % 4])] for k in range(4)]
+                crossing = [faceEdges[k] for k in range(4) if inside[face[k]] != inside[face[(k + 1) % 4]]]
+                if len(crossing) == 2:
+                    segments = [crossing]
+                elif len(crossing) == 4:
+                    # cut off each inside corner with the segment between its two face edges
+                    segments = [[faceEdges[k - 1], faceEdges[k]] for k in range(4) if inside[face[k]]]
+                else:
+                    segments = []
+                for p, q in segments:
+                    neighbours.setdefault(p, []).append(q)
+                    neighbours.setdefault(q, []).append(p)
+
+            triangles = []
+            visited = set()
+            for start in sorted(neighbours):
+                if start in visited:
+                    continue
+                loop = [start]
+                visited.add(start)
+                previous, current = None, start
+                while True:
+                    nextEdge = [e for e in neighbours[current] if e != previous][0]
+                    if nextEdge == start:
+                        break
+                    loop.append(nextEdge)
+                    visited.add(nextEdge)
+                    previous, current = current, nextEdge
+
+                # face the loop from inside corners to outside corners
+                points = midpoints[loop]
+                normal = np.cross(points, np.roll(points, -1, axis=0)).sum(axis=0)
+                outward = np.zeros(3)
+                for e in loop:
+                    a, b = edges[e]
+                    outward += (corners[a] - corners[b]) * (1 if inside[b] else -1)
+                if normal @ outward < 0:
+                    loop.reverse()
+                for k in range(1, len(loop) - 1):
+                    triangles.extend([loop[0], loop[k], loop[k + 1]])
+            cases.append(triangles)
+
+        width = max(len(t) for t in cases)
+        table = np.full((256, width), -1, dtype=np.int64)
+        for case, triangles in enumerate(cases):
+            table[case, :len(triangles)] = triangles
+        cls.edgeAxes = np.array([(np.argmax(corners[b] - corners[a])) for a, b in edges], dtype=np.int64)
+        cls.edgeOffsets = np.array([corners[a] for a, b in edges], dtype=np.int64)
+        cls.caseTable = table
+        return table
+
+    @staticmethod
+    def sampleSlab(field, origin, spacing, shape, lo, hi):
+        """
+        Field values of grid planes lo to hi - 1 along z, shape (nx, ny, hi - lo) in float32
+
+        :param field: callable, or (planes, index of the first plane) of a volume
+        """
+        if isinstance(field, tuple):
+            planes, first = field
+            return np.asarray(planes[:, :, lo - first:hi - first], dtype=np.float32)
+        x = origin[0] + spacing[0] * np.arange(shape[0]).reshape((-1, 1, 1))
+        y = origin[1] + spacing[1] * np.arange(shape[1]).reshape((1, -1, 1))
+        z = origin[2] + spacing[2] * np.arange(lo, hi).reshape((1, 1, -1))
+        x, y, z = np.broadcast_arrays(x, y, z)
+        return np.asarray(field(x, y, z), dtype=np.float32).reshape((shape[0], shape[1], hi - lo))
+
+    @staticmethod
+    def processSlab(field, iso, origin, spacing, shape, k0, k1, table, edgeAxes, edgeOffsets):
+        """
+        March the cells between grid planes k0 and k1 along z
+
+        :return: vertex count of each plane the slab owns, then for its vertices: plane, rank in plane, position
+                 and normal, then for its triangle corners: plane and rank in plane
+        :rtype: tuple
+        """
+        nx, ny, nz = shape
+        lo, hi = max(k0 - 1, 0), min(k1 + 2, nz)  # one plane more on both sides for gradients
+        values = DisplayableIsosurface.sampleSlab(field, origin, spacing, shape, lo, hi)
+        inside = values < iso
+
+        # the slab owns x and y edges in planes k0 to k1 - 1 (k1 too for the last slab), and z edges from them
+        ownedEnd = k1 if k1 < nz - 1 else nz
+        planes = np.arange(k0, k1 + 1)
+        p = planes - lo
+        crossX = (inside[:-1, :, p] != inside[1:, :, p]).transpose((2, 0, 1))
+        crossY = (inside[:, :-1, p] != inside[:, 1:, p]).transpose((2, 0, 1))
+        zPlanes = np.minimum(p, inside.shape[2] - 2)
+        crossZ = (inside[:, :, zPlanes] != inside[:, :, zPlanes + 1]).transpose((2, 0, 1))
+        crossZ[planes >= nz - 1] = False
+        crossZ[planes >= ownedEnd] = False
+
+        # rank of each crossing edge in its plane, x edges first, then y, then z, each in C order
+        countX = crossX.reshape((len(planes), -1)).sum(axis=1)
+        countY = crossY.reshape((len(planes), -1)).sum(axis=1)
+        countZ = crossZ.reshape((len(planes), -1)).sum(axis=1)
+        rankX = np.cumsum(crossX.reshape((len(planes), -1)), axis=1).reshape(crossX.shape) - 1
+        rankY = np.cumsum(crossY.reshape((len(planes), -1)), axis=1).reshape(crossY.shape) - 1 + \
+            countX[:, None, None]
+        rankZ = np.cumsum(crossZ.reshape((len(planes), -1)), axis=1).reshape(crossZ.shape) - 1 + \
+            (countX + countY)[:, None, None]
+        ranks = (rankX, rankY, rankZ)
+        planeCounts = (countX + countY + countZ)[:ownedEnd - k0]
+
+        def gradient(i, j, k):
+            # central differences, one sided on the volume border. k is a plane index in values
+            g = np.empty((i.shape[0], 3))
+            for axis, size in enumerate(values.shape):
+                index = [i, j, k]
+                plus = list(index)
+                minus = list(index)
+                plus[axis] = np.minimum(index[axis] + 1, size - 1)
+                minus[axis] = np.maximum(index[axis] - 1, 0)
+                g[:, axis] = (values[tuple(plus)].astype(np.float64) - values[tuple(minus)]) / \
+                    (np.maximum(plus[axis] - minus[axis], 1) * spacing[axis])
+            return g
+
+        # vertices of owned crossing edges, interpolated along the edge
+        vertexPlanes, vertexRanks, positions, normals = [], [], [], []
+        for axis, cross in enumerate((crossX, crossY, crossZ)):
+            q, i, j = np.nonzero(cross[:ownedEnd - k0])
+            k = planes[q] - lo
+            end = [i, j, k]
+            end = [c + (1 if a == axis else 0) for a, c in enumerate(end)]
+            f0 = values[i, j, k].astype(np.float64)
+            f1 = values[tuple(end)].astype(np.float64)
+            t = (iso - f0) / (f1 - f0)
+            grid = np.stack([i, j, planes[q]], axis=1).astype(np.float64)
+            grid[:, axis] += t
+            positions.append(origin + grid * spacing)
+            normals.append((1 - t)[:, None] * gradient(i, j, k) + t[:, None] * gradient(*end))
+            vertexPlanes.append(planes[q])
+            vertexRanks.append(ranks[axis][q, i, j])
+
+        # triangles of every cell with z in [k0, k1)
+        cellInside = inside[:, :, k0 - lo:k1 - lo + 1]
+        case = np.zeros((nx - 1, ny - 1, k1 - k0), dtype=np.int64)
+        for n in range(8):
+            dx, dy, dz = n & 1, n >> 1 & 1, n >> 2 & 1
+            case |= cellInside[dx:nx - 1 + dx, dy:ny - 1 + dy, dz:k1 - k0 + dz].astype(np.int64) << n
+        ci, cj, ck = np.nonzero((case != 0) & (case != 255))
+        localEdges = table[case[ci, cj, ck]]
+        valid = localEdges >= 0
+        cell = np.nonzero(valid)[0]
+        localEdges = localEdges[valid]
+        axes = edgeAxes[localEdges]
+        offsets = edgeOffsets[localEdges]
+        ei = ci[cell] + offsets[:, 0]
+        ej = cj[cell] + offsets[:, 1]
+        eq = ck[cell] + offsets[:, 2]  # plane index relative to k0
+        cornerRanks = np.empty(localEdges.shape[0], dtype=np.int64)
+        for axis in range(3):
+            m = axes == axis
+            cornerRanks[m] = ranks[axis][eq[m], ei[m], ej[m]]
+
+        return (planeCounts, np.concatenate(vertexPlanes), np.concatenate(vertexRanks),
+                np.concatenate(positions), np.concatenate(normals), eq + k0, cornerRanks)
+
+    @staticmethod
+    def buildMesh(field, bounds, resolution, iso, color, chunkSize=32, workers=0):
+        """
+        Run marching cubes slab by slab and join the slabs into one indexed mesh
+
+        :return: vertices in (N, 11) float32 and flattened triangle indices
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        table = DisplayableIsosurface.buildCaseTable()
+        shape = tuple(int(n) for n in resolution)
+        origin = np.array(bounds[0], dtype=np.float64)
+        spacing = (np.array(bounds[1], dtype=np.float64) - origin) / (np.array(shape) - 1)
+
+        jobs = []
+        for k0 in range(0, shape[2] - 1, chunkSize):
+            k1 = min(k0 + chunkSize, shape[2] - 1)
+            lo, hi = max(k0 - 1, 0), min(k1 + 2, shape[2])
+            # slabs only get the planes they read of a volume
+            slabField = (field[:, :, lo:hi], lo) if isinstance(field, np.ndarray) else field
+            jobs.append((slabField, iso, origin, spacing, shape, k0, k1, table,
+                         DisplayableIsosurface.edgeAxes, DisplayableIsosurface.edgeOffsets))
+
+        if workers:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                slabs = list(executor.map(DisplayableIsosurface.processSlab, *zip(*jobs)))
+        else:
+            slabs = [DisplayableIsosurface.processSlab(*job) for job in jobs]
+
+        planeOffsets = np.concatenate([[0], np.cumsum(np.concatenate([s[0] for s in slabs]))])
+        vertexNum = int(planeOffsets[-1])
+        positions = np.empty((vertexNum, 3))
+        normals = np.empty((vertexNum, 3))
+        indices = []
+        for planeCounts, vertexPlanes, vertexRanks, slabPositions, slabNormals, cornerPlanes, cornerRanks in slabs:
+            ids = planeOffsets[vertexPlanes] + vertexRanks
+            positions[ids] = slabPositions
+            normals[ids] = slabNormals
+            indices.append(planeOffsets[cornerPlanes] + cornerRanks)
+        indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64)
+
+        length = np.linalg.norm(normals, axis=1, keepdims=True)
+        normals = np.where(length > 0, normals / np.maximum(length, 1e-300), 0)
+
+        vertices = np.zeros((vertexNum, 11), dtype=np.float32)
+        vertices[:, 0:3] = positions
+        vertices[:, 3:6] = normals
+        vertices[:, 6:9] = tuple(color)
+        return vertices, indices.astype(EBO.indexDtype(vertexNum))
+
+    def draw(self):
+        self.vao.bind()
+        self.ebo.draw()
+        self.vao.unbind()
+
+    def initialize(self):
+        """
+        Remember to bind VAO before this initialization. If VAO is not bound, the program might throw an error
+        in systems that don't enable a default VAO after GLProgram compilation.
+        """
+        if self.mesh.uploaded:
+            return
+        self.vao.bind()
+        self.vbo.setVertices(self.vertices, self.vertexLayout, self.shaderProg)
+        self.ebo.setBuffer(self.indices, self.mesh.restartIndex)
+        self.vao.unbind()
+        self.mesh.uploaded = True
@@ -0,0 +1,294 @@
+"""
+Define parametric surface here. Any shape given by position(u, v) is tessellated over a (u, v) grid
+with NumPy callables, so no per vertex Python runs.
+
+:author: agent
+:version: 2026.10.18
+"""
+
+from Displayable import Displayable
+from GLBuffer import EBO
+import numpy as np
+import ColorType
+
+try:
+    import OpenGL
+
+    try:
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+    except ImportError:
+        from ctypes import util
+
+        orig_util_find_library = util.find_library
+
+        def new_util_find_library(name):
+            res = orig_util_find_library(name)
+            if res:
+                return res
+            return '/System/Library/Frameworks/' + name + '.framework/' + name
+
+        util.find_library = new_util_find_library
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+except ImportError:
+    raise ImportError("Required dependency PyOpenGL not present")
+
+
+class DisplayableParametric(Displayable):
+    """
+    Surface from vectorized callables. position(u, v) and normal(u, v) take two arrays of the same shape and
+    return either a tuple of x, y, z arrays or one array with a last axis of size 3.
+    Triangles wind counterclockwise around dP/du x dP/dv.
+    """
+    vao = None
+    vbo = None
+    ebo = None
+    shaderProg = None
+
+    # Stores current surface's information, read-only
+    position = None
+    normal = None
+    uRange = None
+    vRange = None
+    uSegments = 0
+    vSegments = 0
+    wrapU = False
+    wrapV = False
+    weld = True
+    color = None
+
+    vertices = None
+    indices = None
+
+    def __init__(self, shaderProg, position, normal=None, uRange=(0.0, 1.0), vRange=(0.0, 1.0), uSegments=64,
+                 vSegments=32, wrapU=False, wrapV=False, weld=True, color=ColorType.SOFTBLUE):
+        super(DisplayableParametric, self).__init__()
+        self.shaderProg = shaderProg
+        self.shaderProg.use()  # VBO requires active GLProgram
+
+        self.generate(position, normal, uRange, vRange, uSegments, vSegments, wrapU, wrapV, weld, color)
+
+    def generate(self, position, normal=None, uRange=(0.0, 1.0), vRange=(0.0, 1.0), uSegments=64, vSegments=32,
+                 wrapU=False, wrapV=False, weld=True, color=ColorType.SOFTBLUE):
+        """
+        :param position: vectorized callable, (u, v) -> surface point
+        :param normal: vectorized callable, (u, v) -> surface normal, any length. If None, normals come from
+                       central differences of position
+        :param uRange: (start, end) of u
+        :param vRange: (start, end) of v
+        :param uSegments: grid cells along u
+        :param vSegments: grid cells along v
+        :param wrapU: u is periodic, the last grid column takes the position and normal of the first one. It stays
+                      a separate seam column with u texture coordinate 1
+        :param wrapV: v is periodic, the last grid row takes the position and normal of the first one. It stays
+                      a separate seam row with v texture coordinate 1
+        :param weld: merge vertices at the same position with agreeing normals, like the poles of a sphere.
+                     Merged vertices keep the texture coordinates of one of them, but seam vertices are only merged
+                     with seam vertices and share the normal of the first column or row
+        :param color: vertex color
+        :type color: ColorType
+        """
+        self.position = position
+        self.normal = normal
+        self.uRange = tuple(uRange)
+        self.vRange = tuple(vRange)
+        self.uSegments = uSegments
+        self.vSegments = vSegments
+        self.wrapU = wrapU
+        self.wrapV = wrapV
+        self.weld = weld
+        self.color = color
+
+        # callables are hashed by identity, surfaces built from the same callables share their mesh
+        self.acquireMesh((position, normal, self.uRange, self.vRange, uSegments, vSegments, wrapU, wrapV, weld,
+                          tuple(color)),
+                         lambda: self.buildMesh(position, normal, uRange, vRange, uSegments, vSegments,
+                                                wrapU, wrapV, weld, color))
+
+    @staticmethod
+    def evaluate(f, u, v):
+        """
+        Call f on the grid and stack its result into shape u.shape + (3,)
+        """
+        result = f(u, v)
+        if isinstance(result, (tuple, list)):
+            result = np.stack([np.broadcast_to(np.asarray(c, dtype=np.float64), u.shape) for c in result], axis=-1)
+        return np.broadcast_to(np.asarray(result, dtype=np.float64), u.shape + (3,))
+
+    @staticmethod
+    def derivative(f, t, other, tRange, wrap, alongU):
+        """
+        Central difference of f along one parameter, one sided where the grid meets an open border
+
+        :param t: parameter the derivative is taken along
+        :param other: the other parameter
+        """
+        h = 1e-4 * (tRange[1] - tRange[0])
+        tPlus = t + h
+        tMinus = t - h
+        if not wrap:
+            low, high = min(tRange), max(tRange)
+            tPlus = np.clip(tPlus, low, high)
+            tMinus = np.clip(tMinus, low, high)
+        if alongU:
+            diff = DisplayableParametric.evaluate(f, tPlus, other) - DisplayableParametric.evaluate(f, tMinus, other)
+        else:
+            diff = DisplayableParametric.evaluate(f, other, tPlus) - DisplayableParametric.evaluate(f, other, tMinus)
+        return diff / (tPlus - tMinus)[..., None]
+
+    @staticmethod
+    def buildMesh(position, normal, uRange, vRange, uSegments, vSegments, wrapU, wrapV, weld, color):
+        """
+        Tessellate the surface, see generate for the parameters
+
+        :return: vertices in (N, 11) float32 and flattened triangle indices
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        # grid row i follows v and column j follows u
+        s = np.linspace(0, 1, uSegments + 1).reshape((1, -1))
+        t = np.linspace(0, 1, vSegments + 1).reshape((-1, 1))
+        u = np.broadcast_to(uRange[0] + (uRange[1] - uRange[0]) * s, (vSegments + 1, uSegments + 1))
+        v = np.broadcast_to(vRange[0] + (vRange[1] - vRange[0]) * t, (vSegments + 1, uSegments + 1))
+
+        points = np.array(DisplayableParametric.evaluate(position, u, v))
+        if normal is not None:
+            normals = DisplayableParametric.evaluate(normal, u, v)
+        else:
+            normals = np.cross(DisplayableParametric.derivative(position, u, v, uRange, wrapU, True),
+                               DisplayableParametric.derivative(position, v, u, vRange, wrapV, False))
+        length = np.linalg.norm(normals, axis=-1, keepdims=True)
+        normals = np.where(length > 1e-12, normals / np.maximum(length, 1e-300), 0)
+
+        # the seam column and row keep their own texture coordinates but lie exactly on the first ones, so no crack
+        seam = np.zeros((vSegments + 1, uSegments + 1), dtype=np.int64)
+        if wrapU:
+            points[:, -1] = points[:, 0]
+            normals[:, -1] = normals[:, 0]
+            seam[:, -1] |= 1
+        if wrapV:
+            points[-1, :] = points[0, :]
+            normals[-1, :] = normals[0, :]
+            seam[-1, :] |= 2
+        points = points.reshape((-1, 3))
+        normals = normals.reshape((-1, 3))
+        seam = seam.ravel()
+
+        # gridIds gives the vertex each grid point is drawn with, normalIds the group its normal is averaged over
+        gridIds = np.arange(points.shape[0])
+        normalIds = gridIds
+        # each grid point is represented by the first one at its position whose normal does not face away, seam
+        # points only by seam points
+        if weld:
+            scale = max(np.abs(points).max(), 1e-12)
+            keys = np.round(points / (scale * 1e-7)).astype(np.int64)
+            _, first, group = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+            representative = first[group.ravel()]
+            agree = (normals * normals[representative]).sum(axis=1) >= 0
+            normalIds = np.where(agree, representative, gridIds)
+            _, first, group = np.unique(np.column_stack([keys, seam]), axis=0, return_index=True,
+                                        return_inverse=True)
+            gridIds = np.where(agree, first[group.ravel()], gridIds)
+
+        # two triangles per cell, counterclockwise around dP/du x dP/dv
+        p0 = (np.arange(vSegments).reshape((-1, 1)) * (uSegments + 1) + np.arange(uSegments).reshape((1, -1))).ravel()
+        p1 = p0 + 1
+        p2 = p0 + (uSegments + 1)
+        p3 = p2 + 1
+        cells = np.stack([p0, p1, p2, p1, p3, p2], axis=1).reshape((-1, 3))
+        # drop triangles collapsed by welding, like the ones touching a pole, also where the seam meets it
+        collapsed = normalIds[cells]
+        triangles = gridIds[cells[(collapsed[:, 0] != collapsed[:, 1]) & (collapsed[:, 1] != collapsed[:, 2]) &
+                                  (collapsed[:, 2] != collapsed[:, 0])]]
+
+        used, triangles = np.unique(triangles, return_inverse=True)
+        triangles = triangles.reshape((-1, 3))
+
+        # welded vertices share the average of their normals, seam vertices the one of the vertices they lie on
+        groupNormals = np.zeros_like(normals)
+        kept = np.isin(gridIds, used)
+        np.add.at(groupNormals, normalIds[kept], normals[kept])
+        vertexNormals = groupNormals[normalIds[used]]
+        # where every normal vanished, as on a pole without an analytic normal, use the surrounding faces
+        corners = points[used][triangles]
+        faceNormals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        length = np.linalg.norm(vertexNormals, axis=1)
+        if np.any(length < 1e-9):
+            areaNormals = np.zeros_like(groupNormals)
+            for k in range(3):
+                np.add.at(areaNormals, normalIds[used][triangles[:, k]], faceNormals)
+            vertexNormals = np.where((length < 1e-9)[:, None], areaNormals[normalIds[used]], vertexNormals)
+            length = np.linalg.norm(vertexNormals, axis=1)
+        vertexNormals /= np.maximum(length, 1e-300)[:, None]
+
+        vertex_count = used.shape[0]
+        vertices = np.empty((vertex_count, 11), dtype=np.float32)
+        vertices[:, 0:3] = points[used]
+        vertices[:, 3:6] = vertexNormals
+        vertices[:, 6:9] = tuple(color)
+        vertices[:, 9] = np.broadcast_to(s, u.shape).ravel()[used]
+        vertices[:, 10] = np.broadcast_to(t, u.shape).ravel()[used]
+
+        indices = triangles.ravel().astype(EBO.indexDtype(vertex_count))
+        return vertices, indices
+
+    @staticmethod
+    def superquadric(radiusX=1.0, radiusY=1.0, radiusZ=1.0, e1=1.0, e2=1.0):
+        """
+        Superellipsoid position over u in [0, 2pi] (wrapping) and v in [-pi/2, pi/2]
+
+        :param e1: squareness along y, 1 is round, near 0 is boxy
+        :param e2: squareness around y
+        """
+        def signedPower(x, e):
+            return np.sign(x) * np.abs(x) ** e
+
+        def position(u, v):
+            cv = signedPower(np.cos(v), e1)
+            return (radiusX * cv * signedPower(np.cos(u), e2),
+                    radiusY * signedPower(np.sin(v), e1),
+                    -radiusZ * cv * signedPower(np.sin(u), e2))
+        return position
+
+    @staticmethod
+    def mobius(radius=1.0, width=0.5):
+        """
+        Mobius strip position over u in [0, 2pi] and v in [-1, 1]. It cannot wrap in u, the two ends
+        meet with opposite normals
+        """
+        def position(u, v):
+            r = radius + width * 0.5 * v * np.cos(u / 2)
+            return r * np.cos(u), r * np.sin(u), width * 0.5 * v * np.sin(u / 2)
+        return position
+
+    @staticmethod
+    def revolution(radius, height):
+        """
+        Surface of revolution around y, position over u in [0, 2pi] (wrapping) and the profile parameter v.
+        Normals face away from the axis when the profile goes up with v
+
+        :param radius: vectorized callable, v -> distance from the y axis
+        :param height: vectorized callable, v -> y
+        """
+        def position(u, v):
+            r = radius(v)
+            return r * np.cos(u), height(v) * np.ones_like(u), -r * np.sin(u)
+        return position
+
+    def draw(self):
+        self.vao.bind()
+        self.ebo.draw()
+        self.vao.unbind()
+
+    def initialize(self):
+        """
+        Remember to bind VAO before this initialization. If VAO is not bound, the program might throw an error
+        in systems that don't enable a default VAO after GLProgram compilation.
+        """
+        if self.mesh.uploaded:
+            return
+        self.vao.bind()
+        self.vbo.setVertices(self.vertices, self.vertexLayout, self.shaderProg)
+        self.ebo.setBuffer(self.indices, self.mesh.restartIndex)
+        self.vao.unbind()
+        self.mesh.uploaded = True
@@ -1,5 +1,6 @@
 from Displayable import Displayable
-from GLBuffer import VAO, VBO, EBO
+from GLBuffer import VertexLayout
+from MeshOptimizer import MeshOptimizer
 import numpy as np
 import ColorType
 
@@ -36,14 +37,13 @@ class DisplayablePyramid(Displayable):
     vertices = None
     indices = None
 
-    def __init__(self, shaderProg, baseSize=1.0, height=1.5, color=ColorType.SOFTBLUE):
+    vertexLayout = VertexLayout.standard(texture=False)  # 9 attributes per vertex, no texture coordinates
+
+    def __init__(self, shaderProg, baseSize=1.0, height=1.5, color=ColorType.SOFTBLUE, unitMesh=False):
         super(DisplayablePyramid, self).__init__()
         self.shaderProg = shaderProg
-        self.shaderProg.use()
-
-        self.vao = VAO()
-        self.vbo = VBO()  # VBO requires active GLProgram
-        self.ebo = EBO()
+        self.unitMesh = unitMesh
+        self.shaderProg.use()  # VBO requires active GLProgram
 
         self.generate(baseSize, height, color)
 
@@ -54,61 +54,48 @@ class DisplayablePyramid(Displayable):
         if len(color) != 3 and len(color) != 4:
             raise ValueError("Color must have 3 (RGB) or 4 (RGBA) components.")
 
-        halfBase = baseSize / 2
+        if self.unitMesh:
+            self.setUnitTransform(baseSize, height, baseSize, color)
+            self.acquireMesh(("unit",),
+                             lambda: self.buildMesh(1, 1, (1.0, 1.0, 1.0)))
+        else:
+            self.acquireMesh((baseSize, height, tuple(color)),
+                             lambda: self.buildMesh(baseSize, height, color))
 
-        # Define vertices (position, normal, color)
-        # Base vertices
-        v0 = [-halfBase, 0, -halfBase]
-        v1 = [halfBase, 0, -halfBase]
-        v2 = [halfBase, 0, halfBase]
-        v3 = [-halfBase, 0, halfBase]
-        # Apex
-        v4 = [0, height, 0]
-
-        # Define normals for the faces
-        n_base = [0, -1, 0]
-        n_front = [0, height / 2, -baseSize / 2]
-        n_right = [baseSize / 2, height / 2, 0]
-        n_back = [0, height / 2, baseSize / 2]
-        n_left = [-baseSize / 2, height / 2, 0]
-
-        # Normalize normals
-        def normalize(vec):
-            length = np.linalg.norm(vec)
-            return vec / length
-
-        n_front = normalize(n_front)
-        n_right = normalize(n_right)
-        n_back = normalize(n_back)
-        n_left = normalize(n_left)
-
-        # Add vertices with positions, normals, and color
-        self.vertices = np.array([
-            *v0, *n_base, *color,
-            *v1, *n_base, *color,
-            *v2, *n_base, *color,
-            *v3, *n_base, *color,
-            *v4, *n_front, *color,
-            *v4, *n_right, *color,
-            *v4, *n_back, *color,
-            *v4, *n_left, *color,
-        ], dtype=np.float32).reshape((-1, 9))
-
-        # Define indices for triangles
-        self.indices = np.array([
-            # Base face
-            0, 1, 2,
-            0, 2, 3,
-            # Front face
-            0, 1, 4,
-            # Right face
-            1, 2, 5,
-            # Back face
-            2, 3, 6,
-            # Left face
-            3, 0, 7
-        ], dtype=np.uint32)
+    @staticmethod
+    def buildMesh(baseSize, height, color):
+        """
+        Build the base and the four side faces of the pyramid, each with its own flat normal, then weld the
+        vertices the triangles of one face share
 
+        :return: vertices in (16, 9) float32 and flattened triangle indices
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        halfBase = baseSize / 2
+        # base corners counterclockwise seen from below, then the apex
+        corners = np.array([[-halfBase, 0, -halfBase],
+                            [halfBase, 0, -halfBase],
+                            [halfBase, 0, halfBase],
+                            [-halfBase, 0, halfBase],
+                            [0, height, 0]], dtype=np.float32)
+        triangles = np.array([
+            # base face
+            [0, 1, 2], [0, 2, 3],
+            # front, right, back and left faces
+            [1, 0, 4], [2, 1, 4], [3, 2, 4], [0, 3, 4],
+        ])
+
+        p = corners[triangles]
+        normals = np.cross(p[:, 1] - p[:, 0], p[:, 2] - p[:, 0])
+        normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+
+        vertices = np.empty((triangles.size, 9), dtype=np.float32)
+        vertices[:, 0:3] = p.reshape((-1, 3))
+        vertices[:, 3:6] = np.repeat(normals, 3, axis=0)
+        vertices[:, 6:9] = tuple(color)[0:3]
+
+        vertices, indices, _ = MeshOptimizer.weld(vertices, np.arange(triangles.size))
+        return vertices, indices
 
     def draw(self):
         self.vao.bind()
@@ -120,14 +107,10 @@ class DisplayablePyramid(Displayable):
         Remember to bind VAO before this initialization. If VAO is not bound, the program might throw an error
         in systems that don't enable a default VAO after GLProgram compilation.
         """
+        if self.mesh.uploaded:
+            return
         self.vao.bind()
-        self.vbo.setBuffer(self.vertices, 9)
-        self.ebo.setBuffer(self.indices)
-
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexPos"),
-                                  stride=9, offset=0, attribSize=3)
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexNormal"),
-                                  stride=9, offset=3, attribSize=3)
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexColor"),
-                                  stride=9, offset=6, attribSize=3)
+        self.vbo.setVertices(self.vertices, self.vertexLayout, self.shaderProg)
+        self.ebo.setBuffer(self.indices, self.mesh.restartIndex)
         self.vao.unbind()
+        self.mesh.uploaded = True
@@ -0,0 +1,169 @@
+"""
+Define subdivision surface here. A smooth surface refined from a coarse cage with Loop or Catmull-Clark
+subdivision. The cage can be edited or animated, refining it again only runs the cached sparse stencils.
+
+:author: agent
+:version: 2026.10.18
+"""
+
+import hashlib
+
+from Displayable import Displayable
+from GLBuffer import EBO
+from MeshOptimizer import MeshOptimizer
+from Subdivision import Subdivision
+import numpy as np
+import ColorType
+
+try:
+    import OpenGL
+
+    try:
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+    except ImportError:
+        from ctypes import util
+
+        orig_util_find_library = util.find_library
+
+        def new_util_find_library(name):
+            res = orig_util_find_library(name)
+            if res:
+                return res
+            return '/System/Library/Frameworks/' + name + '.framework/' + name
+
+        util.find_library = new_util_find_library
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+except ImportError:
+    raise ImportError("Required dependency PyOpenGL not present")
+
+
+class DisplayableSubdivision(Displayable):
+    vao = None
+    vbo = None
+    ebo = None
+    shaderProg = None
+
+    # Stores current surface's information, read-only
+    cagePositions = None  # (N, 3) cage vertex positions, edit a copy and pass it to setCagePositions
+    faceVerts = None
+    faceSizes = None
+    scheme = None
+    levels = 0
+    color = None
+    subdivision = None  # cached Subdivision of the cage topology
+
+    vertices = None
+    indices = None
+
+    def __init__(self, shaderProg, positions, faces, scheme=Subdivision.CATMULL_CLARK, levels=2,
+                 color=ColorType.SOFTBLUE):
+        """
+        :param positions: (N, 3) cage vertex positions
+        :param faces: cage polygons as a list of vertex id lists or an (M, k) array, counterclockwise
+        :param scheme: Subdivision.LOOP for triangle cages or Subdivision.CATMULL_CLARK for any polygons
+        :param levels: refinement steps, every step has 4 times more faces
+        """
+        super(DisplayableSubdivision, self).__init__()
+        self.shaderProg = shaderProg
+        self.shaderProg.use()  # VBO requires active GLProgram
+
+        self.generate(positions, faces, scheme, levels, color)
+
+    @classmethod
+    def fromDisplayable(cls, shaderProg, displayable, scheme=Subdivision.CATMULL_CLARK, levels=2,
+                        color=ColorType.SOFTBLUE):
+        """
+        Use the mesh of another Displayable as the cage, like DisplayableCube or DisplayablePyramid.
+        Its vertices are welded by position, and for Catmull-Clark its coplanar triangle pairs become quads.
+
+        :rtype: DisplayableSubdivision
+        """
+        triangles = MeshOptimizer.triangleList(displayable.indices, displayable.mesh.restartIndex)
+        positions, triangles, _ = Subdivision.weld(displayable.vertices[:, 0:3], triangles)
+        if scheme == Subdivision.CATMULL_CLARK:
+            faces = Subdivision.mergeCoplanarTriangles(positions, triangles)
+        else:
+            faces = triangles
+        return cls(shaderProg, positions, faces, scheme, levels, color)
+
+    def generate(self, positions, faces, scheme=Subdivision.CATMULL_CLARK, levels=2, color=ColorType.SOFTBLUE):
+        """
+        :param faces: same as in __init__, or (faceVerts, faceSizes) flattened polygons
+        """
+        if isinstance(faces, tuple):
+            faceVerts, faceSizes = faces
+        elif isinstance(faces, np.ndarray):
+            faceVerts, faceSizes = faces.ravel(), np.full(faces.shape[0], faces.shape[1])
+        else:
+            faceVerts = [v for face in faces for v in face]
+            faceSizes = [len(face) for face in faces]
+        self.faceVerts = np.asarray(faceVerts, dtype=np.int64)
+        self.faceSizes = np.asarray(faceSizes, dtype=np.int64)
+        self.cagePositions = np.array(positions, dtype=np.float64)
+        self.scheme = scheme
+        self.levels = levels
+        self.color = color
+        self.subdivision = Subdivision.get(scheme, levels, self.cagePositions.shape[0], self.faceVerts,
+                                           self.faceSizes)
+
+        digest = hashlib.sha1(self.faceVerts.tobytes() + self.faceSizes.tobytes() +
+                              self.cagePositions.tobytes()).hexdigest()
+        self.acquireMesh((scheme, levels, digest, tuple(color)), lambda: self.buildMesh(self.cagePositions))
+
+    def buildMesh(self, positions):
+        """
+        Refine the cage positions with the cached topology
+
+        :return: vertices in (N, 11) float32 and flattened triangle indices
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        refined = self.subdivision.refine(positions)
+        triangles = self.subdivision.triangles
+
+        vertex_count = refined.shape[0]
+        vertices = np.zeros((vertex_count, 11), dtype=np.float32)
+        vertices[:, 0:3] = refined
+        vertices[:, 3:6] = Subdivision.vertexNormals(refined, triangles)
+        vertices[:, 6:9] = tuple(self.color)
+        return vertices, triangles.ravel().astype(EBO.indexDtype(vertex_count))
+
+    def setCagePositions(self, positions):
+        """
+        Move the cage vertices and refine again, cheap enough to run every frame. The first call moves this
+        Displayable to a mesh of its own, so Displayables sharing the old mesh are not changed.
+
+        :param positions: (N, 3) new positions of the cage vertices, same count as before
+        """
+        self.cagePositions = np.array(positions, dtype=np.float64)
+        if self.mesh.key[-1] != ("private", id(self)):
+            self.acquireMesh(("private", id(self)), lambda: self.buildMesh(self.cagePositions))
+            # rewritten often, the whole buffer is orphaned on every update
+            self.vbo.usage = gl.GL_DYNAMIC_DRAW
+            self.initialize()
+            return
+
+        vertices, _ = self.buildMesh(self.cagePositions)
+        self.mesh.updateVertices(vertices)
+        self.vertices = self.mesh.vertices
+        if self.mesh.uploaded and not self.mesh.evicted:
+            self.vbo.updateVertices(self.vertices)
+
+    def draw(self):
+        self.vao.bind()
+        self.ebo.draw()
+        self.vao.unbind()
+
+    def initialize(self):
+        """
+        Remember to bind VAO before this initialization. If VAO is not bound, the program might throw an error
+        in systems that don't enable a default VAO after GLProgram compilation.
+        """
+        if self.mesh.uploaded:
+            return
+        self.vao.bind()
+        self.vbo.setVertices(self.vertices, self.vertexLayout, self.shaderProg)
+        self.ebo.setBuffer(self.indices, self.mesh.restartIndex)
+        self.vao.unbind()
+        self.mesh.uploaded = True
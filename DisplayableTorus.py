@@ -7,7 +7,9 @@ First version in 11/01/2021
 """
 
 from Displayable import Displayable
-from GLBuffer import VAO, VBO, EBO
+from LevelOfDetail import LevelOfDetail
+from GLBuffer import EBO
+from ProceduralMesh import ProceduralMesh
 import numpy as np
 import ColorType
 import math
@@ -37,14 +39,15 @@ except ImportError:
 
 
 class DisplayableTorus(Displayable):
-    def __init__(self, shaderProg, innerRadius=0.25, outerRadius=0.5, nsides=36, rings=36, color=ColorType.SOFTGREEN):
+    lodLevels = 4  # most tessellations kept in the level of detail chain
+
+    def __init__(self, shaderProg, innerRadius=0.25, outerRadius=0.5, nsides=36, rings=36, color=ColorType.SOFTGREEN,
+                 unitMesh=False, procedural=False):
         super(DisplayableTorus, self).__init__()
         self.shaderProg = shaderProg
-        self.shaderProg.use()
-
-        self.vao = VAO()
-        self.vbo = VBO()  # VBO can only be initiated with a shader program activated
-        self.ebo = EBO()
+        self.unitMesh = unitMesh
+        self.procedural = procedural
+        self.shaderProg.use()  # VBO can only be initiated with a shader program activated
 
         self.generate(innerRadius, outerRadius, nsides, rings, color)
 
@@ -55,58 +58,76 @@ class DisplayableTorus(Displayable):
         self.rings = rings
         self.color = color
 
-        # Number of vertices and indices
+        # halve nsides and rings at each coarser level
+        chain = LevelOfDetail.halvingChain((nsides, rings), (4, 6), self.lodLevels)
+        segments = [min(n, r) for n, r in chain]
+        if self.procedural:
+            # vertices come from gl_VertexID, nothing to generate or upload
+            self.setLodChain([ProceduralMesh(ProceduralMesh.TORUS, (innerRadius, outerRadius), r, n, color)
+                              for n, r in chain], segments)
+        elif self.unitMesh:
+            # torus shape only depends on the radius ratio, outerRadius becomes a uniform scaling
+            ratio = innerRadius / outerRadius
+            self.setUnitTransform(outerRadius, outerRadius, outerRadius, color)
+            self.acquireLodChain([("unit", ratio, n, r) for n, r in chain],
+                                 [lambda n=n, r=r: self.buildMesh(ratio, 1, n, r, ColorType.WHITE) for n, r in chain],
+                                 segments)
+        else:
+            self.acquireLodChain([(innerRadius, outerRadius, n, r, tuple(color)) for n, r in chain],
+                                 [lambda n=n, r=r: self.buildMesh(innerRadius, outerRadius, n, r, color)
+                                  for n, r in chain],
+                                 segments)
+
+    @staticmethod
+    def buildMesh(innerRadius, outerRadius, nsides, rings, color):
+        """
+        Tessellate the torus
+
+        :return: vertices in (N, 11) float32 and flattened triangle indices
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        # Number of vertices
         num_vertices = (rings + 1) * (nsides + 1)
-        num_indices = rings * nsides * 6
-
-        # Initialize vertices and indices
-        self.vertices = np.zeros((num_vertices, 11), dtype=np.float32)  # pos(3), normal(3), color(3), texCoord(2)
-        self.indices = np.zeros(num_indices, dtype=np.uint32)
-
-        # Generate vertices
-        for i in range(rings + 1):
-            theta = 2.0 * math.pi * i / rings
-            cos_theta = math.cos(theta)
-            sin_theta = math.sin(theta)
-
-            for j in range(nsides + 1):
-                phi = 2.0 * math.pi * j / nsides
-                cos_phi = math.cos(phi)
-                sin_phi = math.sin(phi)
-
-                # Position
-                x = (outerRadius + innerRadius * cos_phi) * cos_theta
-                y = (outerRadius + innerRadius * cos_phi) * sin_theta
-                z = innerRadius * sin_phi
-
-                # Normal
-                nx = cos_phi * cos_theta
-                ny = cos_phi * sin_theta
-                nz = sin_phi
-
-                # Index for vertex array
-                idx = i * (nsides + 1) + j
-
-                # Store vertex attributes
-                self.vertices[idx, 0:3] = [x, y, z]
-                self.vertices[idx, 3:6] = [nx, ny, nz]  # Normal
-                self.vertices[idx, 6:9] = [color.r, color.g, color.b]  # Color
-                self.vertices[idx, 9:11] = [i / rings, j / nsides]  # Texture coordinates
-
-        # Generate indices
-        idx = 0
-        for i in range(rings):
-            for j in range(nsides):
-                p0 = i * (nsides + 1) + j
-                p1 = p0 + 1
-                p2 = p0 + (nsides + 1)
-                p3 = p2 + 1
-
-                # Two triangles per quad
-                self.indices[idx:idx + 6] = [p0, p1, p2, p1, p3, p2]
-                idx += 6
+
+        # Ring angle theta varies along rows, side angle phi along columns
+        i = np.arange(rings + 1, dtype=np.float64).reshape((-1, 1))
+        j = np.arange(nsides + 1, dtype=np.float64).reshape((1, -1))
+        theta = 2.0 * math.pi * i / rings
+        cos_theta = np.cos(theta)
+        sin_theta = np.sin(theta)
+        phi = 2.0 * math.pi * j / nsides
+        cos_phi = np.cos(phi)
+        sin_phi = np.sin(phi)
+
+        # pos(3), normal(3), color(3), texCoord(2)
+        vertices = np.empty((rings + 1, nsides + 1, 11), dtype=np.float32)
+        # Position
+        vertices[..., 0] = (outerRadius + innerRadius * cos_phi) * cos_theta
+        vertices[..., 1] = (outerRadius + innerRadius * cos_phi) * sin_theta
+        vertices[..., 2] = innerRadius * sin_phi
+        # Normal
+        vertices[..., 3] = cos_phi * cos_theta
+        vertices[..., 4] = cos_phi * sin_theta
+        vertices[..., 5] = sin_phi
+        # Color
+        vertices[..., 6:9] = (color.r, color.g, color.b)
+        # Texture coordinates
+        vertices[..., 9] = i / rings
+        vertices[..., 10] = j / nsides
+        vertices = vertices.reshape((num_vertices, 11))
+
+        # Two triangles per quad
+        p0 = (np.arange(rings).reshape((-1, 1)) * (nsides + 1) + np.arange(nsides).reshape((1, -1))).ravel()
+        p1 = p0 + 1
+        p2 = p0 + (nsides + 1)
+        p3 = p2 + 1
+        indices = np.stack([p0, p1, p2, p1, p3, p2], axis=1).ravel().astype(EBO.indexDtype(num_vertices))
+        return vertices, indices
 
     def draw(self):
+        if self.mesh.procedural:
+            self.mesh.draw(self.shaderProg)
+            return
         self.vao.bind()
         self.ebo.draw()
         self.vao.unbind()
@@ -115,13 +136,14 @@ class DisplayableTorus(Displayable):
         """
         Bind VAO, VBO, and EBO for rendering
         """
-        self.vao.bind()
-        self.vbo.setBuffer(self.vertices, 11)  # 11 attributes per vertex
-        self.ebo.setBuffer(self.indices)
-
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexPos"), stride=11, offset=0, attribSize=3)
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexNormal"), stride=11, offset=3, attribSize=3)
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexColor"), stride=11, offset=6, attribSize=3)
-        self.vbo.setAttribPointer(self.shaderProg.getAttribLocation("vertexTexture"), stride=11, offset=9, attribSize=2)
-
-        self.vao.unbind()
+        # upload every level of the chain which is not uploaded yet
+        for level in range(len(self.lodMeshes)):
+            self.setLodLevel(level)
+            if self.mesh.uploaded:
+                continue
+            self.vao.bind()
+            self.vbo.setVertices(self.vertices, self.vertexLayout, self.shaderProg)
+            self.ebo.setBuffer(self.indices, self.mesh.restartIndex)
+            self.vao.unbind()
+            self.mesh.uploaded = True
+        self.setLodLevel(0)
@@ -33,6 +33,270 @@ except ImportError:
 import numpy as np
 import ctypes
 
+from MemoryBudget import MemoryBudget
+from ResourceManager import ResourceManager
+
+
+class VertexAttribute:
+    """
+    One attribute in a vertex layout, read from a float vertex array and packed into the VBO in the given format
+    """
+    name = None  # attrib name in GLProgram.attribs, like "vertexPos"
+    column = 0  # first column of this attribute in the float vertex array
+    size = 0  # number of components
+    format = "float32"  # a key of VertexLayout.formats
+    default = None  # if every vertex has this value, the attribute is dropped and set as a constant
+    offset = 0  # byte offset in a packed vertex, set by VertexLayout
+
+    def __init__(self, name, column, size, format="float32", default=None):
+        self.name = name
+        self.column = column
+        self.size = size
+        self.format = format
+        self.default = default
+
+    def byteSize(self):
+        """
+        bytes taken in a packed vertex, padded to 4 bytes
+        """
+        if self.format == "snorm10":
+            return 4
+        byteNum = self.size * np.dtype(VertexLayout.formats[self.format][0]).itemsize
+        return (byteNum + 3) // 4 * 4
+
+
+class VertexLayout:
+    """
+    Describe how a float vertex array is packed into an interleaved VBO, and set all attribute pointers from it.
+    Formats:
+        "float32": 32 bits float
+        "float16": half float
+        "snorm10": 3 components normalized into GL_INT_2_10_10_10_REV, for unit vectors like normals
+        "unorm8": normalized unsigned byte, for values in [0, 1] like colors
+    """
+    # format -> (numpy dtype, GL type, normalized)
+    formats = {
+        "float32": (np.float32, gl.GL_FLOAT, gl.GL_FALSE),
+        "float16": (np.float16, gl.GL_HALF_FLOAT, gl.GL_FALSE),
+        "snorm10": (np.uint32, gl.GL_INT_2_10_10_10_REV, gl.GL_TRUE),
+        "unorm8": (np.uint8, gl.GL_UNSIGNED_BYTE, gl.GL_TRUE),
+    }
+
+    attributes = None  # list<VertexAttribute> stored in the VBO
+    dropped = None  # list<VertexAttribute> set as constants instead
+    stride = 0  # bytes per vertex
+
+    def __init__(self, attributes, dropped=None):
+        self.attributes = list(attributes)
+        self.dropped = list(dropped) if dropped else []
+        self.stride = 0
+        for a in self.attributes:
+            a.offset = self.stride
+            self.stride += a.byteSize()
+
+    @staticmethod
+    def standard(compact=True, texture=True):
+        """
+        Layout of the position, normal, color, texture coordinate vertex arrays used by our Displayables
+
+        :param compact: quantize normals and colors, a full vertex takes 28 bytes instead of 44. Positions and texture
+                        coordinates stay float32, half floats would crack large meshes and blur large textures
+        :param texture: whether vertex array has texture coordinates at column 9
+        """
+        attributes = [
+            VertexAttribute("vertexPos", 0, 3, "float32"),
+            VertexAttribute("vertexNormal", 3, 3, "snorm10" if compact else "float32"),
+            VertexAttribute("vertexColor", 6, 3, "unorm8" if compact else "float32", default=(1.0, 1.0, 1.0)),
+        ]
+        if texture:
+            attributes.append(VertexAttribute("vertexTexture", 9, 2, "float32", default=(0.0, 0.0)))
+        return VertexLayout(attributes)
+
+    def forVertices(self, vertices):
+        """
+        Same layout without the attributes that have their default value in every vertex
+        """
+        kept = []
+        dropped = []
+        for a in self.attributes:
+            values = vertices[:, a.column:a.column + a.size]
+            if a.default is not None and np.all(values == np.asarray(a.default, dtype=values.dtype)):
+                dropped.append(a)
+            else:
+                kept.append(VertexAttribute(a.name, a.column, a.size, a.format, a.default))
+        return VertexLayout(kept, self.dropped + dropped)
+
+    def matchesArray(self, vertices):
+        """
+        Whether vertices are already packed in this layout, a C-contiguous float32 array whose columns are exactly
+        the float32 attributes in order
+        """
+        if vertices.ndim != 2 or vertices.dtype != np.float32 or not vertices.flags.c_contiguous:
+            return False
+        if self.stride != 4 * vertices.shape[1]:
+            return False
+        return all(a.format == "float32" and a.offset == 4 * a.column for a in self.attributes)
+
+    def packedCopyBytes(self, vertices):
+        """
+        Bytes pack copies for vertices, 0 when it returns a view of them
+
+        :rtype: int
+        """
+        return 0 if self.matchesArray(vertices) else vertices.shape[0] * self.stride
+
+    def attribute(self, name):
+        """
+        :return: the stored attribute called name, None if it is not stored
+        :rtype: VertexAttribute
+        """
+        for a in self.attributes:
+            if a.name == name:
+                return a
+        return None
+
+    def pack(self, vertices):
+        """
+        :param vertices: (N, K) float vertex array
+        :return: (N, stride) uint8 array of interleaved packed vertices, a view of vertices when they are already
+                 packed in this layout
+        :rtype: numpy.ndarray
+        """
+        vertexNum = vertices.shape[0]
+        if self.matchesArray(vertices):
+            return vertices.view(np.uint8)
+        result = np.zeros((vertexNum, self.stride), dtype=np.uint8)
+        for a in self.attributes:
+            packedBytes = self.packAttribute(a, vertices[:, a.column:a.column + a.size])
+            result[:, a.offset:a.offset + packedBytes.shape[1]] = packedBytes
+        return result
+
+    def packAttribute(self, a, values):
+        """
+        Pack the values of one attribute
+
+        :param a: attribute of this layout
+        :param values: (N, a.size) float values
+        :return: (N, bytes of a) uint8 array, to write at a.offset of each vertex
+        :rtype: numpy.ndarray
+        """
+        values = np.asarray(values, dtype=np.float32).reshape((-1, a.size))
+        vertexNum = values.shape[0]
+        if a.format == "snorm10":
+            # only direction matters, normalize first so long vectors are not clipped
+            length = np.sqrt((values ** 2).sum(axis=1, keepdims=True))
+            values = np.where(length > 0, values / np.maximum(length, 1e-30), values)
+            q = (np.round(np.clip(values, -1, 1) * 511).astype(np.int32) & 0x3FF).astype(np.uint32)
+            packed = (q[:, 0] | (q[:, 1] << 10) | (q[:, 2] << 20)).astype(np.uint32)
+        elif a.format == "unorm8":
+            packed = np.round(np.clip(values, 0, 1) * 255).astype(np.uint8)
+        else:
+            packed = np.ascontiguousarray(values.astype(self.formats[a.format][0]))
+        return packed.view(np.uint8).reshape((vertexNum, -1))
+
+    def setAttribPointers(self, vbo, shaderProg):
+        """
+        Set pointers of stored attributes and constant values of dropped ones. VAO and vbo must be bound.
+        """
+        for a in self.attributes:
+            _, glType, normalized = self.formats[a.format]
+            attribSize = 4 if a.format == "snorm10" else a.size
+            vbo.setAttribFormat(shaderProg.getAttribLocation(a.name), attribSize, glType, normalized,
+                                self.stride, a.offset)
+        for a in self.dropped:
+            attribLoc = shaderProg.getAttribLocation(a.name)
+            if attribLoc < 0:
+                continue
+            gl.glDisableVertexAttribArray(attribLoc)
+            gl.glVertexAttrib4f(attribLoc, *(tuple(a.default) + (0.0, 0.0, 0.0, 1.0)[len(a.default):]))
+
+
+class UploadStats:
+    """
+    Count bytes sent to buffers and textures, and how many of them had to be copied on the CPU before, because they
+    were converted or packed. All counters are class level.
+    """
+    uploads = 0
+    bytesUploaded = 0
+    bytesCopied = 0
+    lastBytesCopied = 0  # bytes copied for the last upload
+
+    @classmethod
+    def record(cls, bytesUploaded, bytesCopied):
+        cls.uploads += 1
+        cls.bytesUploaded += bytesUploaded
+        cls.bytesCopied += bytesCopied
+        cls.lastBytesCopied = bytesCopied
+
+    @classmethod
+    def reset(cls):
+        cls.uploads = 0
+        cls.bytesUploaded = 0
+        cls.bytesCopied = 0
+        cls.lastBytesCopied = 0
+
+    @classmethod
+    def report(cls):
+        """
+        :rtype: str
+        """
+        return (f"{cls.uploads} uploads, {cls.bytesUploaded / 2 ** 20:.2f} MB uploaded, "
+                f"{cls.bytesCopied / 2 ** 20:.2f} MB copied before upload")
+
+
+def uploadView(data, dtype=None, convert=False):
+    """
+    Get data as a C-contiguous numpy array without copying it. Numpy arrays, np.memmap, memoryviews and other
+    buffer objects are accepted.
+
+    :param dtype: required element type, any type if None
+    :param convert: if True, data with another type or layout is converted, otherwise it raises ValueError
+    :return: the array and the bytes copied to make it
+    :rtype: tuple(numpy.ndarray, int)
+    """
+    array = np.asarray(data)
+    if (dtype is None or array.dtype == dtype) and array.flags.c_contiguous:
+        return array, 0
+    if not convert:
+        raise ValueError(f"Expected C-contiguous {np.dtype(dtype) if dtype is not None else 'data'}, got "
+                         f"{'' if array.flags.c_contiguous else 'non contiguous '}{array.dtype}. "
+                         f"Pass convert=True to convert it")
+    array = np.ascontiguousarray(array, dtype=dtype)
+    return array, array.nbytes
+
+
+def dataPointer(array):
+    """
+    Pointer to the data of a contiguous array, so PyOpenGL passes it to GL as it is
+    """
+    return ctypes.c_void_p(array.ctypes.data)
+
+
+def uploadBuffer(target, data, usage, capacity):
+    """
+    Upload data from the start of the buffer bound at target.
+    GL_STATIC_DRAW buffers are reallocated to the size of data. Dynamic and stream buffers keep their storage while
+    data fits and orphan it before writing, so the driver hands out a fresh block instead of waiting for draws
+    still reading the old one. When data does not fit they grow to at least twice their capacity.
+
+    :param data: contiguous numpy array
+    :param usage: usage hint, GL_STATIC_DRAW, GL_DYNAMIC_DRAW or GL_STREAM_DRAW
+    :param capacity: bytes allocated in the buffer now
+    :return: bytes allocated in the buffer after the upload
+    :rtype: int
+    """
+    byteLength = data.nbytes
+    if usage == gl.GL_STATIC_DRAW:
+        gl.glBufferData(target, byteLength, dataPointer(data), usage)
+        return byteLength
+    if byteLength > capacity:
+        capacity = max(byteLength, 2 * capacity)
+    # orphan the old storage, then fill the new one
+    gl.glBufferData(target, capacity, None, usage)
+    if byteLength:
+        gl.glBufferSubData(target, 0, byteLength, dataPointer(data))
+    return capacity
+
 
 class VBO:
     """
@@ -41,35 +305,151 @@ class VBO:
     vbo = None
     vertexAttribSize = 0
     vertexNum = 0
+    byteLength = 0
+    layout = None  # VertexLayout of the buffer if it was set by setVertices
+    packed = None  # CPU copy of the packed vertices, kept by dynamic buffers so single attributes can be rewritten
 
-    def __init__(self):
+    usage = gl.GL_STATIC_DRAW  # usage hint, GL_DYNAMIC_DRAW or GL_STREAM_DRAW for buffers updated often
+    capacity = 0  # bytes allocated, may be more than byteLength for dynamic buffers
+
+    resource = None  # tracking record in ResourceManager
+
+    def __init__(self, usage=gl.GL_STATIC_DRAW):
         self.vbo = gl.glGenBuffers(1)
+        self.usage = usage
+        self.capacity = 0
+        self.resource = ResourceManager.track("buffer", self.vbo, self.delete)
 
     # def __del__(self):
     #     gl.glDeleteBuffers(1, self.vbo)
 
+    def delete(self):
+        if self.vbo is not None:
+            gl.glDeleteBuffers(1, [self.vbo])
+            self.vbo = None
+            ResourceManager.forget(self.resource)
+
     def bind(self):
         gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo)
 
-    def setBuffer(self, bufferDataArray: np.ndarray, vertexAttribSize: int):
+    def setBuffer(self, bufferDataArray, vertexAttribSize: int, convert=False):
         """
         :param vertexAttribSize: the size of the vertex attribute
         :type vertexAttribSize: int
-        :param bufferDataArray: the vertices data. It will be flatten in row-major order if its dimension isn't one
-        :type bufferDataArray: numpy.ndarray
+        :param bufferDataArray: the vertices data in row-major order, a C-contiguous float32 numpy array, np.memmap or
+                                memoryview. It is uploaded without copying
+        :param convert: convert data of other types or layouts to float32 instead of raising ValueError
         """
-        # type conversion
-        if bufferDataArray.dtype != np.dtype("float32"):
-            bufferDataArray = bufferDataArray.astype(np.dtype("float32"))
-        bufferData = bufferDataArray.flatten("C")  # flatten in row-major order
+        bufferData, bytesCopied = uploadView(bufferDataArray, np.dtype("float32"), convert)
         self.vertexAttribSize = vertexAttribSize
 
-        bufferSize = bufferDataArray.size
+        bufferSize = bufferData.size
         self.vertexNum = bufferSize // vertexAttribSize  # for safety reason, take floor division to get int result
-        byteLength = 4 * bufferSize  # 4 is the size of float32
+        self.byteLength = bufferData.nbytes
+
+        self.bind()
+        self.capacity = uploadBuffer(gl.GL_ARRAY_BUFFER, bufferData, self.usage, self.capacity)
+        self.resource.byteSize = self.capacity
+        UploadStats.record(self.byteLength, bytesCopied)
+
+    def setVertices(self, vertices: np.ndarray, layout: VertexLayout, shaderProg):
+        """
+        Pack vertices with layout, upload them and set every attribute pointer. VAO must be bound.
+        Attributes with their default value in all vertices are not uploaded, except in dynamic buffers where
+        later updates may change them.
+
+        :param vertices: (N, K) float vertex array, columns as described by layout
+        :type vertices: numpy.ndarray
+        :param layout: vertex layout declared by the Displayable
+        :type layout: VertexLayout
+        :param shaderProg: program to get attribute locations from
+        """
+        self.layout = layout.forVertices(vertices) if self.usage == gl.GL_STATIC_DRAW else layout
+        bufferData = self.layout.pack(vertices)
+        self.packed = None if self.usage == gl.GL_STATIC_DRAW else bufferData
+        self.vertexAttribSize = 0
+        self.vertexNum = bufferData.shape[0]
+        self.byteLength = bufferData.nbytes
 
         self.bind()
-        gl.glBufferData(gl.GL_ARRAY_BUFFER, byteLength, bufferData, gl.GL_STATIC_DRAW)
+        self.capacity = uploadBuffer(gl.GL_ARRAY_BUFFER, bufferData, self.usage, self.capacity)
+        self.resource.byteSize = self.capacity
+        UploadStats.record(self.byteLength, self.layout.packedCopyBytes(vertices))
+        self.layout.setAttribPointers(self, shaderProg)
+
+    def updateVertices(self, vertices: np.ndarray, firstVertex=0):
+        """
+        Write vertices over the ones from firstVertex on, packed with the layout set by setVertices.
+        Attribute pointers stay as they are, so VAO needs not be bound. Rewriting the whole buffer of a dynamic VBO
+        orphans it, a range is written in place with glBufferSubData.
+
+        :param vertices: (N, K) float vertex array with the same columns as in setVertices
+        :param firstVertex: index of the first vertex to overwrite
+        """
+        bufferData = self.layout.pack(vertices)
+        offsetBytes = firstVertex * self.layout.stride
+        if offsetBytes == 0 and bufferData.nbytes >= self.byteLength:
+            if self.packed is not None:
+                self.packed = bufferData
+            self.vertexNum = bufferData.shape[0]
+            self.byteLength = bufferData.nbytes
+            self.bind()
+            self.capacity = uploadBuffer(gl.GL_ARRAY_BUFFER, bufferData, self.usage, self.capacity)
+            self.resource.byteSize = self.capacity
+            UploadStats.record(bufferData.nbytes, self.layout.packedCopyBytes(vertices))
+        else:
+            if self.packed is not None:
+                self.packed[firstVertex:firstVertex + bufferData.shape[0]] = bufferData
+            self.updateRange(bufferData, offsetBytes)
+
+    def releaseStorage(self):
+        """
+        Free the GPU memory of the buffer but keep its name, so VAOs pointing at it stay valid until it is filled
+        again with setVertices, updateVertices or setBuffer
+        """
+        # through the copy target, so the buffers bound for drawing stay as they are
+        gl.glBindBuffer(gl.GL_COPY_WRITE_BUFFER, self.vbo)
+        gl.glBufferData(gl.GL_COPY_WRITE_BUFFER, 0, None, self.usage)
+        gl.glBindBuffer(gl.GL_COPY_WRITE_BUFFER, 0)
+        self.capacity = 0
+        self.resource.byteSize = 0
+
+    def updateAttribute(self, name, values, firstVertex=0):
+        """
+        Rewrite one attribute of the vertices from firstVertex on. The values are packed at the attribute offset into
+        the CPU copy of the interleaved vertices, then only the rows of those vertices are uploaded with
+        glBufferSubData. Only dynamic buffers set by setVertices keep that copy.
+
+        :param name: attribute name in the layout, like "vertexColor" or "vertexTexture"
+        :param values: (N, size) new values of the attribute
+        """
+        if self.packed is None:
+            raise ValueError("Only dynamic buffers set by setVertices keep the vertices to rewrite attributes in")
+        attribute = self.layout.attribute(name)
+        if attribute is None:
+            raise ValueError(f"Attribute {name} is not stored in the buffer")
+        packedBytes = self.layout.packAttribute(attribute, values)
+        if firstVertex < 0 or firstVertex + packedBytes.shape[0] > self.vertexNum:
+            raise ValueError(f"Vertices {firstVertex}:{firstVertex + packedBytes.shape[0]} are outside of the "
+                             f"{self.vertexNum} vertices of the buffer")
+        rows = self.packed[firstVertex:firstVertex + packedBytes.shape[0]]
+        rows[:, attribute.offset:attribute.offset + packedBytes.shape[1]] = packedBytes
+        self.updateRange(rows, firstVertex * self.layout.stride)
+
+    def updateRange(self, data, offsetBytes=0, convert=False):
+        """
+        Overwrite bytes of the buffer from offsetBytes with data, without reallocating it
+
+        :param data: C-contiguous array or buffer, already in the packed format of the buffer
+        :param convert: make non contiguous data contiguous instead of raising ValueError
+        """
+        data, bytesCopied = uploadView(data, None, convert)
+        if offsetBytes < 0 or offsetBytes + data.nbytes > self.byteLength:
+            raise ValueError(f"Range {offsetBytes}:{offsetBytes + data.nbytes} is outside of the "
+                             f"{self.byteLength} bytes of the buffer")
+        self.bind()
+        gl.glBufferSubData(gl.GL_ARRAY_BUFFER, offsetBytes, data.nbytes, dataPointer(data))
+        UploadStats.record(data.nbytes, bytesCopied)
 
     def setAttribPointer(self, attribLoc, stride=0, offset=0, attribSize=0):
         attribSize = self.vertexAttribSize if attribSize == 0 else attribSize
@@ -88,10 +468,181 @@ class VBO:
         gl.glVertexAttribPointer(attribLoc, attribSize, gl.GL_FLOAT, gl.GL_FALSE, stride, offset)
         gl.glEnableVertexAttribArray(attribLoc)
 
+    def setAttribFormat(self, attribLoc, attribSize, glType, normalized, strideBytes, offsetBytes):
+        """
+        Same as setAttribPointer, with any GL type and with stride and offset in bytes
+        """
+        if attribLoc < 0:
+            print("Warning: Cannot set attrib pointer at ", attribLoc)
+            return
+
+        self.bind()
+        gl.glVertexAttribPointer(attribLoc, attribSize, glType, normalized, strideBytes,
+                                 ctypes.c_void_p(offsetBytes))
+        gl.glEnableVertexAttribArray(attribLoc)
+
     def draw(self):
         gl.glDrawArrays(gl.GL_TRIANGLES, 0, self.vertexNum)
 
 
+class RingVBO(VBO):
+    """
+    Vertex buffer for geometry written anew every frame, like debug lines or particles. It is split in one region
+    per frame in flight, the CPU writes the region of this frame while the GPU still reads the ones of the frames
+    before. A fence placed after each frame's draws guards its region, the CPU only waits on it when it comes back
+    to the region framesInFlight frames later, so normally it never waits.
+    The buffer is persistently mapped with ARB_buffer_storage when the context has it, otherwise every write maps
+    its range unsynchronized.
+
+    Call RingVBO.endFrame() once per frame, after the draws.
+    """
+    frame = 0  # frames ended so far, shared by every ring
+    rings = []  # rings alive, to fence at the end of the frame
+
+    regionSize = 0  # bytes per frame
+    framesInFlight = 3
+    persistent = False  # mapped once for the life of the buffer
+    mappedAddress = None  # address of the persistent mapping
+
+    firstVertex = 0  # first vertex written by the last updateVertices, drawn by draw
+    region = 0  # region written in this frame
+    regionFrame = -1  # frame the current region belongs to
+    cursor = 0  # next free byte in the current region
+    fences = None  # sync object of each region, None if not fenced
+
+    def __init__(self, regionSize=1 << 20, framesInFlight=3, persistent=None):
+        """
+        :param regionSize: most bytes written in one frame
+        :param framesInFlight: frames the GPU may lag behind, 2 or 3
+        :param persistent: force persistent mapping on or off, by default it is used when available
+        """
+        with ResourceManager.categorized("streaming"):
+            super(RingVBO, self).__init__(gl.GL_STREAM_DRAW)
+        self.regionSize = regionSize
+        self.framesInFlight = framesInFlight
+        self.region = 0
+        self.regionFrame = -1
+        self.cursor = 0
+        self.fences = [None] * framesInFlight
+        self.byteLength = regionSize * framesInFlight
+        self.capacity = self.byteLength
+        self.resource.byteSize = self.capacity
+
+        if persistent is None:
+            from OpenGL.GL.ARB.buffer_storage import glInitBufferStorageARB
+            persistent = bool(glInitBufferStorageARB())
+        self.persistent = persistent
+
+        self.bind()
+        if self.persistent:
+            flags = gl.GL_MAP_WRITE_BIT | gl.GL_MAP_PERSISTENT_BIT | gl.GL_MAP_COHERENT_BIT
+            gl.glBufferStorage(gl.GL_ARRAY_BUFFER, self.byteLength, None, flags)
+            address = gl.glMapBufferRange(gl.GL_ARRAY_BUFFER, 0, self.byteLength, flags)
+            self.mappedAddress = ctypes.cast(address, ctypes.c_void_p).value
+        else:
+            gl.glBufferData(gl.GL_ARRAY_BUFFER, self.byteLength, None, gl.GL_STREAM_DRAW)
+        RingVBO.rings.append(self)
+
+    def delete(self):
+        for fence in self.fences:
+            if fence is not None:
+                gl.glDeleteSync(fence)
+        self.fences = [None] * self.framesInFlight
+        if self.vbo is not None and self.persistent:
+            self.bind()
+            gl.glUnmapBuffer(gl.GL_ARRAY_BUFFER)
+            self.mappedAddress = None
+        if self in RingVBO.rings:
+            RingVBO.rings.remove(self)
+        super(RingVBO, self).delete()
+
+    def nextRegion(self):
+        """
+        Move to the region of the current frame, waiting for the GPU if it still reads that region
+        """
+        self.region = (self.region + 1) % self.framesInFlight
+        self.regionFrame = RingVBO.frame
+        self.cursor = 0
+        fence = self.fences[self.region]
+        if fence is not None:
+            while gl.glClientWaitSync(fence, gl.GL_SYNC_FLUSH_COMMANDS_BIT, 1000000000) == gl.GL_TIMEOUT_EXPIRED:
+                pass
+            gl.glDeleteSync(fence)
+            self.fences[self.region] = None
+
+    def write(self, data, stride=None):
+        """
+        Write data in this frame's region, aligned so it starts at a whole element of its size
+
+        :param data: C-contiguous array or buffer, already in the format the attribute pointers read
+        :param stride: bytes per element, the size of one row of data by default
+        :return: index of the first written element from the start of the buffer, to pass to glDrawArrays as first,
+                 or as base vertex to glDrawElementsBaseVertex
+        :rtype: int
+        """
+        if self.regionFrame != RingVBO.frame:
+            self.nextRegion()
+        data, _ = uploadView(data)
+        if stride is None:
+            stride = data.nbytes // data.shape[0] if data.ndim > 1 and data.shape[0] else data.itemsize
+        regionStart = self.region * self.regionSize
+        offsetBytes = -(-(regionStart + self.cursor) // stride) * stride
+        if offsetBytes + data.nbytes > regionStart + self.regionSize:
+            raise ValueError(f"Frame writes more than the {self.regionSize} bytes of a ring region")
+        self.cursor = offsetBytes + data.nbytes - regionStart
+
+        if self.persistent:
+            ctypes.memmove(self.mappedAddress + offsetBytes, data.ctypes.data, data.nbytes)
+        else:
+            self.bind()
+            address = gl.glMapBufferRange(gl.GL_ARRAY_BUFFER, offsetBytes, data.nbytes,
+                                          gl.GL_MAP_WRITE_BIT | gl.GL_MAP_UNSYNCHRONIZED_BIT |
+                                          gl.GL_MAP_INVALIDATE_RANGE_BIT)
+            ctypes.memmove(ctypes.cast(address, ctypes.c_void_p).value, data.ctypes.data, data.nbytes)
+            gl.glUnmapBuffer(gl.GL_ARRAY_BUFFER)
+        UploadStats.record(data.nbytes, 0)
+        return offsetBytes // stride
+
+    def setVertices(self, vertices: np.ndarray, layout: VertexLayout, shaderProg):
+        """
+        Set attribute pointers for layout and write vertices in this frame's region. VAO must be bound.
+        Every attribute of layout is stored.
+
+        :return: first vertex of the written vertices, see write
+        :rtype: int
+        """
+        self.layout = layout
+        self.vertexAttribSize = 0
+        self.bind()
+        self.layout.setAttribPointers(self, shaderProg)
+        return self.updateVertices(vertices)
+
+    def updateVertices(self, vertices: np.ndarray, firstVertex=0):
+        """
+        Write vertices of this frame packed with the layout from setVertices, firstVertex is ignored
+
+        :return: first vertex of the written vertices, see write
+        :rtype: int
+        """
+        bufferData = self.layout.pack(vertices)
+        self.vertexNum = bufferData.shape[0]
+        self.firstVertex = self.write(bufferData, self.layout.stride)
+        return self.firstVertex
+
+    def draw(self, mode=gl.GL_TRIANGLES):
+        gl.glDrawArrays(mode, self.firstVertex, self.vertexNum)
+
+    @classmethod
+    def endFrame(cls):
+        """
+        Fence the regions written in this frame, call once per frame after its draws
+        """
+        for ring in cls.rings:
+            if ring.regionFrame == cls.frame:
+                ring.fences[ring.region] = gl.glFenceSync(gl.GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        cls.frame += 1
+
+
 class EBO:
     """
     A class to handle EBO in OpenGL, with some help functions
@@ -100,29 +651,134 @@ class EBO:
     indexNum = 0
     triangleNum = 0
 
-    def __init__(self):
+    # index dtypes uploaded as they are, with their GL type
+    indexTypes = {np.dtype("uint16"): gl.GL_UNSIGNED_SHORT,
+                  np.dtype("uint32"): gl.GL_UNSIGNED_INT,
+                  np.dtype("int32"): gl.GL_UNSIGNED_INT}
+    indexType = gl.GL_UNSIGNED_INT
+    bufferDtype = np.dtype("uint32")  # dtype the indices were set with, updateRange takes the same
+    restartIndex = None  # not None when indices are triangle strips separated by primitive restart
+
+    usage = gl.GL_STATIC_DRAW  # usage hint, see VBO
+    capacity = 0  # bytes allocated
+    byteLength = 0  # bytes of indices in use
+
+    resource = None  # tracking record in ResourceManager
+
+    def __init__(self, usage=gl.GL_STATIC_DRAW):
         self.ebo = gl.glGenBuffers(1)
+        self.usage = usage
+        self.capacity = 0
+        self.resource = ResourceManager.track("buffer", self.ebo, self.delete)
 
     # def __del__(self):
     #     gl.glDeleteBuffers(1, self.ebo)
 
+    def delete(self):
+        if self.ebo is not None:
+            gl.glDeleteBuffers(1, [self.ebo])
+            self.ebo = None
+            ResourceManager.forget(self.resource)
+
     def bind(self):
         gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, self.ebo)
 
-    def setBuffer(self, bufferDataArray: np.ndarray):
-        if bufferDataArray.dtype != np.dtype("int32"):
-            bufferDataArray = bufferDataArray.astype(np.dtype("int32"))
-        bufferData = bufferDataArray.flatten("C")  # row-major order flatten
+    @staticmethod
+    def indexDtype(vertexNum):
+        """
+        Smallest index type able to address vertexNum vertices, uint16 when it fits, otherwise int32
+
+        :param vertexNum: number of vertices the indices will refer to
+        :type vertexNum: int
+        :rtype: numpy.dtype
+        """
+        return np.dtype("uint16") if vertexNum <= 65536 else np.dtype("int32")
 
+    def setBuffer(self, bufferDataArray, restartIndex=None, convert=False):
+        """
+        :param bufferDataArray: triangle indices in row-major order, a C-contiguous uint16, uint32 or int32 numpy
+                                array, np.memmap or memoryview. It is uploaded without copying
+        :param restartIndex: if given, indices are triangle strips separated by this primitive restart index
+        :type restartIndex: int
+        :param convert: convert indices of other types or layouts to the smallest type which fits instead of raising
+                        ValueError
+        """
+        bufferData = np.asarray(bufferDataArray)
+        dtype = bufferData.dtype
+        if dtype not in self.indexTypes:
+            if not convert:
+                raise ValueError(f"Index type {dtype} is not uint16, uint32 or int32. Pass convert=True to convert it")
+            dtype = self.indexDtype(int(bufferData.max()) + 1 if bufferData.size else 0)
+        bufferData, bytesCopied = uploadView(bufferData, dtype, convert)
+        bufferData = bufferData.reshape(-1)
+
+        self.indexType = self.indexTypes[bufferData.dtype]
+        self.bufferDtype = bufferData.dtype
         self.indexNum = bufferData.size
-        self.triangleNum = self.indexNum // 3  # floor division to get triangle number
-        byteLength = 4 * self.indexNum
+        self.restartIndex = restartIndex
+        if restartIndex is None:
+            self.triangleNum = self.indexNum // 3  # floor division to get triangle number
+        else:
+            # every strip gives its length minus 2 triangles
+            restartNum = int(np.count_nonzero(bufferData == restartIndex))
+            self.triangleNum = max(0, self.indexNum - restartNum - 2 * (restartNum + 1))
+        self.byteLength = bufferData.nbytes
+
+        self.bind()
+        self.capacity = uploadBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, bufferData, self.usage, self.capacity)
+        self.resource.byteSize = self.capacity
+        UploadStats.record(self.byteLength, bytesCopied)
+
+    def releaseStorage(self):
+        """
+        Free the GPU memory of the buffer but keep its name, so VAOs holding it stay valid until setBuffer fills it
+        again
+        """
+        # not through the element array target, which is state of the bound VAO
+        gl.glBindBuffer(gl.GL_COPY_WRITE_BUFFER, self.ebo)
+        gl.glBufferData(gl.GL_COPY_WRITE_BUFFER, 0, None, self.usage)
+        gl.glBindBuffer(gl.GL_COPY_WRITE_BUFFER, 0)
+        self.capacity = 0
+        self.resource.byteSize = 0
 
+    def updateRange(self, indices, firstIndex=0, convert=False):
+        """
+        Overwrite indices from firstIndex on with glBufferSubData. Index count and primitive restart stay the same.
+        VAO must be bound, as it holds the element buffer binding.
+
+        :param indices: new indices, C-contiguous in the dtype the buffer was set with
+        :param convert: convert indices of other types or layouts instead of raising ValueError
+        """
+        bufferData, bytesCopied = uploadView(indices, self.bufferDtype, convert)
+        bufferData = bufferData.reshape(-1)
+        offsetBytes = firstIndex * bufferData.itemsize
+        if firstIndex < 0 or offsetBytes + bufferData.nbytes > self.byteLength:
+            raise ValueError(f"Indices {firstIndex}:{firstIndex + bufferData.size} are outside of the "
+                             f"{self.indexNum} indices of the buffer")
         self.bind()
-        gl.glBufferData(gl.GL_ELEMENT_ARRAY_BUFFER, byteLength, bufferData, gl.GL_STATIC_DRAW)
+        gl.glBufferSubData(gl.GL_ELEMENT_ARRAY_BUFFER, offsetBytes, bufferData.nbytes, dataPointer(bufferData))
+        UploadStats.record(bufferData.nbytes, bytesCopied)
 
     def draw(self):
-        gl.glDrawElements(gl.GL_TRIANGLES, self.indexNum, gl.GL_UNSIGNED_INT, None)
+        if self.restartIndex is None:
+            gl.glDrawElements(gl.GL_TRIANGLES, self.indexNum, self.indexType, None)
+        else:
+            gl.glEnable(gl.GL_PRIMITIVE_RESTART)
+            gl.glPrimitiveRestartIndex(self.restartIndex)
+            gl.glDrawElements(gl.GL_TRIANGLE_STRIP, self.indexNum, self.indexType, None)
+            gl.glDisable(gl.GL_PRIMITIVE_RESTART)
+
+    def drawInstanced(self, instanceNum):
+        """
+        Draw instanceNum instances of the indices, VAO must be bound with instanced attributes set
+        """
+        if self.restartIndex is None:
+            gl.glDrawElementsInstanced(gl.GL_TRIANGLES, self.indexNum, self.indexType, None, instanceNum)
+        else:
+            gl.glEnable(gl.GL_PRIMITIVE_RESTART)
+            gl.glPrimitiveRestartIndex(self.restartIndex)
+            gl.glDrawElementsInstanced(gl.GL_TRIANGLE_STRIP, self.indexNum, self.indexType, None, instanceNum)
+            gl.glDisable(gl.GL_PRIMITIVE_RESTART)
 
 
 class VAO:
@@ -130,13 +786,21 @@ class VAO:
     Responsible for VAO
     """
     vao = None
+    resource = None  # tracking record in ResourceManager
 
     def __init__(self):
         self.vao = gl.glGenVertexArrays(1)
+        self.resource = ResourceManager.track("vertexArray", self.vao, self.delete)
 
     # def __del__(self):
     #     gl.glDeleteVertexArrays(1, self.vao)
 
+    def delete(self):
+        if self.vao is not None:
+            gl.glDeleteVertexArrays(1, [self.vao])
+            self.vao = None
+            ResourceManager.forget(self.resource)
+
     def bind(self):
         gl.glBindVertexArray(self.vao)
 
@@ -144,53 +808,541 @@ class VAO:
         gl.glBindVertexArray(0)
 
 
-# A global variable in this scope to store next texture id, there should be no duplicate textureUnitID
-NextTextureID = 1
+class InstanceBuffer(VBO):
+    """
+    Values of each instance of an instanced draw, read by attributes with divisor 1 when the instanceData uniform is
+    set. A row of rowSize floats per instance: model matrix applied before modelMat, mesh color, material highlight,
+    then material ambient, diffuse and specular.
+    """
+    rowSize = 32
+    # (attribute, vec4 columns, first float of the row)
+    attributes = (("instanceModelMat", 4, 0), ("instanceColor", 1, 16), ("instanceAmbient", 1, 20),
+                  ("instanceDiffuse", 1, 24), ("instanceSpecular", 1, 28))
 
-class Texture:
+    instanceNum = 0
+
+    def __init__(self, usage=gl.GL_DYNAMIC_DRAW):
+        with ResourceManager.categorized("instances"):
+            super(InstanceBuffer, self).__init__(usage)
+        self.instanceNum = 0
+
+    @staticmethod
+    def materialRow(material):
+        """
+        Last 13 floats of a row for material
+
+        :param material: Material
+        :rtype: numpy.ndarray
+        """
+        return np.concatenate(((material.highLight,), material.ambient, material.diffuse,
+                               material.specular)).astype(np.float32)
+
+    @classmethod
+    def rows(cls, modelMats, colors, materialRows):
+        """
+        Rows of instances
+
+        :param modelMats: (N, 4, 4) column-major model matrices
+        :param colors: (N, 3) mesh colors, or one color for all
+        :param materialRows: (N, 13) rows of materialRow, or one for all
+        :rtype: numpy.ndarray
+        """
+        modelMats = np.asarray(modelMats)
+        rows = np.empty((modelMats.shape[0], cls.rowSize), dtype=np.float32)
+        rows[:, 0:16] = modelMats.reshape(-1, 16)
+        rows[:, 16:19] = colors
+        rows[:, 19:32] = materialRows
+        return rows
+
+    def setInstances(self, rows):
+        """
+        Upload instance rows over the ones before
+
+        :param rows: (N, rowSize) float32 rows, see rows
+        """
+        bufferData, bytesCopied = uploadView(rows, np.dtype("float32"), True)
+        self.instanceNum = bufferData.shape[0]
+        self.byteLength = bufferData.nbytes
+        self.bind()
+        self.capacity = uploadBuffer(gl.GL_ARRAY_BUFFER, bufferData, self.usage, self.capacity)
+        self.resource.byteSize = self.capacity
+        UploadStats.record(self.byteLength, bytesCopied)
+
+    def setAttribPointers(self, shaderProg):
+        """
+        Point the instanced attributes to this buffer, VAO must be bound
+        """
+        for name, columns, first in self.attributes:
+            attribLoc = shaderProg.getAttribLocation(name)
+            if attribLoc < 0:
+                continue
+            for column in range(columns):
+                self.setAttribFormat(attribLoc + column, 4, gl.GL_FLOAT, gl.GL_FALSE, 4 * self.rowSize,
+                                     4 * (first + 4 * column))
+                gl.glVertexAttribDivisor(attribLoc + column, 1)
+
+
+class TextureUnits:
     """
-    Packed help functions to deal with texture mapping in OpenGL, can be used to store multiple textures
+    Allocator of texture image units. A texture bound for drawing gets a unit of its own and stays bound there, so
+    drawing it again only points the sampler at its unit. When every unit is taken, the unit used longest ago is
+    handed over, so two textures never share a unit. All methods are class level.
+    Unit 0 is never handed out and stays the active unit, texture uploads and other GL work bind textures there.
     """
-    textureName = 0
-    textureUnitID = 0
+    scratchUnit = 0
+    emptyTexture2D = 1  # nothing is bound here, for sampler2D uniforms not in use
+    emptyTextureArray = 2  # same for sampler2DArray uniforms, samplers of different types must not share a unit
+    firstUnit = 3
 
-    def __init__(self):
-        global NextTextureID
+    unitNum = 0  # GL_MAX_COMBINED_TEXTURE_IMAGE_UNITS, read on first use
+    bound = {}  # (target, textureName) -> unit it is bound to
+    owners = []  # unit -> (target, textureName) bound there, or None
+    lastUse = []  # unit -> value of useCount when it was last bound, 0 for free units
+    useCount = 0
+
+    # sampler uniforms of GLProgram and the target of the textures they sample
+    samplers = {"textureImage": gl.GL_TEXTURE_2D, "textureArray": gl.GL_TEXTURE_2D_ARRAY,
+                "virtualPages": gl.GL_TEXTURE_2D, "virtualIndirection": gl.GL_TEXTURE_2D_ARRAY}
+
+    @classmethod
+    def setSamplers(cls, shaderProg, **textureNames):
+        """
+        Bind textures and point the sampler uniforms of shaderProg at their units. Samplers not given are pointed at
+        the empty unit of their type, so no two samplers of different types are left on one unit.
+
+        :param textureNames: sampler name in GLProgram attribs -> GL name of the texture it samples
+        """
+        for sampler, target in cls.samplers.items():
+            textureName = textureNames.get(sampler)
+            if textureName is not None:
+                unit = cls.bind(target, textureName)
+            elif target == gl.GL_TEXTURE_2D:
+                unit = cls.emptyTexture2D
+            else:
+                unit = cls.emptyTextureArray
+            shaderProg.setInt(sampler, unit)
 
-        # assign a texture image unit for this sampler
-        self.textureUnitID = NextTextureID
-        NextTextureID = NextTextureID % 16 + 1
+    @classmethod
+    def bind(cls, target, textureName):
+        """
+        :return: unit textureName is bound to, bound to a free or the least recently used unit first if needed
+        :rtype: int
+        """
+        if not cls.owners:
+            cls.unitNum = int(gl.glGetIntegerv(gl.GL_MAX_COMBINED_TEXTURE_IMAGE_UNITS))
+            cls.owners = [None] * cls.unitNum
+            cls.lastUse = [0] * cls.unitNum
+        cls.useCount += 1
+        key = (target, textureName)
+        unit = cls.bound.get(key)
+        if unit is None:
+            unit = min(range(cls.firstUnit, cls.unitNum), key=cls.lastUse.__getitem__)
+            if cls.owners[unit] is not None:
+                del cls.bound[cls.owners[unit]]
+            cls.owners[unit] = key
+            cls.bound[key] = unit
+            gl.glActiveTexture(gl.GL_TEXTURE0 + unit)
+            gl.glBindTexture(target, textureName)
+            gl.glActiveTexture(gl.GL_TEXTURE0 + cls.scratchUnit)
+        cls.lastUse[unit] = cls.useCount
+        return unit
 
-    def setTextureImage(self, image):
+    @classmethod
+    def release(cls, target, textureName):
+        """
+        Free the unit of a texture being deleted, GL unbinds deleted textures by itself
+        """
+        unit = cls.bound.pop((target, textureName), None)
+        if unit is not None:
+            cls.owners[unit] = None
+            cls.lastUse[unit] = 0
+
+    @classmethod
+    def contextChanged(cls):
+        """
+        Forget every unit, call it whenever a GL context is made. Units of a new context have nothing bound, and the
+        names recorded may be given again to textures of this one. The unit count is read again on first use.
+        """
+        cls.unitNum = 0
+        cls.bound = {}
+        cls.owners = []
+        cls.lastUse = []
+        cls.useCount = 0
+
+
+class TextureArray:
+    """
+    GL_TEXTURE_2D_ARRAY of same sized RGB images. Textures of many Components can be layers of one array, then they
+    all draw from one bound texture and only the layer index changes between draws.
+    Arrays are shared by layer size through acquireLayer. Every layer in use holds a reference to its array in
+    ResourceManager, so an array is deleted when its last layer is released.
+    Like Texture, layers are sampled without mipmaps, so only one level is stored.
+    """
+    layersPerArray = 16  # layers of each new array, at most GL_MAX_ARRAY_TEXTURE_LAYERS
+    arrays = {}  # (width, height) -> list<TextureArray> with layers of that size
+
+    textureName = 0
+    width = 0
+    height = 0
+    layerNum = 0
+    freeLayers = None  # list<int> of layers not in use, lowest last
+    resource = None  # tracking record in ResourceManager
+
+    def __init__(self, width, height, layerNum):
+        self.width = width
+        self.height = height
+        self.layerNum = layerNum
+        self.freeLayers = list(range(layerNum - 1, -1, -1))
         self.textureName = gl.glGenTextures(1)
+        # RGB is stored as 4 bytes per texel
+        self.resource = ResourceManager.track("texture", self.textureName, self.delete, width * height * 4 * layerNum)
+        gl.glBindTexture(gl.GL_TEXTURE_2D_ARRAY, self.textureName)
+        gl.glTexImage3D(gl.GL_TEXTURE_2D_ARRAY, 0, gl.GL_RGB, width, height, layerNum, 0, gl.GL_RGB,
+                        gl.GL_UNSIGNED_BYTE, None)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D_ARRAY, gl.GL_TEXTURE_MAX_LEVEL, 0)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D_ARRAY, gl.GL_TEXTURE_WRAP_S, gl.GL_REPEAT)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D_ARRAY, gl.GL_TEXTURE_WRAP_T, gl.GL_REPEAT)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D_ARRAY, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D_ARRAY, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR)
 
-        # flip image upside down.
-        # trim to RGB channels, even if a channel provided
-        image = image[::-1, :, 0:3]
-        image = image.astype(np.dtype("uint8"))
+    @classmethod
+    def acquireLayer(cls, width, height):
+        """
+        Take a free layer for a width x height image, in a new array if all arrays of that size are full
 
+        :rtype: tuple(TextureArray, int)
+        """
+        group = cls.arrays.setdefault((width, height), [])
+        for array in group:
+            if array.freeLayers:
+                ResourceManager.retain(array.resource)
+                return array, array.freeLayers.pop()
+        layerNum = min(cls.layersPerArray, int(gl.glGetIntegerv(gl.GL_MAX_ARRAY_TEXTURE_LAYERS)))
+        # shared by the textures of every scene, made with the reference of its first layer
+        with ResourceManager.ownedBy(None), ResourceManager.categorized("textureArray"):
+            array = TextureArray(width, height, layerNum)
+        group.append(array)
+        return array, array.freeLayers.pop()
+
+    def releaseLayer(self, layer):
+        self.freeLayers.append(layer)
+        if self.resource is not None:
+            ResourceManager.release(self.resource)
+
+    def delete(self):
+        if self.resource is not None:
+            TextureUnits.release(gl.GL_TEXTURE_2D_ARRAY, self.textureName)
+            gl.glDeleteTextures([self.textureName])
+            ResourceManager.forget(self.resource)
+            self.resource = None
+            group = TextureArray.arrays.get((self.width, self.height), [])
+            if self in group:
+                group.remove(self)
+
+
+class Texture:
+    """
+    Packed help functions to deal with texture mapping in OpenGL, can be used to store multiple textures.
+    A packed texture is a layer of a shared TextureArray instead of a texture of its own.
+    """
+    textureName = 0  # GL name of the texture, or of the TextureArray holding it when packed
+    resource = None  # tracking record in ResourceManager, None until an image is set
+    ready = False  # has an image to sample from, the placeholder is bound until then
+    streamJob = None  # upload of this texture in progress in TextureStreamer
+    packed = False  # the next image set goes into a TextureArray layer
+    array = None  # TextureArray holding this texture, None if it is not packed
+    layer = -1
+    internalFormat = gl.GL_RGB  # or a compressed format, see allocate
+    width = 0  # of mip level 0, set by allocate
+    height = 0
+    levelNum = 0
+
+    # see MemoryBudget, only textures loaded with TextureStreamer can be evicted, they are loaded again on bind
+    reload = None  # callable which starts loading the image again, with refine=True only the dropped levels
+    priority = MemoryBudget.RESIDENT  # CACHED while only TextureCache holds it
+    lastUse = 0
+    evicted = False
+    droppedLevels = 0  # finest mip levels freed by reduce, the texture samples from the next one
+
+    flipBandBytes = 4 << 20  # flipped images are copied and uploaded in bands of rows of about this size
+
+    placeholderTexture = None  # 1x1 grey texture bound in place of textures not ready yet
+    placeholderColor = (128, 128, 128)
+
+    def __init__(self, packed=False):
+        # a texture unit is only taken when the texture is bound, see TextureUnits
+        self.packed = packed
+
+    @property
+    def target(self):
+        return gl.GL_TEXTURE_2D if self.array is None else gl.GL_TEXTURE_2D_ARRAY
+
+    @property
+    def byteSize(self):
+        """
+        :return: estimated GPU memory of the image, its share of the TextureArray when packed
+        :rtype: int
+        """
+        if self.array is not None:
+            return self.array.width * self.array.height * 4
+        return self.resource.byteSize if self.resource is not None else 0
+
+    def levelBytes(self, level):
+        """
+        :return: estimated GPU memory of one mip level
+        :rtype: int
+        """
+        texelBytes = 4 if self.internalFormat == gl.GL_RGB else 0.5
+        return int(max(self.width >> level, 1) * max(self.height >> level, 1) * texelBytes)
+
+    @property
+    def detailBytes(self):
+        """
+        :return: GPU memory reduce frees, the finest level left of a streamed texture which is fully shown, 0 if there
+                 is none
+        :rtype: int
+        """
+        if self.reload is None or self.array is not None or not self.ready or self.streamJob is not None or \
+                self.droppedLevels >= self.levelNum - 1:
+            return 0
+        return self.levelBytes(self.droppedLevels)
+
+    @property
+    def reduced(self):
+        return self.droppedLevels > 0
+
+    def setTextureImage(self, image, flip=True, convert=False):
+        """
+        Upload an image as this texture, with mipmaps unless it is packed. The image memory is read as it is,
+        without copying, unless it has to be flipped.
+
+        :param image: (height, width, 3 or 4) C-contiguous uint8 numpy array, np.memmap or buffer, top row first.
+                      Only RGB channels are kept on GPU
+        :param flip: image rows go from top to bottom, as decoded from files. They are flipped in bands of
+                     flipBandBytes, since OpenGL textures start at the bottom row
+        :param convert: convert images of other types or layouts instead of raising ValueError
+        """
+        image, bytesCopied = uploadView(image, np.dtype("uint8"), convert)
+        if image.ndim != 3 or image.shape[2] not in (3, 4):
+            raise ValueError(f"Expected an image of shape (height, width, 3 or 4), got {image.shape}")
         height, width, channel = image.shape
-        imageData = image.flatten("C")
+        pixelFormat = gl.GL_RGB if channel == 3 else gl.GL_RGBA
+
+        if self.packed:
+            self.allocateLayer(width, height)
+        else:
+            self.allocate(width, height, 1)
+        gl.glBindTexture(self.target, self.textureName)
+        # rows of RGB images are not 4 bytes aligned in general
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
+        if flip:
+            rows = max(1, self.flipBandBytes // (width * channel))
+            for top in range(0, height, rows):
+                band = np.ascontiguousarray(image[top:top + rows][::-1])
+                self.writeRows(0, height - top - band.shape[0], width, band.shape[0], dataPointer(band), pixelFormat)
+            bytesCopied += image.nbytes
+        else:
+            self.writeRows(0, 0, width, height, dataPointer(image), pixelFormat)
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 4)
+        UploadStats.record(image.nbytes, bytesCopied)
+        if self.array is None:
+            gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAX_LEVEL, 1000)
+            gl.glGenerateMipmap(gl.GL_TEXTURE_2D)
+        self.ready = True
 
+    def allocate(self, width, height, levelNum, internalFormat=gl.GL_RGB):
+        """
+        Make empty storage for an image and its mip levels, to be filled level by level with writeRows.
+        The texture stays not ready, call showLevel for each level filled.
+
+        :param levelNum: number of mip levels, halving the size from width x height
+        :param internalFormat: GL_RGB, or a compressed RGB format like BC1 taking half a byte per texel
+        """
+        self.delete()
+        self.textureName = gl.glGenTextures(1)
+        self.internalFormat = internalFormat
+        self.width = width
+        self.height = height
+        self.levelNum = levelNum
+        # RGB is stored as 4 bytes per texel, mipmaps add a third
+        texelBytes = 4 if internalFormat == gl.GL_RGB else 0.5
+        self.resource = ResourceManager.track("texture", self.textureName, self.delete,
+                                              int(width * height * texelBytes * 4 / 3))
         gl.glBindTexture(gl.GL_TEXTURE_2D, self.textureName)
-        gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_RGB, width, height, 0, gl.GL_RGB, gl.GL_UNSIGNED_BYTE, imageData)
-        gl.glGenerateMipmap(gl.GL_TEXTURE_2D)
+        for level in range(levelNum):
+            gl.glTexImage2D(gl.GL_TEXTURE_2D, level, internalFormat, max(width >> level, 1), max(height >> level, 1),
+                            0, gl.GL_RGB, gl.GL_UNSIGNED_BYTE, None)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_BASE_LEVEL, levelNum - 1)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAX_LEVEL, levelNum - 1)
         self.setTextureParameters()
+        self.ready = False
+
+    def allocateLayer(self, width, height):
+        """
+        Take a free layer of a shared TextureArray for a width x height image, to be filled with writeRows.
+        The texture stays not ready, call showLevel(0) once the layer is filled.
+        """
+        self.delete()
+        self.array, self.layer = TextureArray.acquireLayer(width, height)
+        self.internalFormat = gl.GL_RGB
+        self.textureName = self.array.textureName
+        # the memory is counted on the array
+        self.resource = ResourceManager.track("textureLayer", self.layer, self.delete)
+        self.ready = False
+
+    def writeRows(self, level, y, width, rows, pixels, pixelFormat=gl.GL_RGB, byteLength=0):
+        """
+        Write rows [y, y + rows) of a mip level, counted from the bottom. The texture must be bound to its target.
+        Compressed textures are written in whole rows of blocks, y must be a multiple of the block height.
+
+        :param pixels: pointer to the unsigned byte pixels or compressed blocks, or offset in the bound pixel unpack
+                       buffer
+        :param byteLength: size of the compressed blocks, not needed for pixels
+        """
+        if self.internalFormat != gl.GL_RGB:
+            # the PyOpenGL wrapper takes the size from the data, which an unpack buffer offset does not have
+            gl.glCompressedTexSubImage2D.wrappedOperation(gl.GL_TEXTURE_2D, level, 0, y, width, rows,
+                                                          self.internalFormat, byteLength, pixels)
+        elif self.array is None:
+            gl.glTexSubImage2D(gl.GL_TEXTURE_2D, level, 0, y, width, rows, pixelFormat, gl.GL_UNSIGNED_BYTE, pixels)
+        else:
+            gl.glTexSubImage3D(gl.GL_TEXTURE_2D_ARRAY, level, 0, y, self.layer, width, rows, 1, pixelFormat,
+                               gl.GL_UNSIGNED_BYTE, pixels)
+
+    def showLevel(self, level):
+        """
+        Sample from a mip level once it is filled, and from finer levels when they are. The texture must be bound.
+        """
+        if self.array is None:
+            gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_BASE_LEVEL, level)
+        self.ready = True
+
+    @classmethod
+    def placeholder(cls):
+        """
+        :return: name of the shared placeholder texture, made on first use
+        :rtype: int
+        """
+        # made again if it was released, like after ResourceManager.releaseAll
+        if cls.placeholderTexture is None or not cls.placeholderTexture.ready:
+            with ResourceManager.ownedBy(None):
+                cls.placeholderTexture = Texture()
+                cls.placeholderTexture.setTextureImage(np.array([[cls.placeholderColor]], dtype=np.uint8))
+        return cls.placeholderTexture.textureName
+
+    def delete(self):
+        """
+        Free the texture image, it can be set again later
+        """
+        self.ready = False
+        self.streamJob = None
+        self.droppedLevels = 0
+        if self.resource is not None:
+            if self.array is None:
+                TextureUnits.release(gl.GL_TEXTURE_2D, self.textureName)
+                gl.glDeleteTextures([self.textureName])
+            else:
+                self.array.releaseLayer(self.layer)
+                self.array = None
+                self.layer = -1
+            self.textureName = 0
+            ResourceManager.forget(self.resource)
+            self.resource = None
+
+    def abandon(self):
+        """
+        Forget the texture image without deleting it, for a texture of a GL context which is gone. It can be set
+        again later.
+        """
+        self.ready = False
+        self.streamJob = None
+        self.droppedLevels = 0
+        self.array = None
+        self.layer = -1
+        self.textureName = 0
+        self.resource = None
+
+    @classmethod
+    def contextChanged(cls):
+        """
+        Forget the placeholder texture, call it whenever a GL context is made, as its name may be one of a context
+        freed before
+        """
+        if cls.placeholderTexture is not None:
+            cls.placeholderTexture.abandon()
+        cls.placeholderTexture = None
+
+    def evict(self):
+        """
+        Free the texture for MemoryBudget, its placeholder is shown until restore loads it again
+        """
+        self.delete()
+        self.evicted = True
+
+    def reduce(self):
+        """
+        Free the finest mip level left for MemoryBudget, the texture samples from the next one until restore streams
+        the dropped levels again
+        """
+        level = self.droppedLevels
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self.textureName)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_BASE_LEVEL, level + 1)
+        # redefined empty, which frees its storage
+        gl.glTexImage2D(gl.GL_TEXTURE_2D, level, self.internalFormat, 0, 0, 0, gl.GL_RGB, gl.GL_UNSIGNED_BYTE, None)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+        self.resource.byteSize = max(self.resource.byteSize - self.levelBytes(level), 0)
+        self.droppedLevels = level + 1
+
+    def allocateDroppedLevels(self):
+        """
+        Make empty storage again for the levels freed by reduce, to be filled with writeRows. The texture keeps
+        sampling from the coarser levels until showLevel.
+        """
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self.textureName)
+        for level in range(self.droppedLevels):
+            gl.glTexImage2D(gl.GL_TEXTURE_2D, level, self.internalFormat, max(self.width >> level, 1),
+                            max(self.height >> level, 1), 0, gl.GL_RGB, gl.GL_UNSIGNED_BYTE, None)
+            self.resource.byteSize += self.levelBytes(level)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+        self.droppedLevels = 0
+
+    def restore(self):
+        """
+        Stream the image of an evicted texture again, coarsest level first, or only the levels a reduced texture
+        dropped
+        """
+        if self.evicted:
+            self.evicted = False
+            self.reload()
+        else:
+            self.reload(refine=True)
 
     def setTextureParameters(self):
         # for 2D texture, need wrap along s and t
         gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_S, gl.GL_REPEAT)
         gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_T, gl.GL_REPEAT)
-        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR)
+        # minified texels are blended from the two nearest mip levels, the levels between base and max are all stored
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR_MIPMAP_LINEAR)
         gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR)
 
-    def bind(self, glslVariableLoc):
-        gl.glActiveTexture(gl.GL_TEXTURE0 + self.textureUnitID)
-        gl.glBindTexture(gl.GL_TEXTURE_2D, self.textureName)
-        gl.glUniform1i(glslVariableLoc, self.textureUnitID)
-
-    def unbind(self, glslVariableLoc):
-        gl.glActiveTexture(gl.GL_TEXTURE0)
-        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
-        gl.glUniform1i(glslVariableLoc, 0)
+    def bind(self, shaderProg):
+        """
+        Point the texture samplers of shaderProg at this texture, or at the placeholder while it is not ready
+        """
+        if self.reload is not None:
+            MemoryBudget.use(self)
+        if self.ready and self.array is not None:
+            TextureUnits.setSamplers(shaderProg, textureArray=self.textureName)
+            shaderProg.setInt("textureLayer", self.layer)
+        else:
+            TextureUnits.setSamplers(shaderProg, textureImage=self.textureName if self.ready else self.placeholder())
+            shaderProg.setInt("textureLayer", -1)
+        shaderProg.setInt("virtualTexture", 0)
 
+    def unbind(self, shaderProg):
+        """
+        Point the texture samplers of shaderProg at units with nothing bound
+        """
+        TextureUnits.setSamplers(shaderProg)
+        shaderProg.setInt("textureLayer", -1)
+        shaderProg.setInt("virtualTexture", 0)
@@ -5,7 +5,11 @@ Set up the pyopengl rendering program, including vertex shader and fragment shad
 :version: 2024.11.11
 '''
 
+import functools
+
 from Light import Light
+from ResourceManager import ResourceManager
+from GLBuffer import TextureUnits
 
 try:
     import OpenGL
@@ -60,12 +64,36 @@ class GLProgram:
     fs = None  # Fragment shader
 
     ready = False  # a control flag which reflect if this GLprogram is ready
-    debug = 0
+    debug = 0  # above 0, setting a uniform the program does not have raises ValueError
     enableambient = True
     enablespecular = True
     enablediffuse = True
+    resource = None  # tracking record in ResourceManager
+
+    # (GL context, program name) glUseProgram was last called with, so use() does not call it again.
+    # Contexts are compared too, since a new context gives out the same program names again
+    inUse = None
+
+    # GL type of an active uniform -> uniform function and its arguments between location and value.
+    # Every other type, int, bool and the samplers, is set with glUniform1i
+    uniformFunctions = {
+        gl.GL_FLOAT_MAT4: (gl.glUniformMatrix4fv, (1, gl.GL_FALSE)),
+        gl.GL_FLOAT_MAT3: (gl.glUniformMatrix3fv, (1, gl.GL_FALSE)),
+        gl.GL_FLOAT_MAT2: (gl.glUniformMatrix2fv, (1, gl.GL_FALSE)),
+        gl.GL_FLOAT_VEC4: (gl.glUniform4fv, (1,)),
+        gl.GL_FLOAT_VEC3: (gl.glUniform3fv, (1,)),
+        gl.GL_FLOAT_VEC2: (gl.glUniform2fv, (1,)),
+        gl.GL_FLOAT: (gl.glUniform1f, ()),
+    }
+    # name in the program -> (GL type, None for types set with glUniform1i, and setter of the uniform with its
+    # location bound), built by compile
+    uniformSetters = None
+    attribSetters = None  # attribs name -> the same entries, filled on first use
+    lightSetters = None  # setters of the members of each light, in the order setLight sets them
+
     def __init__(self) -> None:
         self.program = gl.glCreateProgram()
+        self.resource = ResourceManager.track("program", self.program, self.delete)
 
         self.ready = False
         # define attribs name and corresponding method to set it
@@ -76,10 +104,33 @@ class GLProgram:
             "vertexTexture": "aTexture",
 
             "textureImage": "theTexture01",
+            "textureArray": "textureArray",
+            "textureLayer": "textureLayer",
+            "virtualTexture": "virtualTexture",
+            "virtualPages": "virtualPages",
+            "virtualIndirection": "virtualIndirection",
+            "virtualInfo": "virtualInfo",
+            "virtualCacheSize": "virtualCacheSize",
+            "virtualFeedback": "virtualFeedback",
+            "virtualLodBias": "virtualLodBias",
 
             "projectionMat": "projection",
             "viewMat": "view",
             "modelMat": "model",
+            "meshColor": "meshColor",
+
+            "instanceData": "instanceData",
+            "instanceModelMat": "instanceModelMat",
+            "instanceColor": "instanceColor",
+            "instanceAmbient": "instanceAmbient",
+            "instanceDiffuse": "instanceDiffuse",
+            "instanceSpecular": "instanceSpecular",
+
+            "proceduralShape": "proceduralShape",
+            "shapeParams": "shapeParams",
+            "shapeRows": "shapeRows",
+            "shapeColumns": "shapeColumns",
+            "shapeColor": "shapeColor",
 
             "viewPosition": "viewPosition",
             "material": "material",
@@ -117,10 +168,18 @@ class GLProgram:
 
     def __del__(self) -> None:
         try:
-            gl.glDeleteProgram(self.program)
+            self.delete()
         except Exception as e:
             pass
 
+    def delete(self):
+        if self.program is not None:
+            if GLProgram.inUse is not None and GLProgram.inUse[1] == self.program:
+                GLProgram.inUse = None
+            gl.glDeleteProgram(self.program)
+            self.program = None
+            ResourceManager.forget(self.resource)
+
     @staticmethod
     def load_shader(src: str, shader_type: int) -> int:
         shader = gl.glCreateShader(shader_type)
@@ -141,26 +200,145 @@ class GLProgram:
         in vec3 {self.attribs["vertexColor"]};
         in vec2 {self.attribs["vertexTexture"]};
         
+        // per-instance values from an InstanceBuffer, for instance groups and MeshArena draws
+        in mat4 {self.attribs["instanceModelMat"]};  // applied before the model matrix
+        in vec4 {self.attribs["instanceColor"]};  // mesh color and material highlight
+        in vec4 {self.attribs["instanceAmbient"]};
+        in vec4 {self.attribs["instanceDiffuse"]};
+        in vec4 {self.attribs["instanceSpecular"]};
+        
         out vec3 vPos;
         out vec3 vColor;
         smooth out vec3 vNormal;
         out vec2 vTexture;
         out int materialIndex;
+        flat out vec4 vAmbient;
+        flat out vec4 vDiffuse;
+        flat out vec4 vSpecular;
+        flat out float vHighlight;
+        
+        struct Material{{
+            vec4 ambient;
+            vec4 diffuse;
+            vec4 specular;
+            float highlight;
+        }};
         
         uniform mat4 {self.attribs["projectionMat"]};
         uniform mat4 {self.attribs["viewMat"]};
         uniform mat4 {self.attribs["modelMat"]};
+        uniform vec3 {self.attribs["meshColor"]};
+        uniform Material {self.attribs["material"]};
+        uniform bool {self.attribs["instanceData"]};  // read model matrix, mesh color and material from the per-instance attributes
+        
+        // procedural shapes are rebuilt from gl_VertexID with no vertex buffer, see ProceduralMesh
+        uniform int {self.attribs["proceduralShape"]};  // 0: read vertex attributes, 1: ellipsoid, 2: torus, 3: cylinder
+        uniform vec4 {self.attribs["shapeParams"]};  // ellipsoid: radii, torus: inner and outer radius, cylinder: radius and height
+        uniform int {self.attribs["shapeRows"]};  // ellipsoid: stacks, torus: rings
+        uniform int {self.attribs["shapeColumns"]};  // ellipsoid: slices, torus and cylinder: nsides
+        uniform vec3 {self.attribs["shapeColor"]};
         
         uniform bool imageFlag;
 
+        const float PI = 3.14159265358979;
+        // (row, column) offsets of the 6 vertices of a grid quad, same order as the CPU generators
+        const ivec2 ellipsoidQuad[6] = ivec2[6](ivec2(0, 0), ivec2(1, 0), ivec2(0, 1), ivec2(0, 1), ivec2(1, 0), ivec2(1, 1));
+        const ivec2 torusQuad[6] = ivec2[6](ivec2(0, 0), ivec2(0, 1), ivec2(1, 0), ivec2(0, 1), ivec2(1, 1), ivec2(1, 0));
+        // (ring, side offset) of cylinder triangle vertices, ring 0 is bottom, 1 top, 2 bottom center, 3 top center
+        const ivec2 cylinderTriangles[12] = ivec2[12](ivec2(0, 0), ivec2(0, 1), ivec2(1, 0),
+                                                      ivec2(0, 1), ivec2(1, 1), ivec2(1, 0),
+                                                      ivec2(2, 0), ivec2(0, 0), ivec2(0, 1),
+                                                      ivec2(3, 0), ivec2(1, 1), ivec2(1, 0));
+
+        void proceduralVertex(out vec3 position, out vec3 normal, out vec2 uv)
+        {{
+            int triangle = gl_VertexID / 3;
+            int corner = gl_VertexID - 3 * triangle;
+            uv = vec2(0.0);
+            if ({self.attribs["proceduralShape"]} == 3) {{
+                // sides first, 2 triangles per side, then bottom cap and top cap
+                int n = {self.attribs["shapeColumns"]};
+                int side = triangle / 2;
+                int kind = triangle - 2 * side;
+                if (triangle >= 3 * n) {{
+                    side = triangle - 3 * n;
+                    kind = 3;
+                }}
+                else if (triangle >= 2 * n) {{
+                    side = triangle - 2 * n;
+                    kind = 2;
+                }}
+                ivec2 v = cylinderTriangles[3 * kind + corner];
+                float halfHeight = {self.attribs["shapeParams"]}.y / 2.0;
+                if (v.x >= 2) {{
+                    float sz = v.x == 2 ? -1.0 : 1.0;
+                    position = vec3(0.0, 0.0, sz * halfHeight);
+                    normal = vec3(0.0, 0.0, sz);
+                }}
+                else {{
+                    float angle = 2.0 * PI * float((side + v.y) % n) / float(n);
+                    normal = vec3(cos(angle), sin(angle), 0.0);
+                    position = vec3({self.attribs["shapeParams"]}.x * normal.xy, v.x == 0 ? -halfHeight : halfHeight);
+                }}
+                return;
+            }}
+
+            int quad = triangle / 2;
+            int row = quad / {self.attribs["shapeColumns"]};
+            int k = corner + 3 * (triangle - 2 * quad);
+            ivec2 offset = torusQuad[k];
+            if ({self.attribs["proceduralShape"]} == 1) {{
+                offset = ellipsoidQuad[k];
+            }}
+            float i = float(row + offset.x) / float({self.attribs["shapeRows"]});
+            float j = float(quad - row * {self.attribs["shapeColumns"]} + offset.y) / float({self.attribs["shapeColumns"]});
+            if ({self.attribs["proceduralShape"]} == 1) {{
+                float phi = PI * i;  // latitude
+                float theta = 2.0 * PI * j;  // longitude
+                normal = vec3(sin(phi) * cos(theta), cos(phi), sin(phi) * sin(theta));
+                position = {self.attribs["shapeParams"]}.xyz * normal;
+                uv = vec2(j, i);
+            }}
+            else {{
+                float theta = 2.0 * PI * i;  // ring angle
+                float phi = 2.0 * PI * j;  // side angle
+                float ringRadius = {self.attribs["shapeParams"]}.y + {self.attribs["shapeParams"]}.x * cos(phi);
+                position = vec3(ringRadius * cos(theta), ringRadius * sin(theta), {self.attribs["shapeParams"]}.x * sin(phi));
+                normal = vec3(cos(phi) * cos(theta), cos(phi) * sin(theta), sin(phi));
+                uv = vec2(i, j);
+            }}
+        }}
+
         void main()
         {{
             if (! imageFlag){{
-                gl_Position = {self.attribs["projectionMat"]} * {self.attribs["viewMat"]} * {self.attribs["modelMat"]} * vec4({self.attribs["vertexPos"]}, 1.0);
-                vPos = vec3(model * vec4({self.attribs["vertexPos"]}, 1.0));
-                vColor = {self.attribs["vertexColor"]};
-                vNormal = normalize(transpose(inverse({self.attribs["modelMat"]})) * vec4({self.attribs["vertexNormal"]}, 0.0) ).xyz;
-                vTexture = {self.attribs["vertexTexture"]};
+                vec3 position = {self.attribs["vertexPos"]};
+                vec3 normal = {self.attribs["vertexNormal"]};
+                vec3 color = {self.attribs["vertexColor"]};
+                vec2 uv = {self.attribs["vertexTexture"]};
+                if ({self.attribs["proceduralShape"]} != 0) {{
+                    proceduralVertex(position, normal, uv);
+                    color = {self.attribs["shapeColor"]};
+                }}
+                mat4 modelMatrix = {self.attribs["modelMat"]};
+                vec3 tint = {self.attribs["meshColor"]};
+                vAmbient = {self.attribs["material"]}.ambient;
+                vDiffuse = {self.attribs["material"]}.diffuse;
+                vSpecular = {self.attribs["material"]}.specular;
+                vHighlight = {self.attribs["material"]}.highlight;
+                if ({self.attribs["instanceData"]}) {{
+                    modelMatrix = {self.attribs["modelMat"]} * {self.attribs["instanceModelMat"]};
+                    tint = {self.attribs["instanceColor"]}.rgb;
+                    vAmbient = {self.attribs["instanceAmbient"]};
+                    vDiffuse = {self.attribs["instanceDiffuse"]};
+                    vSpecular = {self.attribs["instanceSpecular"]};
+                    vHighlight = {self.attribs["instanceColor"]}.a;
+                }}
+                gl_Position = {self.attribs["projectionMat"]} * {self.attribs["viewMat"]} * modelMatrix * vec4(position, 1.0);
+                vPos = vec3(modelMatrix * vec4(position, 1.0));
+                vColor = color * tint;
+                vNormal = normalize(transpose(inverse(modelMatrix)) * vec4(normal, 0.0) ).xyz;
+                vTexture = uv;
             }}
             else {{
                 float x = -1.0 + float((gl_VertexID & 1) << 2);
@@ -200,9 +378,24 @@ class GLProgram:
         in vec3 vColor;
         smooth in vec3 vNormal;
         in vec2 vTexture;
+        flat in vec4 vAmbient;
+        flat in vec4 vDiffuse;
+        flat in vec4 vSpecular;
+        flat in float vHighlight;
         
         uniform int renderingFlag;
         uniform sampler2D {self.attribs["textureImage"]};
+        uniform sampler2DArray {self.attribs["textureArray"]};
+        uniform int {self.attribs["textureLayer"]};  // layer of the texture array to sample, -1 to sample the 2D texture
+        
+        // virtual texturing, see VirtualTexture.py
+        uniform int {self.attribs["virtualTexture"]};  // id of the virtual texture to sample instead, 0 for none
+        uniform sampler2D {self.attribs["virtualPages"]};  // page cache shared by all virtual textures
+        uniform sampler2DArray {self.attribs["virtualIndirection"]};  // slot x, slot y and level of each page, a layer per level
+        uniform vec4 {self.attribs["virtualInfo"]};  // width, height, page size and level count of the virtual texture
+        uniform float {self.attribs["virtualCacheSize"]};  // page cache size in texels
+        uniform bool {self.attribs["virtualFeedback"]};  // output the page of each fragment instead of its color
+        uniform float {self.attribs["virtualLodBias"]};
         
         uniform vec3 {self.attribs["viewPosition"]};
         uniform Material {self.attribs["material"]};
@@ -217,6 +410,41 @@ class GLProgram:
         uniform float iTime;
         out vec4 FragColor;
 
+        float virtualLevel(vec2 uv)
+        {{
+            vec2 dx = dFdx(uv * {self.attribs["virtualInfo"]}.xy);
+            vec2 dy = dFdy(uv * {self.attribs["virtualInfo"]}.xy);
+            float lod = 0.5 * log2(max(max(dot(dx, dx), dot(dy, dy)), 1e-8)) + {self.attribs["virtualLodBias"]};
+            return clamp(floor(lod), 0.0, {self.attribs["virtualInfo"]}.w - 1.0);
+        }}
+        
+        vec2 virtualLevelSize(float level)
+        {{
+            return max(floor({self.attribs["virtualInfo"]}.xy / exp2(level)), vec2(1.0));
+        }}
+        
+        vec4 virtualSample(vec2 uv, float level)
+        {{
+            vec2 levelSize = virtualLevelSize(level);
+            ivec2 page = ivec2(min(fract(uv) * levelSize, levelSize - 1.0) / {self.attribs["virtualInfo"]}.z);
+            // the page, or the coarser page loaded in its place
+            vec4 entry = texelFetch({self.attribs["virtualIndirection"]}, ivec3(page, int(level)), 0) * 255.0;
+            vec2 texel = fract(uv) * virtualLevelSize(entry.b);
+            vec2 inPage = texel - floor(texel / {self.attribs["virtualInfo"]}.z) * {self.attribs["virtualInfo"]}.z;
+            // pages have a border of 1 texel in the page cache
+            vec2 cacheTexel = entry.rg * ({self.attribs["virtualInfo"]}.z + 2.0) + 1.0 + inPage;
+            return textureLod({self.attribs["virtualPages"]}, cacheTexel / {self.attribs["virtualCacheSize"]}, 0.0);
+        }}
+        
+        vec4 virtualRequest(vec2 uv, float level)
+        {{
+            vec2 levelSize = virtualLevelSize(level);
+            ivec2 page = ivec2(min(fract(uv) * levelSize, levelSize - 1.0) / {self.attribs["virtualInfo"]}.z);
+            // decoded in VirtualTexture.renderFeedback
+            int high = int(level) | ((page.x >> 8) & 3) << 4 | ((page.y >> 8) & 3) << 6;
+            return vec4(page.x & 255, page.y & 255, high, {self.attribs["virtualTexture"]}) / 255.0;
+        }}
+        
         void mainImage( out vec4 fragColor, in vec2 fragCoord )
         {{
             ////////// BONUS Course Extra Credit Assignment: SDF visualization and more
@@ -239,6 +467,20 @@ class GLProgram:
             FragColor = -1 * abs(placeHolder);
             FragColor = clamp(FragColor, 0, 1);
             
+            // derivatives are taken here, out of the branches on the fragment
+            float virtualLevelOfFragment = 0.0;
+            if ({self.attribs["virtualTexture"]} > 0)
+                virtualLevelOfFragment = virtualLevel(vTexture);
+            if ({self.attribs["virtualFeedback"]}){{
+                FragColor = vec4(0.0);
+                if ({self.attribs["virtualTexture"]} > 0 && (renderingFlag >> 8 & 0x1) == 1)
+                    FragColor = virtualRequest(vTexture, virtualLevelOfFragment);
+                return;
+            }}
+            
+            // material of this draw, from the material uniform or the per-draw attributes
+            Material surface = Material(vAmbient, vDiffuse, vSpecular, vHighlight);
+            
             vec4 results[8];
             for(int i=0; i<8; i+=1)
                 results[i]=vec4(0.0);
@@ -270,7 +512,7 @@ class GLProgram:
                 for (int i = 0; i < MAX_LIGHT_NUM; i++) {{ // iterate through all lights
                     
                     if ({self.attribs["enableambient"]}) {{
-                        result += {self.attribs["material"]}.ambient * {self.attribs["light"]}[i].color;
+                        result += surface.ambient * {self.attribs["light"]}[i].color;
                     }}
                     // infinite light direction
                     vec3 lightDirection = normalize({self.attribs["light"]}[i].position - vPos);
@@ -284,7 +526,7 @@ class GLProgram:
                     float nL = dot(norm, lightDirection);
                     if ({self.attribs["enablediffuse"]}){{
                         if (nL > 0.0) {{
-                            diffuse = {self.attribs["material"]}.diffuse * {self.attribs["light"]}[i].color * nL;
+                            diffuse = surface.diffuse * {self.attribs["light"]}[i].color * nL;
                         }}
                     }} 
                     
@@ -294,7 +536,7 @@ class GLProgram:
                     float vR = dot(viewDirection, R);
                     if ({self.attribs["enablespecular"]}) {{
                         if ((vR > 0.0)) {{
-                            specular = {self.attribs["material"]}.specular * {self.attribs["light"]}[i].color * pow(vR, {self.attribs["material"]}.highlight);
+                            specular = surface.specular * {self.attribs["light"]}[i].color * pow(vR, surface.highlight);
                         }}
                     }}
                     // spot light
@@ -314,7 +556,7 @@ class GLProgram:
                         
                         vec3 vl = {self.attribs["light"]}[i].spotDirection;
                         if (dot(vObj, vl) > cos({self.attribs["light"]}[i].spotAngleLimit)) {{
-                            angularAttenuation = pow(dot(vObj, vl), {self.attribs["material"]}.highlight);
+                            angularAttenuation = pow(dot(vObj, vl), surface.highlight);
                         }}
                         vec4 diffuseComponent = diffuse * radialAttenuation * angularAttenuation;
                         vec4 specularComponent = specular * radialAttenuation * angularAttenuation;
@@ -381,7 +623,12 @@ class GLProgram:
             // Reserved for texture mapping, get point color from texture image and texture coordinates
             // Routing name is "texture"
             if ((renderingFlag >> 8 & 0x1) == 1){{
-                results[ri] = texture({self.attribs["textureImage"]}, vTexture);
+                if ({self.attribs["virtualTexture"]} > 0)
+                    results[ri] = virtualSample(vTexture, virtualLevelOfFragment);
+                else if ({self.attribs["textureLayer"]} >= 0)
+                    results[ri] = texture({self.attribs["textureArray"]}, vec3(vTexture, {self.attribs["textureLayer"]}));
+                else
+                    results[ri] = texture({self.attribs["textureImage"]}, vTexture);
                 ri+=1;
             }}
             
@@ -425,6 +672,70 @@ class GLProgram:
     def getAttribName(self, attribIndexName):
         return self.attribs[attribIndexName]
 
+    def buildUniformSetters(self):
+        """
+        Look up every active uniform of the linked program once, and bind a setter of its type to its location.
+        Elements of arrays of plain types get a setter each, the array name sets the first element.
+        """
+        self.uniformSetters = {}
+        self.attribSetters = {}
+        for index in range(gl.glGetProgramiv(self.program, gl.GL_ACTIVE_UNIFORMS)):
+            name, size, uniformType = gl.glGetActiveUniform(self.program, index)
+            name = name.decode() if isinstance(name, bytes) else name
+            # a plain int, GL enums compare slowly with numpy integers
+            uniformType = int(uniformType)
+            function, arguments = self.uniformFunctions.get(uniformType, (gl.glUniform1i, ()))
+            setterType = uniformType if uniformType in self.uniformFunctions else None
+            names = [name]
+            if name.endswith("[0]"):
+                names = [name[:-3]] + [f"{name[:-3]}[{i}]" for i in range(size)]
+            for elementName in names:
+                location = gl.glGetUniformLocation(self.program, elementName)
+                self.uniformSetters[elementName] = (setterType, functools.partial(function, location, *arguments))
+
+        lightName = self.attribs["light"]
+        members = ("position", "color", "infiniteOn", "infiniteDirection", "spotOn", "spotDirection",
+                   "spotRadialFactor", "spotAngleLimit")
+        missing = (None, self.skipUniform)
+        self.lightSetters = [tuple(self.uniformSetters.get(f"{lightName}[{i}].{member}", missing)[1]
+                                   for member in members)
+                             for i in range(int(self.attribs["maxLightsNum"]))]
+
+    @staticmethod
+    def skipUniform(value):
+        """
+        Setter of uniforms the program does not have, like ones optimized off
+        """
+        pass
+
+    def uniformSetter(self, name, lookThroughAttribs=True, uniformType=None):
+        """
+        Setter of a uniform from the table built at compile, so no location is looked up.
+        Uniforms missing from the program or of another type are skipped, like GL ignores them, or raise ValueError
+        in debug mode.
+
+        :param name: attribs name of the uniform, or its name in the program if lookThroughAttribs is False
+        :param uniformType: GL type the caller sets, like GL_FLOAT_VEC3, None for int, bool and sampler uniforms
+        :return: callable taking the value, in the form the GL uniform function takes it
+        :rtype: callable
+        """
+        setters = self.attribSetters if lookThroughAttribs else self.uniformSetters
+        entry = setters.get(name)
+        if entry is None:
+            entry = self.uniformSetters.get(self.getAttribName(name) if lookThroughAttribs else name)
+            if entry is None:
+                if self.debug > 0:
+                    raise ValueError(f"Uniform {name} is not an active uniform of the program, it may have been "
+                                     f"optimized off")
+                return self.skipUniform
+            setters[name] = entry
+        setterType, setter = entry
+        if setterType != uniformType:
+            if self.debug > 0:
+                raise ValueError(f"Uniform {name} has GL type {setterType}, not {uniformType}")
+            return self.skipUniform
+        return setter
+
     def compile(self, vs_src=None, fs_src=None) -> None:
         if vs_src:
             self.set_vss(vs_src)
@@ -448,12 +759,21 @@ class GLProgram:
         gl.glAttachShader(self.program, vs)
         gl.glAttachShader(self.program, fs)
         gl.glLinkProgram(self.program)
+        # the linked program keeps what it needs, the shader objects are freed with it
+        gl.glDeleteShader(vs)
+        gl.glDeleteShader(fs)
         error = gl.glGetProgramiv(self.program, gl.GL_LINK_STATUS)
         if error != gl.GL_TRUE:
             info = gl.glGetShaderInfoLog(self.program)
             raise Exception(info)
 
         self.ready = True
+        self.buildUniformSetters()
+        # samplers all start on unit 0, but samplers of different types must not share a unit
+        TextureUnits.setSamplers(self)
+        self.setInt("textureLayer", -1)
+        self.setInt("virtualTexture", 0)
+        self.setBool("instanceData", False)
 
     def setFragmentShaderRouting(self, routing="lighting"):
         """
@@ -498,22 +818,37 @@ class GLProgram:
         """
         if not self.ready:
             raise Exception("GLProgram must compile before use it")
-        gl.glUseProgram(self.program)
+        inUse = (OpenGL.platform.PLATFORM.GetCurrentContext(), self.program)
+        if GLProgram.inUse != inUse:
+            gl.glUseProgram(self.program)
+            GLProgram.inUse = inUse
+
+    @classmethod
+    def contextChanged(cls):
+        """
+        Forget which program is in use, call it whenever a GL context is made, as its handle may be one of a context
+        freed before
+        """
+        cls.inUse = None
 
     def setLight(self, lightIndex: int, light: Light):
         if not isinstance(light, Light):
             raise TypeError("light type must be Light")
 
-        self.setVec3(f"""{self.attribs["light"]}[{lightIndex}].position""", light.position, False)
-        self.setVec4(f"""{self.attribs["light"]}[{lightIndex}].color""", light.color, False)
+        self.use()
+        # member setters were bound at compile, no uniform name is formatted or looked up
+        position, color, infiniteOn, infiniteDirection, spotOn, spotDirection, spotRadialFactor, spotAngleLimit = \
+            self.lightSetters[lightIndex]
+        position(light.position)
+        color(light.color)
 
-        self.setBool(f"""{self.attribs["light"]}[{lightIndex}].infiniteOn""", light.infiniteOn, False)
-        self.setVec3(f"""{self.attribs["light"]}[{lightIndex}].infiniteDirection""", light.infiniteDirection, False)
+        infiniteOn(int(light.infiniteOn))
+        infiniteDirection(light.infiniteDirection)
 
-        self.setBool(f"""{self.attribs["light"]}[{lightIndex}].spotOn""", light.spotOn, False)
-        self.setVec3(f"""{self.attribs["light"]}[{lightIndex}].spotDirection""", light.spotDirection, False)
-        self.setVec3(f"""{self.attribs["light"]}[{lightIndex}].spotRadialFactor""", light.spotRadialFactor, False)
-        self.setFloat(f"""{self.attribs["light"]}[{lightIndex}].spotAngleLimit""", light.spotAngleLimit, False)
+        spotOn(int(light.spotOn))
+        spotDirection(light.spotDirection)
+        spotRadialFactor(light.spotRadialFactor)
+        spotAngleLimit(float(light.spotAngleLimit))
 
     def clearAllLights(self):
         maxLightsNum = int(self.attribs["maxLightsNum"])
@@ -526,50 +861,50 @@ class GLProgram:
         self.use()
         if mat.shape != (4, 4):
             raise Exception("Projection Matrix must have 4x4 shape")
-        gl.glUniformMatrix4fv(self.getUniformLocation(name, lookThroughAttribs), 1, gl.GL_FALSE, mat.flatten("C"))
+        self.uniformSetter(name, lookThroughAttribs, gl.GL_FLOAT_MAT4)(mat.flatten("C"))
 
     def setMat3(self, name, mat, lookThroughAttribs=True):
         self.use()
         if mat.shape != (3, 3):
             raise Exception("Projection Matrix must have 3x3 shape")
-        gl.glUniformMatrix3fv(self.getUniformLocation(name, lookThroughAttribs), 1, gl.GL_FALSE, mat.flatten("C"))
+        self.uniformSetter(name, lookThroughAttribs, gl.GL_FLOAT_MAT3)(mat.flatten("C"))
 
     def setMat2(self, name, mat, lookThroughAttribs=True):
         self.use()
         if mat.shape != (2, 2):
             raise Exception("Projection Matrix must have 2x2 shape")
-        gl.glUniformMatrix2fv(self.getUniformLocation(name, lookThroughAttribs), 1, gl.GL_FALSE, mat.flatten("C"))
+        self.uniformSetter(name, lookThroughAttribs, gl.GL_FLOAT_MAT2)(mat.flatten("C"))
 
     def setVec4(self, name, vec, lookThroughAttribs=True):
         self.use()
         if vec.size != 4:
             raise Exception("Vector must have size 4")
-        gl.glUniform4fv(self.getUniformLocation(name, lookThroughAttribs), 1, vec)
+        self.uniformSetter(name, lookThroughAttribs, gl.GL_FLOAT_VEC4)(vec)
 
     def setVec3(self, name, vec, lookThroughAttribs=True):
         self.use()
         if vec.size != 3:
             raise Exception("Vector must have size 3")
-        gl.glUniform3fv(self.getUniformLocation(name, lookThroughAttribs), 1, vec)
+        self.uniformSetter(name, lookThroughAttribs, gl.GL_FLOAT_VEC3)(vec)
 
     def setVec2(self, name, vec, lookThroughAttribs=True):
         self.use()
         if vec.size != 2:
             raise Exception("Vector must have size 2")
-        gl.glUniform2fv(self.getUniformLocation(name, lookThroughAttribs), 1, vec)
+        self.uniformSetter(name, lookThroughAttribs, gl.GL_FLOAT_VEC2)(vec)
 
     def setBool(self, name, value, lookThroughAttribs=True):
         self.use()
         if value not in (0, 1):
             raise Exception("bool only accept True/False/0/1")
-        gl.glUniform1i(self.getUniformLocation(name, lookThroughAttribs), int(value))
+        self.uniformSetter(name, lookThroughAttribs)(int(value))
 
     def setInt(self, name, value, lookThroughAttribs=True):
         self.use()
         if value != int(value):
             raise Exception("set int only accept  integer")
-        gl.glUniform1i(self.getUniformLocation(name, lookThroughAttribs), int(value))
+        self.uniformSetter(name, lookThroughAttribs)(int(value))
 
     def setFloat(self, name, value, lookThroughAttribs=True):
         self.use()
-        gl.glUniform1f(self.getUniformLocation(name, lookThroughAttribs), float(value))
\ No newline at end of file
+        self.uniformSetter(name, lookThroughAttribs, gl.GL_FLOAT)(float(value))
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""
+Define instance groups here. An instance group draws many copies of the Displayable of a Component in one instanced
+draw call, each copy with its own model matrix, color and material from an InstanceBuffer. Set one with
+Component.setInstances.
+
+:author: agent
+:version: 2026.10.18
+"""
+
+import numpy as np
+
+from GLBuffer import VAO, InstanceBuffer
+from Material import Material
+from ResourceManager import ResourceManager
+
+try:
+    import OpenGL
+
+    try:
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+    except ImportError:
+        from ctypes import util
+
+        orig_util_find_library = util.find_library
+
+        def new_util_find_library(name):
+            res = orig_util_find_library(name)
+            if res:
+                return res
+            return '/System/Library/Frameworks/' + name + '.framework/' + name
+
+        util.find_library = new_util_find_library
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+except ImportError:
+    raise ImportError("Required dependency PyOpenGL not present")
+
+
+class InstanceGroup:
+    """
+    Instances of one Displayable. The shared mesh buffers are read through a VAO of the group, which adds the
+    instanced attributes of its InstanceBuffer, so the mesh VAO used by other Components stays as it is.
+    """
+    instanceBuffer = None
+    vaos = None  # id(Mesh) -> (Mesh, VAO), one per level of detail drawn
+    owner = None  # ResourceManager owner tag when the group was made, its VAOs are made later under it too
+
+    def __init__(self):
+        self.owner = ResourceManager.owner
+        self.instanceBuffer = InstanceBuffer()
+        self.vaos = {}
+
+    @property
+    def instanceNum(self):
+        return self.instanceBuffer.instanceNum
+
+    def setInstances(self, displayable, modelMats, colors=None, materials=None, materialIndices=None):
+        """
+        Upload the instances, over the ones set before
+
+        :param displayable: Displayable drawn, its unit mesh scaling is applied to every instance and its mesh color
+                            is the default color
+        :param modelMats: (N, 4, 4) column-major model matrices of the instances, applied before the Component
+                          transformation
+        :param colors: (N, 3) vertex color multipliers, or None
+        :param materials: list<Material> the instances pick from, one default Material if None
+        :param materialIndices: (N,) index in materials of every instance, all 0 if None
+        """
+        modelMats = np.asarray(modelMats, dtype=np.float32).reshape(-1, 4, 4)
+        if displayable.meshScaleMat is not None:
+            modelMats = np.matmul(displayable.meshScaleMat.astype(np.float32), modelMats)
+        if colors is None:
+            colors = displayable.meshColor
+        if materials is None:
+            materials = [Material()]
+        materialRows = np.stack([InstanceBuffer.materialRow(material) for material in materials])
+        if materialIndices is None:
+            materialRows = materialRows[0]
+        else:
+            materialRows = materialRows[np.asarray(materialIndices, dtype=np.intp)]
+        self.instanceBuffer.setInstances(InstanceBuffer.rows(modelMats, colors, materialRows))
+
+    def vaoFor(self, mesh, displayable, shaderProg):
+        """
+        VAO reading the buffers of mesh and the instance buffer, made on first use
+
+        :rtype: VAO
+        """
+        entry = self.vaos.get(id(mesh))
+        if entry is not None and entry[0] is mesh and entry[1].vao is not None:
+            return entry[1]
+        # levels the Displayable does not use anymore
+        for key, (oldMesh, oldVao) in list(self.vaos.items()):
+            if oldMesh not in (displayable.lodMeshes or []):
+                oldVao.delete()
+                del self.vaos[key]
+
+        with ResourceManager.ownedBy(self.owner):
+            vao = VAO()
+        vao.bind()
+        if not mesh.procedural:
+            mesh.vbo.bind()
+            mesh.vbo.layout.setAttribPointers(mesh.vbo, shaderProg)
+            mesh.ebo.bind()
+        self.instanceBuffer.setAttribPointers(shaderProg)
+        vao.unbind()
+        self.vaos[id(mesh)] = (mesh, vao)
+        return vao
+
+    def draw(self, shaderProg, displayable, transformationMat):
+        """
+        Draw every instance of displayable, with the routing and texture already set
+
+        :param transformationMat: the owner Component's transformation matrix, applied after the instance matrices
+        """
+        mesh = displayable.mesh
+        if self.instanceNum == 0 or self.instanceBuffer.vbo is None or not mesh.uploaded:
+            return
+        vao = self.vaoFor(mesh, displayable, shaderProg)
+        shaderProg.setMat4("modelMat", transformationMat)
+        shaderProg.setBool("instanceData", True)
+        vao.bind()
+        if mesh.procedural:
+            mesh.setShapeUniforms(shaderProg)
+            gl.glDrawArraysInstanced(gl.GL_TRIANGLES, 0, mesh.vertexNum, self.instanceNum)
+            shaderProg.setInt("proceduralShape", 0)
+        else:
+            mesh.ebo.drawInstanced(self.instanceNum)
+        vao.unbind()
+        shaderProg.setBool("instanceData", False)
+
+    def delete(self):
+        for _, vao in self.vaos.values():
+            vao.delete()
+        self.vaos = {}
+        self.instanceBuffer.delete()
@@ -0,0 +1,94 @@
+"""
+Define level of detail selection here. Parametric Displayables keep a chain of coarser tessellations,
+and the level drawn is picked every frame from its projected screen space error.
+
+:author: agent
+:version: 2026.10.18
+"""
+
+import math
+
+import numpy as np
+
+
+class LevelOfDetail:
+    """
+    Camera state and tuning shared by every Displayable. All members are class level, Sketch updates the camera
+    once per frame with setCamera.
+    """
+    enabled = True
+    # global knob, each +1 doubles the screen space error we tolerate, negative values prefer finer levels
+    bias = 0.0
+    # largest allowed distance in pixels between the true surface and its tessellation
+    pixelError = 0.5
+
+    viewMat = None  # column-major view matrix
+    perspMat = None  # column-major perspective matrix
+    viewportHeight = 1
+
+    @classmethod
+    def setCamera(cls, viewMat, perspMat, viewportHeight):
+        cls.viewMat = viewMat
+        cls.perspMat = perspMat
+        cls.viewportHeight = max(1, viewportHeight)
+
+    @staticmethod
+    def halvingChain(counts, minimums, maxLevels):
+        """
+        Tessellation parameters from finest to coarsest, every count is halved at each level.
+        The chain stops before any count goes below its minimum.
+
+        :param counts: finest tessellation counts, like (stacks, slices)
+        :type counts: tuple
+        :param minimums: smallest allowed value of each count
+        :type minimums: tuple
+        :param maxLevels: the most levels to build, at least one level is always returned
+        :type maxLevels: int
+        :rtype: list<tuple>
+        """
+        chain = [tuple(counts)]
+        while len(chain) < maxLevels:
+            coarser = tuple(c // 2 for c in chain[-1])
+            if any(c < m for c, m in zip(coarser, minimums)):
+                break
+            chain.append(coarser)
+        return chain
+
+    @staticmethod
+    def chordError(segments):
+        """
+        Largest gap between a unit circle and the polygon with this number of segments
+
+        :param segments: segment counts, one per level
+        :rtype: numpy.ndarray
+        """
+        return 1 - np.cos(math.pi / np.asarray(segments, dtype=np.float64))
+
+    @classmethod
+    def select(cls, modelMat, radius, chordErrors):
+        """
+        Pick the coarsest level whose error on screen stays under pixelError * 2^bias
+
+        :param modelMat: column-major model matrix the mesh is drawn with
+        :type modelMat: numpy.ndarray
+        :param radius: bounding radius of the mesh in its local space
+        :type radius: float
+        :param chordErrors: chordError of every level, finest first, should be increasing
+        :type chordErrors: numpy.ndarray
+        :return: index of the level to draw
+        :rtype: int
+        """
+        if not cls.enabled or cls.viewMat is None or cls.perspMat is None:
+            return 0
+
+        # matrices are column-major, so translation is in the last row and points multiply from the left
+        center = np.append(modelMat[3, 0:3], 1.0) @ cls.viewMat
+        depth = -center[2]
+        if depth <= 1e-6:
+            return 0
+        worldRadius = radius * np.sqrt((modelMat[0:3, 0:3] ** 2).sum(axis=1)).max()
+        pixelsPerUnit = cls.perspMat[1, 1] * cls.viewportHeight * 0.5 / depth
+
+        tolerance = cls.pixelError * 2.0 ** cls.bias
+        errors = chordErrors * worldRadius * pixelsPerUnit
+        return max(0, int(np.searchsorted(errors, tolerance, side="right")) - 1)
@@ -0,0 +1,125 @@
+"""
+Define a GPU memory budget here. Every buffer and texture is accounted through ResourceManager, and data which can be
+brought back on demand registers here with a priority and the frame it was last used in. When the memory in use goes
+over budget at the end of a frame, streamed textures not drawn in it first drop their finest mip levels. If that is not
+enough, the lowest priority and least recently used data is evicted whole: textures kept only by TextureCache, then
+mesh levels finer than the ones drawn, then anything not drawn recently. Evicted meshes are uploaded again from their
+CPU arrays when drawn, evicted textures and dropped levels stream again from TextureDiskCache when bound.
+
+:author: agent
+:version: 2026.10.18
+"""
+
+import weakref
+
+from ResourceManager import ResourceManager
+
+
+class MemoryBudget:
+    """
+    Evictable data and the budget it is evicted against. All methods are class level, so there is one budget for the
+    whole program. Call MemoryBudget.endFrame() once per frame, with the GL context current.
+
+    Evictable items have byteSize, priority, lastUse and evicted attributes, and evict() and restore() methods. They
+    also have detailBytes, what reduce() frees while keeping a coarser version, 0 if they have none, and reduced, set
+    until restore() brings the detail back.
+    """
+    # priorities, lower is evicted first
+    CACHED = 0  # kept only to be reused, nobody draws it
+    DETAIL = 1  # a finer version of something drawn instead, like the finer levels of a level of detail chain
+    RESIDENT = 2  # drawn as it is
+
+    budget = 512 << 20  # bytes of GPU memory in use before data is evicted
+    enabled = True
+
+    frame = 0  # frames ended so far, lastUse of items is compared to it
+    evictables = weakref.WeakSet()  # items which can be evicted, dropped by themselves when they are collected
+
+    evictions = 0
+    evictedBytes = 0
+    reductions = 0
+    restores = 0
+
+    @classmethod
+    def register(cls, item):
+        """
+        Let item be evicted when over budget, it counts as used in this frame
+        """
+        item.lastUse = cls.frame
+        cls.evictables.add(item)
+
+    @classmethod
+    def forget(cls, item):
+        """
+        Stop evicting item, for data deleted for good
+        """
+        cls.evictables.discard(item)
+
+    @classmethod
+    def use(cls, item):
+        """
+        Record that item is drawn in this frame, and bring it back first if it was evicted or reduced
+        """
+        item.lastUse = cls.frame
+        if item.evicted or item.reduced:
+            item.restore()
+            cls.restores += 1
+
+    @classmethod
+    def endFrame(cls):
+        """
+        Evict what the frame did not use until the memory in use fits in budget, then start the next frame
+
+        :return: bytes evicted
+        :rtype: int
+        """
+        freed = cls.enforce(cls.budget) if cls.enabled else 0
+        cls.frame += 1
+        return freed
+
+    @classmethod
+    def enforce(cls, budget):
+        """
+        Reduce, then evict items not used in this frame, lowest priority and oldest use first, until at most budget
+        bytes are in use or nothing is left to evict
+
+        :return: bytes evicted
+        :rtype: int
+        """
+        excess = ResourceManager.usedBytes() - budget
+        if excess <= 0:
+            return 0
+        candidates = sorted((item for item in cls.evictables
+                             if not item.evicted and item.lastUse < cls.frame and item.byteSize > 0),
+                            key=lambda item: (item.priority, item.lastUse))
+        freed = 0
+        # the finest detail of every item goes before any item goes whole
+        for item in candidates:
+            while freed < excess and item.detailBytes > 0:
+                freed += item.detailBytes
+                item.reduce()
+                cls.reductions += 1
+        for item in candidates:
+            if freed >= excess:
+                break
+            byteSize = item.byteSize
+            item.evict()
+            freed += byteSize
+            cls.evictions += 1
+        cls.evictedBytes += freed
+        return freed
+
+    @classmethod
+    def report(cls):
+        """
+        Memory in use against the budget with the eviction counts, then one line per category of use
+
+        :rtype: str
+        """
+        evictable = sum(item.byteSize for item in cls.evictables if not item.evicted)
+        lines = [f"GPU memory: {ResourceManager.usedBytes() / 2 ** 20:.2f} of {cls.budget / 2 ** 20:.0f} MB, "
+                 f"{evictable / 2 ** 20:.2f} MB evictable, {cls.reductions} levels dropped, {cls.evictions} "
+                 f"evictions ({cls.evictedBytes / 2 ** 20:.2f} MB), {cls.restores} restores"]
+        lines.extend(f"  {category}: {count} alive, {byteSize / 2 ** 20:.2f} MB"
+                     for category, (count, byteSize) in sorted(ResourceManager.categoryStats().items()))
+        return "\n".join(lines)
@@ -0,0 +1,453 @@
+"""
+Define a mesh arena here. Shared meshes are copied into a few large vertex and index buffers with one VAO, each at
+its own base vertex and first index, so Components drawn with them need no buffer or VAO switch between draws.
+Components submit their draws during Component.draw, and MeshArena.flush sends each arena's draws out in one
+glMultiDrawElementsIndirect call per routing and texture state. The model matrix, mesh color and material of every
+draw go into an InstanceBuffer, each draw command picks its row with its base instance.
+
+:author: agent
+:version: 2026.10.18
+"""
+
+import ctypes
+
+import numpy as np
+
+from GLBuffer import VAO, VBO, EBO, InstanceBuffer, UploadStats, dataPointer, uploadBuffer
+from MeshRegistry import Mesh
+from ResourceManager import ResourceManager
+
+try:
+    import OpenGL
+
+    try:
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+    except ImportError:
+        from ctypes import util
+
+        orig_util_find_library = util.find_library
+
+        def new_util_find_library(name):
+            res = orig_util_find_library(name)
+            if res:
+                return res
+            return '/System/Library/Frameworks/' + name + '.framework/' + name
+
+        util.find_library = new_util_find_library
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+except ImportError:
+    raise ImportError("Required dependency PyOpenGL not present")
+
+
+class ArenaAllocator:
+    """
+    First fit allocator of element ranges in a buffer. Freed ranges are merged with the free ranges next to them.
+    """
+    capacity = 0  # elements in the buffer
+    freeRanges = None  # list<[start, size]> sorted by start
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.freeRanges = [[0, capacity]] if capacity else []
+
+    @property
+    def used(self):
+        return self.capacity - sum(size for _, size in self.freeRanges)
+
+    def allocate(self, size):
+        """
+        :return: start of a free range of size elements, -1 if no free range is large enough
+        :rtype: int
+        """
+        for i, freeRange in enumerate(self.freeRanges):
+            start, freeSize = freeRange
+            if freeSize >= size:
+                if freeSize == size:
+                    del self.freeRanges[i]
+                else:
+                    freeRange[0] += size
+                    freeRange[1] -= size
+                return start
+        return -1
+
+    def free(self, start, size):
+        """
+        Give back a range returned by allocate
+        """
+        i = 0
+        while i < len(self.freeRanges) and self.freeRanges[i][0] < start:
+            i += 1
+        self.freeRanges.insert(i, [start, size])
+        # merge with the next range, then with the previous one
+        if i + 1 < len(self.freeRanges) and start + size == self.freeRanges[i + 1][0]:
+            self.freeRanges[i][1] += self.freeRanges[i + 1][1]
+            del self.freeRanges[i + 1]
+        if i > 0 and self.freeRanges[i - 1][0] + self.freeRanges[i - 1][1] == start:
+            self.freeRanges[i - 1][1] += self.freeRanges[i][1]
+            del self.freeRanges[i]
+
+    def grow(self, capacity):
+        """
+        Add the elements from the old capacity to capacity as free
+        """
+        if capacity > self.capacity:
+            self.free(self.capacity, capacity - self.capacity)
+            self.capacity = capacity
+
+
+class MeshArena:
+    """
+    Shared vertex and index buffers for the meshes of one vertex layout and primitive type.
+    Arenas are made on demand per program, layout and primitive type, and freed when their last mesh is.
+    Call MeshArena.flush(shaderProg) once the Components are drawn.
+    """
+    enabled = True  # batch the draws of Components, when the context supports it
+    supported = None  # context has base instance, checked on first use
+    multiDrawIndirect = False  # context has glMultiDrawElementsIndirect, otherwise draws are sent one by one
+
+    vertexCapacity = 1 << 16  # vertices of a new arena
+    indexCapacity = 1 << 18  # indices of a new arena
+    restartIndex = 0xFFFFFFFF  # primitive restart index of arenas of triangle strips
+
+    arenas = {}  # key -> MeshArena
+    submitted = []  # list<MeshArena> with draws waiting for flush, in submission order
+
+    key = None
+    layout = None  # VertexLayout of the vertex buffer
+    strips = False  # meshes are triangle strips separated by restartIndex
+    shaderProg = None  # program the attribute pointers were set for
+
+    vao = None
+    vertexBuffer = None  # VBO of the vertices of all meshes
+    indexBuffer = None  # EBO of their uint32 indices
+    drawBuffer = None  # InstanceBuffer of per-draw rows, rewritten on every flush
+    commandBuffer = None  # VBO bound as draw indirect buffer, only for its bookkeeping
+    vertexAllocator = None
+    indexAllocator = None
+    meshNum = 0
+
+    pending = None  # list<(stateKey, applyState, Mesh, drawRow)> waiting for flush
+
+    def __init__(self, key, shaderProg, layout, strips):
+        self.key = key
+        self.shaderProg = shaderProg
+        self.layout = layout
+        self.strips = strips
+        self.meshNum = 0
+        self.pending = []
+        self.vertexAllocator = ArenaAllocator(0)
+        self.indexAllocator = ArenaAllocator(0)
+
+        # like the meshes it holds, shared by every scene and freed with the last mesh
+        with ResourceManager.ownedBy(Mesh.resourceOwner), ResourceManager.categorized("meshArena"):
+            self.vao = VAO()
+            self.vertexBuffer = VBO()
+            self.indexBuffer = EBO()
+            self.drawBuffer = InstanceBuffer(gl.GL_STREAM_DRAW)
+            self.commandBuffer = VBO(gl.GL_STREAM_DRAW)
+        self.growVertices(self.vertexCapacity)
+        self.growIndices(self.indexCapacity)
+
+        self.vao.bind()
+        self.indexBuffer.bind()
+        self.drawBuffer.setAttribPointers(shaderProg)
+        self.vao.unbind()
+
+    @classmethod
+    def active(cls):
+        """
+        Whether draws should be submitted to arenas, checks the context on first call
+        """
+        if cls.supported is None:
+            from OpenGL.GL.ARB.base_instance import glInitBaseInstanceARB
+            from OpenGL.GL.ARB.multi_draw_indirect import glInitMultiDrawIndirectARB
+            cls.supported = bool(glInitBaseInstanceARB())
+            cls.multiDrawIndirect = bool(glInitMultiDrawIndirectARB())
+        return cls.enabled and cls.supported
+
+    @property
+    def alive(self):
+        """
+        False once the buffers are deleted, by the last free or by ResourceManager.releaseAll
+        """
+        return self.vao.vao is not None and self.vertexBuffer.vbo is not None and self.indexBuffer.ebo is not None
+
+    @staticmethod
+    def copyBuffer(oldName, oldBytes, newName, newBytes):
+        """
+        Allocate newBytes in buffer newName and copy the first oldBytes of buffer oldName in it, on the GPU
+        """
+        gl.glBindBuffer(gl.GL_COPY_WRITE_BUFFER, newName)
+        gl.glBufferData(gl.GL_COPY_WRITE_BUFFER, newBytes, None, gl.GL_STATIC_DRAW)
+        if oldBytes:
+            gl.glBindBuffer(gl.GL_COPY_READ_BUFFER, oldName)
+            gl.glCopyBufferSubData(gl.GL_COPY_READ_BUFFER, gl.GL_COPY_WRITE_BUFFER, 0, 0, oldBytes)
+            gl.glBindBuffer(gl.GL_COPY_READ_BUFFER, 0)
+        gl.glBindBuffer(gl.GL_COPY_WRITE_BUFFER, 0)
+
+    def growVertices(self, capacity):
+        """
+        Move the vertices into a vertex buffer of capacity vertices, and point the VAO to it
+        """
+        old = self.vertexBuffer
+        if self.vertexAllocator.capacity:
+            with ResourceManager.ownedBy(Mesh.resourceOwner), ResourceManager.categorized("meshArena"):
+                self.vertexBuffer = VBO()
+        self.copyBuffer(old.vbo, old.capacity if old is not self.vertexBuffer else 0, self.vertexBuffer.vbo,
+                        capacity * self.layout.stride)
+        if old is not self.vertexBuffer:
+            old.delete()
+        self.vertexBuffer.capacity = self.vertexBuffer.byteLength = capacity * self.layout.stride
+        self.vertexBuffer.resource.byteSize = self.vertexBuffer.capacity
+        self.vertexBuffer.layout = self.layout
+        self.vertexAllocator.grow(capacity)
+
+        self.vao.bind()
+        self.layout.setAttribPointers(self.vertexBuffer, self.shaderProg)
+        self.vao.unbind()
+
+    def growIndices(self, capacity):
+        """
+        Move the indices into an index buffer of capacity indices, and point the VAO to it
+        """
+        old = self.indexBuffer
+        if self.indexAllocator.capacity:
+            with ResourceManager.ownedBy(Mesh.resourceOwner), ResourceManager.categorized("meshArena"):
+                self.indexBuffer = EBO()
+        self.copyBuffer(old.ebo, old.capacity if old is not self.indexBuffer else 0, self.indexBuffer.ebo,
+                        4 * capacity)
+        if old is not self.indexBuffer:
+            old.delete()
+        self.indexBuffer.capacity = self.indexBuffer.byteLength = 4 * capacity
+        self.indexBuffer.resource.byteSize = self.indexBuffer.capacity
+        self.indexAllocator.grow(capacity)
+
+        self.vao.bind()
+        self.indexBuffer.bind()
+        self.vao.unbind()
+
+    @classmethod
+    def arenaFor(cls, shaderProg, layout, strips):
+        """
+        Arena for meshes drawn with shaderProg, stored with layout, made if there is none
+
+        :rtype: MeshArena
+        """
+        # the GLProgram itself, its GL name may be given again to a program of another context
+        key = (shaderProg, tuple((a.name, a.column, a.size, a.format) for a in layout.attributes),
+               tuple((a.name, tuple(a.default)) for a in layout.dropped), strips)
+        arena = cls.arenas.get(key)
+        if arena is None or not arena.alive:
+            arena = MeshArena(key, shaderProg, layout, strips)
+            cls.arenas[key] = arena
+        return arena
+
+    def place(self, mesh):
+        """
+        Copy vertices and indices of mesh into this arena, growing the buffers if they are full
+        """
+        vertexNum = mesh.vertices.shape[0]
+        baseVertex = self.vertexAllocator.allocate(vertexNum)
+        if baseVertex < 0:
+            self.growVertices(max(2 * self.vertexAllocator.capacity, self.vertexAllocator.capacity + vertexNum))
+            baseVertex = self.vertexAllocator.allocate(vertexNum)
+
+        indices = np.asarray(mesh.indices).reshape(-1)
+        firstIndex = self.indexAllocator.allocate(indices.size)
+        if firstIndex < 0:
+            self.growIndices(max(2 * self.indexAllocator.capacity, self.indexAllocator.capacity + indices.size))
+            firstIndex = self.indexAllocator.allocate(indices.size)
+
+        mesh.arena = self
+        mesh.baseVertex = baseVertex
+        mesh.firstIndex = firstIndex
+        self.meshNum += 1
+        self.writeVertices(mesh)
+
+        arenaIndices = indices.astype(np.uint32)
+        if mesh.restartIndex is not None:
+            arenaIndices[indices == mesh.restartIndex] = self.restartIndex
+        self.write(self.indexBuffer.ebo, 4 * firstIndex, arenaIndices,
+                   0 if indices.dtype == arenaIndices.dtype else arenaIndices.nbytes)
+        # nothing draws from the buffers of the mesh any more, they are filled again if it is drawn on its own
+        if not mesh.evicted:
+            mesh.evict()
+
+    def writeVertices(self, mesh, firstVertex=0, vertexNum=None):
+        """
+        Copy the vertices of a mesh placed in this arena again, after they changed
+
+        :param firstVertex: first vertex of the mesh to copy
+        :param vertexNum: number of vertices to copy, all from firstVertex on if None
+        """
+        vertices = mesh.vertices[firstVertex:None if vertexNum is None else firstVertex + vertexNum]
+        packed = self.layout.pack(vertices)
+        self.write(self.vertexBuffer.vbo, (mesh.baseVertex + firstVertex) * self.layout.stride, packed,
+                   self.layout.packedCopyBytes(vertices))
+        if firstVertex == 0 and vertices.shape[0] == mesh.vertices.shape[0]:
+            mesh.arenaStale = False
+
+    @staticmethod
+    def write(bufferName, offsetBytes, data, bytesCopied):
+        # through the copy target, so the element buffer of whatever VAO is bound stays as it is
+        gl.glBindBuffer(gl.GL_COPY_WRITE_BUFFER, bufferName)
+        gl.glBufferSubData(gl.GL_COPY_WRITE_BUFFER, offsetBytes, data.nbytes, dataPointer(data))
+        gl.glBindBuffer(gl.GL_COPY_WRITE_BUFFER, 0)
+        UploadStats.record(data.nbytes, bytesCopied)
+
+    def free(self, mesh):
+        """
+        Give back the ranges of mesh, the arena is deleted with its last mesh
+        """
+        self.vertexAllocator.free(mesh.baseVertex, mesh.vertices.shape[0])
+        self.indexAllocator.free(mesh.firstIndex, np.asarray(mesh.indices).size)
+        mesh.arena = None
+        self.meshNum -= 1
+        if self.meshNum <= 0:
+            self.delete()
+
+    def delete(self):
+        self.vao.delete()
+        self.vertexBuffer.delete()
+        self.indexBuffer.delete()
+        self.drawBuffer.delete()
+        self.commandBuffer.delete()
+        self.pending = []
+        if MeshArena.arenas.get(self.key) is self:
+            del MeshArena.arenas[self.key]
+
+    @staticmethod
+    def drawRow(modelMat, meshColor, material):
+        """
+        Per-draw row of a Component, see InstanceBuffer
+
+        :param modelMat: column-major model matrix
+        :param meshColor: vertex color multiplier
+        :param material: Material of the Component
+        :rtype: numpy.ndarray
+        """
+        return np.concatenate((modelMat.reshape(-1), meshColor,
+                               InstanceBuffer.materialRow(material))).astype(np.float32)
+
+    @classmethod
+    def submit(cls, shaderProg, mesh, layout, drawRow, stateKey, applyState):
+        """
+        Queue a draw of mesh until flush. The mesh is copied into its arena on its first draw.
+
+        :param mesh: uploaded Mesh from MeshRegistry
+        :param layout: VertexLayout the mesh is stored with in the arena
+        :param drawRow: per-draw values from drawRow
+        :param stateKey: hashable description of the routing and texture state the draw needs
+        :param applyState: callable taking shaderProg which sets that state, called once for all draws with the
+                           same stateKey
+        """
+        arena = mesh.arena
+        if arena is None or not arena.alive:
+            arena = cls.arenaFor(shaderProg, layout, mesh.restartIndex is not None)
+            arena.place(mesh)
+        elif mesh.arenaStale:
+            arena.writeVertices(mesh)
+        if not arena.pending:
+            cls.submitted.append(arena)
+        arena.pending.append((stateKey, applyState, mesh, drawRow))
+
+    @classmethod
+    def flush(cls, shaderProg):
+        """
+        Draw everything submitted since the last flush
+
+        :return: number of draws
+        :rtype: int
+        """
+        drawNum = 0
+        if not cls.submitted:
+            return drawNum
+        # rows hold the whole model matrix
+        shaderProg.setMat4("modelMat", np.identity(4))
+        shaderProg.setBool("instanceData", True)
+        for arena in cls.submitted:
+            drawNum += arena.drawPending(shaderProg)
+        cls.submitted = []
+        shaderProg.setBool("instanceData", False)
+        return drawNum
+
+    def drawPending(self, shaderProg):
+        """
+        Upload per-draw rows and draw commands of the pending draws grouped by state, and draw every group
+
+        :return: number of draws
+        :rtype: int
+        """
+        groups = {}  # stateKey -> (applyState, list<(Mesh, drawRow)>), in first submission order
+        for stateKey, applyState, mesh, drawRow in self.pending:
+            groups.setdefault(stateKey, (applyState, []))[1].append((mesh, drawRow))
+        self.pending = []
+        if not self.alive:
+            return 0
+
+        drawNum = sum(len(draws) for _, draws in groups.values())
+        rows = np.empty((drawNum, InstanceBuffer.rowSize), dtype=np.float32)
+        # count, instance count, first index, base vertex, base instance
+        commands = np.empty((drawNum, 5), dtype=np.uint32)
+        spans = []
+        i = 0
+        for applyState, draws in groups.values():
+            spans.append((applyState, i, len(draws)))
+            for mesh, drawRow in draws:
+                rows[i] = drawRow
+                commands[i] = (mesh.indices.size, 1, mesh.firstIndex, mesh.baseVertex, i)
+                i += 1
+
+        self.drawBuffer.setInstances(rows)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+        mode = gl.GL_TRIANGLE_STRIP if self.strips else gl.GL_TRIANGLES
+        if self.strips:
+            gl.glEnable(gl.GL_PRIMITIVE_RESTART)
+            gl.glPrimitiveRestartIndex(self.restartIndex)
+        if self.multiDrawIndirect:
+            gl.glBindBuffer(gl.GL_DRAW_INDIRECT_BUFFER, self.commandBuffer.vbo)
+            self.commandBuffer.capacity = uploadBuffer(gl.GL_DRAW_INDIRECT_BUFFER, commands, gl.GL_STREAM_DRAW,
+                                                       self.commandBuffer.capacity)
+            self.commandBuffer.resource.byteSize = self.commandBuffer.capacity
+            UploadStats.record(commands.nbytes, 0)
+
+        self.vao.bind()
+        for applyState, first, count in spans:
+            applyState(shaderProg)
+            if self.multiDrawIndirect:
+                gl.glMultiDrawElementsIndirect(mode, gl.GL_UNSIGNED_INT, ctypes.c_void_p(first * commands[0].nbytes),
+                                               count, 0)
+                continue
+            for indexNum, _, firstIndex, baseVertex, baseInstance in commands[first:first + count].tolist():
+                gl.glDrawElementsInstancedBaseVertexBaseInstance(mode, indexNum, gl.GL_UNSIGNED_INT,
+                                                                 ctypes.c_void_p(4 * firstIndex), 1, baseVertex,
+                                                                 baseInstance)
+        self.vao.unbind()
+
+        if self.multiDrawIndirect:
+            gl.glBindBuffer(gl.GL_DRAW_INDIRECT_BUFFER, 0)
+        if self.strips:
+            gl.glDisable(gl.GL_PRIMITIVE_RESTART)
+        return drawNum
+
+    @classmethod
+    def stats(cls):
+        """
+        :return: number of arenas, meshes placed in them, and vertices and indices in use
+        :rtype: tuple(int, int, int, int)
+        """
+        arenas = [arena for arena in cls.arenas.values() if arena.alive]
+        return (len(arenas), sum(arena.meshNum for arena in arenas),
+                sum(arena.vertexAllocator.used for arena in arenas),
+                sum(arena.indexAllocator.used for arena in arenas))
+
+    @classmethod
+    def report(cls):
+        """
+        :rtype: str
+        """
+        arenaNum, meshNum, vertexNum, indexNum = cls.stats()
+        return f"mesh arenas: {arenaNum} arenas, {meshNum} meshes, {vertexNum} vertices, {indexNum} indices"
@@ -0,0 +1,303 @@
+"""
+Define index buffer optimizations here. Duplicated vertices are welded, triangles are reordered for the post-transform
+vertex cache with Tipsify, then clusters of triangles are sorted to reduce overdraw, and optionally stitched into
+triangle strips.
+Reference: Sander, Nehab and Barczak, Fast Triangle Reordering for Vertex Locality and Reduced Overdraw, 2007
+
+:author: agent
+:version: 2026.10.18
+"""
+
+import numpy as np
+
+from GLBuffer import EBO
+
+
+class MeshOptimizer:
+    """
+    Help functions working on flattened triangle list indices. Vertex order inside each triangle is never changed,
+    so winding stays the same.
+    """
+    cacheSize = 16  # post-transform cache size we optimize for and measure with
+    maxTriangles = 1 << 18  # bigger meshes are left as they are, the optimizer runs in Python
+
+    @staticmethod
+    def acmr(indices, cacheSize=None):
+        """
+        Average cache miss ratio, vertex shader runs per triangle with a FIFO cache. 0.5 is the best possible
+        on large closed meshes and 3 the worst.
+
+        :param indices: flattened triangle list indices
+        :type indices: numpy.ndarray
+        :param cacheSize: FIFO cache size, MeshOptimizer.cacheSize if not given
+        :rtype: float
+        """
+        cacheSize = MeshOptimizer.cacheSize if cacheSize is None else cacheSize
+        triangleNum = indices.size // 3
+        if triangleNum == 0:
+            return 0.0
+        # a vertex is in the FIFO cache if less than cacheSize misses happened since it was loaded
+        loadedAt = {}
+        misses = 0
+        for v in indices.tolist():
+            if misses - loadedAt.get(v, -cacheSize) >= cacheSize:
+                misses += 1
+                loadedAt[v] = misses
+        return misses / triangleNum
+
+    @staticmethod
+    def tipsify(indices, vertexNum, cacheSize=None):
+        """
+        Reorder triangles for vertex cache locality
+
+        :param indices: flattened triangle list indices
+        :param vertexNum: number of vertices referred by indices
+        :param cacheSize: cache size to optimize for, MeshOptimizer.cacheSize if not given
+        :return: reordered triangle ids and the positions in that order where a new cluster starts
+        :rtype: tuple(numpy.ndarray, list<int>)
+        """
+        k = MeshOptimizer.cacheSize if cacheSize is None else cacheSize
+        triangles = indices.reshape((-1, 3))
+        triangleNum = triangles.shape[0]
+
+        # vertex -> triangles adjacency in compressed rows
+        flat = triangles.ravel()
+        adjacentTriangles = (np.argsort(flat, kind="stable") // 3).tolist()
+        liveCount = np.bincount(flat, minlength=vertexNum)
+        adjacencyStart = np.concatenate([[0], np.cumsum(liveCount)]).tolist()
+        liveCount = liveCount.tolist()
+        triangleList = triangles.tolist()
+
+        cacheTime = [0] * vertexNum
+        emitted = [False] * triangleNum
+        deadEnd = []
+        order = []
+        clusterStarts = [0]
+        timeStamp = k + 1
+        cursor = 0
+
+        fanning = 0
+        while fanning >= 0:
+            candidates = []
+            for t in adjacentTriangles[adjacencyStart[fanning]:adjacencyStart[fanning + 1]]:
+                if emitted[t]:
+                    continue
+                order.append(t)
+                emitted[t] = True
+                for v in triangleList[t]:
+                    deadEnd.append(v)
+                    candidates.append(v)
+                    liveCount[v] -= 1
+                    if timeStamp - cacheTime[v] > k:
+                        cacheTime[v] = timeStamp
+                        timeStamp += 1
+
+            # next fanning vertex, prefer vertices still in cache which will not be evicted while fanning
+            fanning = -1
+            bestPriority = -1
+            for v in candidates:
+                if liveCount[v] > 0:
+                    priority = 0
+                    if timeStamp - cacheTime[v] + 2 * liveCount[v] <= k:
+                        priority = timeStamp - cacheTime[v]
+                    if priority > bestPriority:
+                        bestPriority = priority
+                        fanning = v
+            if fanning != -1:
+                continue
+
+            # dead end, go back through recently used vertices, then scan for any vertex with live triangles
+            while deadEnd:
+                v = deadEnd.pop()
+                if liveCount[v] > 0:
+                    fanning = v
+                    break
+            else:
+                while cursor < vertexNum:
+                    if liveCount[cursor] > 0:
+                        fanning = cursor
+                        break
+                    cursor += 1
+            if fanning != -1 and len(order) < triangleNum:
+                clusterStarts.append(len(order))
+
+        return np.array(order, dtype=np.int64), clusterStarts
+
+    @staticmethod
+    def sortClusters(positions, triangles, clusterStarts, normals=None):
+        """
+        Sort clusters so the ones facing away from the mesh center come first, they are likely to occlude the others
+
+        :param positions: (N, 3) vertex positions
+        :param triangles: (M, 3) triangle indices, already in cluster order
+        :param clusterStarts: first triangle of every cluster, increasing
+        :param normals: (N, 3) vertex normals the clusters face along. If None, the winding of the triangles is
+                        taken as counterclockwise seen from outside, which not every mesh follows
+        :return: new triangle order
+        :rtype: numpy.ndarray
+        """
+        if len(clusterStarts) <= 1:
+            return np.arange(triangles.shape[0])
+        p = positions[triangles].astype(np.float64)  # (M, 3, 3)
+        faceNormals = np.cross(p[:, 1] - p[:, 0], p[:, 2] - p[:, 0])  # length is twice the area
+        areas = np.linalg.norm(faceNormals, axis=1)
+        centroids = p.mean(axis=1)
+
+        meshCenter = (centroids * areas[:, None]).sum(axis=0) / max(areas.sum(), 1e-12)
+        clusterArea = np.add.reduceat(areas, clusterStarts)
+        clusterCenter = np.add.reduceat(centroids * areas[:, None], clusterStarts) / \
+            np.maximum(clusterArea, 1e-12)[:, None]
+        if normals is not None:
+            # the lit side, whatever way the triangles wind
+            faceNormals = normals[triangles].astype(np.float64).mean(axis=1) * areas[:, None]
+        clusterNormal = np.add.reduceat(faceNormals, clusterStarts)
+        clusterNormal /= np.maximum(np.linalg.norm(clusterNormal, axis=1), 1e-12)[:, None]
+        outwardness = ((clusterCenter - meshCenter) * clusterNormal).sum(axis=1)
+
+        bounds = np.append(clusterStarts, triangles.shape[0])
+        return np.concatenate([np.arange(bounds[c], bounds[c + 1]) for c in np.argsort(-outwardness, kind="stable")])
+
+    @staticmethod
+    def stripify(indices, vertexNum):
+        """
+        Greedily stitch triangles into strips joined by a primitive restart index. Strips follow the given
+        triangle order as much as possible, so cache locality is kept.
+
+        :param indices: flattened triangle list indices
+        :param vertexNum: number of vertices referred by indices
+        :return: strip indices and the restart index used in them
+        :rtype: tuple(numpy.ndarray, int)
+        """
+        triangles = indices.reshape((-1, 3)).tolist()
+        # directed edge -> (triangle, opposite vertex), a triangle (a, b, c) has edges a->b, b->c and c->a
+        edgeMap = {}
+        for t, (a, b, c) in enumerate(triangles):
+            edgeMap[(a, b)] = (t, c)
+            edgeMap[(b, c)] = (t, a)
+            edgeMap[(c, a)] = (t, b)
+
+        used = [False] * len(triangles)
+        strips = []
+        for t, (a, b, c) in enumerate(triangles):
+            if used[t]:
+                continue
+            used[t] = True
+            # start with the rotation which can continue into an unused neighbour
+            start = [a, b, c]
+            for rotation in ([a, b, c], [b, c, a], [c, a, b]):
+                neighbour = edgeMap.get((rotation[2], rotation[1]))
+                if neighbour is not None and not used[neighbour[0]]:
+                    start = rotation
+                    break
+            strip = start
+            while True:
+                # triangle number n in a strip is (s[n], s[n+1], s[n+2]), with the first two swapped when n is odd
+                if (len(strip) - 2) % 2 == 0:
+                    neighbour = edgeMap.get((strip[-2], strip[-1]))
+                else:
+                    neighbour = edgeMap.get((strip[-1], strip[-2]))
+                if neighbour is None or used[neighbour[0]]:
+                    break
+                used[neighbour[0]] = True
+                strip.append(neighbour[1])
+            strips.append(strip)
+
+        dtype = np.dtype("uint16") if vertexNum < 0xFFFF else np.dtype("uint32")
+        restartIndex = int(np.iinfo(dtype).max)
+        result = []
+        for strip in strips:
+            result.extend(strip)
+            result.append(restartIndex)
+        return np.array(result[:-1], dtype=dtype), restartIndex
+
+    @staticmethod
+    def triangleList(indices, restartIndex=None):
+        """
+        Flattened triangle list of indices, decoding triangle strips if a restart index is given
+
+        :rtype: numpy.ndarray
+        """
+        indices = np.asarray(indices).ravel()
+        if restartIndex is None:
+            return indices
+        triangles = []
+        for strip in np.split(indices, np.nonzero(indices == restartIndex)[0]):
+            strip = strip[strip != restartIndex].tolist()
+            for n in range(len(strip) - 2):
+                if n % 2 == 0:
+                    triangles.extend((strip[n], strip[n + 1], strip[n + 2]))
+                else:
+                    triangles.extend((strip[n + 1], strip[n], strip[n + 2]))
+        return np.array(triangles, dtype=indices.dtype)
+
+    @staticmethod
+    def weld(vertices, indices):
+        """
+        Merge vertices whose attributes are all the same, like the corners shared by two triangles of one cube face.
+        Every packed vertex row is hashed, the same way Point.__hash__ hashes one point, and rows with the same hash
+        are compared in full so a hash collision never merges different vertices.
+
+        :param vertices: (N, k) vertex attributes
+        :param indices: flattened indices into vertices
+        :return: kept vertices in order of first use, indices into them, and the row of vertices each one was kept from
+        :rtype: tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+        vertexNum = vertices.shape[0]
+        # adding 0 turns -0.0 into 0.0, which are the same attribute but not the same bits
+        rows = np.ascontiguousarray(vertices, dtype=np.float32) + np.float32(0)
+        words = rows.view(np.uint32).astype(np.uint64)
+
+        # FNV-1a over the 32 bit words of each row
+        rowHash = np.full(vertexNum, 14695981039346656037, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for column in words.T:
+                rowHash = (rowHash ^ column) * np.uint64(1099511628211)
+        _, first, group = np.unique(rowHash, return_index=True, return_inverse=True)
+        group = group.ravel()
+        if np.any(words != words[first[group]]):
+            # hash collision, fall back to comparing whole rows
+            _, first, group = np.unique(rows.view(np.dtype((np.void, rows.dtype.itemsize * rows.shape[1]))).ravel(),
+                                        return_index=True, return_inverse=True)
+            group = group.ravel()
+
+        # number the kept vertices in order of first appearance, which keeps the generator's locality
+        order = np.argsort(first, kind="stable")
+        rank = np.empty_like(order)
+        rank[order] = np.arange(order.shape[0])
+        kept = first[order]
+        indices = np.asarray(indices).ravel()
+        dtype = indices.dtype if indices.dtype in EBO.indexTypes else EBO.indexDtype(kept.shape[0])
+        return vertices[kept], rank[group][indices].astype(dtype), kept
+
+    @staticmethod
+    def optimize(positions, indices, strips=False, normals=None):
+        """
+        Run the whole optimization on one mesh
+
+        :param positions: (N, 3) vertex positions
+        :param indices: flattened triangle list indices
+        :param strips: if True, return triangle strips with primitive restart instead of a triangle list
+        :param normals: (N, 3) vertex normals, see sortClusters
+        :return: new indices, restart index (None for triangle list), ACMR before and ACMR after
+        :rtype: tuple(numpy.ndarray, int, float, float)
+        """
+        vertexNum = positions.shape[0]
+        indices = np.asarray(indices).ravel()
+        dtype = indices.dtype if indices.dtype in EBO.indexTypes else EBO.indexDtype(vertexNum)
+        acmrBefore = MeshOptimizer.acmr(indices)
+        if indices.size // 3 > MeshOptimizer.maxTriangles:
+            return indices.astype(dtype, copy=False), None, acmrBefore, acmrBefore
+
+        triangles = indices.reshape((-1, 3))
+        order, clusterStarts = MeshOptimizer.tipsify(indices, vertexNum)
+        triangles = triangles[order]
+        triangles = triangles[MeshOptimizer.sortClusters(positions, triangles, clusterStarts, normals)]
+        optimized = triangles.ravel().astype(dtype)
+        acmrAfter = MeshOptimizer.acmr(optimized)
+
+        if strips:
+            stripIndices, restartIndex = MeshOptimizer.stripify(optimized, vertexNum)
+            # meshes without shared edges, like the unindexed cube, only get longer as strips
+            if stripIndices.nbytes < optimized.nbytes:
+                return stripIndices, restartIndex, acmrBefore, acmrAfter
+        return optimized, None, acmrBefore, acmrAfter
@@ -0,0 +1,263 @@
+"""
+Define a registry to share generated meshes between Displayables.
+Displayables asking for the same shape get the same Mesh, so it is generated and uploaded only once.
+
+:author: agent
+:version: 2026.10.18
+"""
+
+import numpy as np
+
+from GLBuffer import VAO, VBO, EBO
+from MemoryBudget import MemoryBudget
+from MeshOptimizer import MeshOptimizer
+from ResourceManager import ResourceManager
+
+try:
+    import OpenGL
+
+    try:
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+    except ImportError:
+        from ctypes import util
+
+        orig_util_find_library = util.find_library
+
+        def new_util_find_library(name):
+            res = orig_util_find_library(name)
+            if res:
+                return res
+            return '/System/Library/Frameworks/' + name + '.framework/' + name
+
+        util.find_library = new_util_find_library
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+except ImportError:
+    raise ImportError("Required dependency PyOpenGL not present")
+
+
+class Mesh:
+    """
+    CPU arrays and GPU buffers of one generated shape. Shared by reference count, read-only for its users.
+    """
+    key = None
+    procedural = False  # see ProceduralMesh
+
+    vao = None
+    vbo = None
+    ebo = None
+
+    vertices = None
+    indices = None
+
+    boundingRadius = 0  # distance from local origin to the farthest vertex
+
+    generatedVertexNum = 0  # vertex count from the builder, before welding
+    weldKept = None  # row of the generated vertices each welded vertex was kept from, None if not welded
+
+    restartIndex = None  # primitive restart index if indices are triangle strips
+    acmrBefore = 0  # average cache miss ratio of the generated indices
+    acmrAfter = 0  # average cache miss ratio after index optimization
+
+    resource = None  # record in ResourceManager counting the holders of the mesh, it deletes the mesh with the last
+    uploaded = False  # set by the first Displayable which uploads vertices and indices to the buffers
+
+    # copy of the mesh in a shared MeshArena, made on its first batched draw
+    arena = None
+    baseVertex = 0  # first vertex of the mesh in the arena vertex buffer
+    firstIndex = 0  # first index of the mesh in the arena index buffer
+    arenaStale = False  # vertices changed since they were copied into the arena
+
+    # see MemoryBudget, an evicted mesh keeps its CPU arrays and buffer names but not the buffer storage
+    priority = MemoryBudget.CACHED  # raised by the Displayables holding it, see Displayable.setLodChain
+    lastUse = 0
+    evicted = False
+    detailBytes = 0  # meshes have no detail to drop, coarser levels of detail are meshes of their own
+    reduced = False
+
+    resourceOwner = "MeshRegistry"  # owner tag of mesh buffers, they are freed by reference count, not by scene
+
+    def __init__(self, key, vertices, indices, optimize=True, strips=False, weld=True):
+        self.key = key
+        self.generatedVertexNum = vertices.shape[0]
+        self.weldKept = None
+        if weld:
+            vertices, indices, self.weldKept = MeshOptimizer.weld(vertices, indices)
+        self.vertices = vertices
+        self.restartIndex = None
+        if optimize:
+            indices, self.restartIndex, self.acmrBefore, self.acmrAfter = \
+                MeshOptimizer.optimize(vertices[:, 0:3], indices, strips, vertices[:, 3:6])
+        self.indices = indices
+        self.boundingRadius = self.radiusOf(vertices)
+        self.uploaded = False
+
+        with ResourceManager.ownedBy(self.resourceOwner), ResourceManager.categorized("mesh"):
+            self.vao = VAO()
+            self.vbo = VBO()  # vbo can only be initiate with glProgram activated
+            self.ebo = EBO()
+            # the one reference of the holder the mesh is made for
+            self.resource = ResourceManager.track("mesh", self.vao.vao, self.delete)
+        MemoryBudget.register(self)
+
+    @property
+    def refCount(self):
+        """
+        :return: number of holders, 0 once the mesh is deleted
+        :rtype: int
+        """
+        return self.resource.refCount if self.resource is not None else 0
+
+    @staticmethod
+    def radiusOf(vertices):
+        return float(np.sqrt((vertices[:, 0:3].astype(np.float64) ** 2).sum(axis=1)).max()) if len(vertices) else 0.0
+
+    def updateVertices(self, vertices):
+        """
+        Replace the vertex array by one with the same vertex count and columns, for a mesh only one Displayable
+        holds. Indices stay valid. The owner uploads the vertices again.
+
+        :param vertices: new vertices as the builder generated them, they are welded the same way as the first ones
+        """
+        if self.weldKept is not None and vertices.shape[0] == self.generatedVertexNum:
+            vertices = vertices[self.weldKept]
+        self.vertices = vertices
+        self.boundingRadius = self.radiusOf(vertices)
+        self.arenaStale = self.arena is not None
+
+    def copy(self, key):
+        """
+        New mesh under key with a copy of the vertices and the same indices, for a holder which is about to modify
+        the vertices. Nothing is welded or optimized again, and the copy is not uploaded. Its VBO is dynamic, so
+        every attribute is stored and can be rewritten in place.
+
+        :rtype: Mesh
+        """
+        copied = Mesh(key, self.vertices.copy(), self.indices, optimize=False, weld=False)
+        copied.vbo.usage = gl.GL_DYNAMIC_DRAW
+        copied.generatedVertexNum = self.generatedVertexNum
+        copied.weldKept = self.weldKept
+        copied.restartIndex = self.restartIndex
+        copied.acmrBefore = self.acmrBefore
+        copied.acmrAfter = self.acmrAfter
+        copied.priority = self.priority
+        return copied
+
+    @property
+    def byteSize(self):
+        """
+        :return: GPU memory of the vertex and index buffers, 0 once they are freed
+        :rtype: int
+        """
+        return ((self.vbo.capacity if self.vbo.vbo is not None else 0) +
+                (self.ebo.capacity if self.ebo.ebo is not None else 0))
+
+    def evict(self):
+        """
+        Free the storage of the vertex and index buffers, for MemoryBudget or once the mesh is placed in a MeshArena.
+        Their names stay, so VAOs pointing at them stay valid, and restore fills them again. A copy in a MeshArena is
+        kept.
+        """
+        self.vbo.releaseStorage()
+        self.ebo.releaseStorage()
+        self.evicted = True
+
+    def restore(self):
+        """
+        Upload the vertices and indices of an evicted mesh again
+        """
+        self.vao.bind()
+        self.vbo.updateVertices(self.vertices)
+        self.ebo.setBuffer(self.indices, self.restartIndex)
+        self.vao.unbind()
+        self.evicted = False
+
+    def delete(self):
+        """
+        Free the GPU buffers of this mesh, it cannot be drawn after this call
+        """
+        if MeshRegistry.meshes.get(self.key) is self:
+            del MeshRegistry.meshes[self.key]
+        ResourceManager.forget(self.resource)
+        self.resource = None
+        MemoryBudget.forget(self)
+        if self.arena is not None:
+            self.arena.free(self)
+        self.vbo.delete()
+        self.ebo.delete()
+        self.vao.delete()
+        self.uploaded = False
+
+
+class MeshRegistry:
+    """
+    Map from (displayable type, generation parameters) to a shared Mesh. All methods are class level, so there is
+    one registry for the whole program.
+    """
+    meshes = {}  # key -> Mesh
+
+    optimizeIndices = True  # reorder indices of new meshes for vertex cache and overdraw
+    useStrips = False  # upload new meshes as triangle strips with primitive restart
+    weldVertices = True  # merge duplicated vertices of new meshes
+
+    @classmethod
+    def acquire(cls, key, builder):
+        """
+        Get a reference to the mesh for key, build it if nobody is holding it
+
+        :param key: hashable description of the shape, normally displayable type plus generation parameters
+        :param builder: callable with no arguments which returns (vertices, indices) of the shape
+        :rtype: Mesh
+        """
+        mesh = cls.meshes.get(key)
+        if mesh is None:
+            vertices, indices = builder()
+            mesh = Mesh(key, vertices, indices, cls.optimizeIndices, cls.useStrips, cls.weldVertices)
+            cls.meshes[key] = mesh
+        else:
+            ResourceManager.retain(mesh.resource)
+        return mesh
+
+    @classmethod
+    def release(cls, mesh):
+        """
+        Drop one reference to mesh. The mesh is deleted from GPU when its last reference is gone
+        """
+        if mesh.resource is not None:
+            ResourceManager.release(mesh.resource)
+
+    @classmethod
+    def privateCopy(cls, mesh, key):
+        """
+        Trade one reference to mesh for the only reference to a copy of it under key, see Mesh.copy
+
+        :rtype: Mesh
+        """
+        copied = mesh.copy(key)
+        cls.meshes[key] = copied
+        cls.release(mesh)
+        return copied
+
+    @classmethod
+    def stats(cls):
+        """
+        :return: number of unique meshes alive and total references held on them
+        :rtype: tuple(int, int)
+        """
+        return len(cls.meshes), sum(m.refCount for m in cls.meshes.values())
+
+    @classmethod
+    def report(cls):
+        """
+        One line per mesh alive with its size, the vertices saved by welding and the ACMR gain of index optimization
+
+        :rtype: str
+        """
+        lines = []
+        for key, mesh in cls.meshes.items():
+            lines.append(f"{key[0]}{key[2]}: {mesh.vertices.shape[0]} vertices "
+                         f"(welded from {mesh.generatedVertexNum}), refs {mesh.refCount}, "
+                         f"ACMR {mesh.acmrBefore:.3f} -> {mesh.acmrAfter:.3f}"
+                         f"{', strips' if mesh.restartIndex is not None else ''}")
+        return "\n".join(lines)
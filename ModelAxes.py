@@ -25,13 +25,13 @@ class ModelAxes(Component):
         self.components = []
         self.shaderProg = shaderProg
 
-        xAxes = Component(Point((1, 0, 0)), DisplayableCube(self.shaderProg, 0.05, 0.05, 2, ColorType.SOFTRED))
+        xAxes = Component(Point((1, 0, 0)), DisplayableCube(self.shaderProg, 0.05, 0.05, 2, ColorType.SOFTRED, unitMesh=True))
         xAxes.setDefaultAngle(90, xAxes.vAxis)
         xAxes.renderingRouting = "vertex"
-        yAxes = Component(Point((0, 1, 0)), DisplayableCube(self.shaderProg, 0.05, 0.05, 2, ColorType.SOFTGREEN))
+        yAxes = Component(Point((0, 1, 0)), DisplayableCube(self.shaderProg, 0.05, 0.05, 2, ColorType.SOFTGREEN, unitMesh=True))
         yAxes.setDefaultAngle(-90, yAxes.uAxis)
         yAxes.renderingRouting = "vertex"
-        zAxes = Component(Point((0, 0, 1)), DisplayableCube(self.shaderProg, 0.05, 0.05, 2, ColorType.SOFTBLUE))
+        zAxes = Component(Point((0, 0, 1)), DisplayableCube(self.shaderProg, 0.05, 0.05, 2, ColorType.SOFTBLUE, unitMesh=True))
         zAxes.renderingRouting = "vertex"
         self.addChild(xAxes)
         self.addChild(yAxes)
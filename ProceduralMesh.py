@@ -0,0 +1,127 @@
+"""
+Define procedural meshes here. A procedural mesh has no vertex or index buffer, the vertex shader rebuilds
+every vertex from gl_VertexID and a few shape uniforms, see proceduralVertex in GLProgram.genVertexShaderSource.
+
+:author: agent
+:version: 2026.10.18
+"""
+
+import math
+
+import numpy as np
+
+from GLBuffer import VAO
+from ResourceManager import ResourceManager
+
+try:
+    import OpenGL
+
+    try:
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+    except ImportError:
+        from ctypes import util
+
+        orig_util_find_library = util.find_library
+
+        def new_util_find_library(name):
+            res = orig_util_find_library(name)
+            if res:
+                return res
+            return '/System/Library/Frameworks/' + name + '.framework/' + name
+
+        util.find_library = new_util_find_library
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+except ImportError:
+    raise ImportError("Required dependency PyOpenGL not present")
+
+
+class ProceduralMesh:
+    """
+    One tessellation of an ellipsoid, torus or cylinder drawn from shape parameters only.
+    It has the members of Mesh which Displayable reads, so it can be a level in a level of detail chain.
+    Building one costs nothing, so shape parameters can change every frame.
+    """
+    # values of the proceduralShape uniform
+    ELLIPSOID = 1
+    TORUS = 2
+    CYLINDER = 3
+
+    emptyVao = None  # shared by every procedural draw, core profile needs a bound VAO even with no attributes
+
+    procedural = True
+    key = None
+    vbo = None
+    ebo = None
+    vertices = None
+    indices = None
+    restartIndex = None
+    uploaded = True  # nothing to upload
+
+    shape = 0
+    params = None  # vec4 shapeParams uniform
+    rows = 0
+    columns = 0
+    color = None
+    vertexNum = 0  # vertices drawn, three per triangle
+    boundingRadius = 0
+
+    def __init__(self, shape, params, rows, columns, color):
+        """
+        :param shape: ELLIPSOID, TORUS or CYLINDER
+        :param params: ellipsoid: (radiusX, radiusY, radiusZ), torus: (innerRadius, outerRadius),
+                       cylinder: (radius, height)
+        :param rows: ellipsoid: stacks, torus: rings, cylinder: unused
+        :param columns: ellipsoid: slices, torus and cylinder: nsides
+        :param color: vertex color
+        :type color: ColorType
+        """
+        self.shape = shape
+        self.params = np.zeros(4, dtype=np.float32)
+        self.params[:len(params)] = params
+        self.rows = rows
+        self.columns = columns
+        self.color = np.array(tuple(color), dtype=np.float32)
+
+        if shape == self.CYLINDER:
+            # 2 triangles per side and 1 in each cap
+            self.vertexNum = 3 * 4 * columns
+            self.boundingRadius = math.hypot(params[0], params[1] / 2)
+        else:
+            self.vertexNum = 6 * rows * columns
+            if shape == self.TORUS:
+                self.boundingRadius = abs(params[0]) + abs(params[1])
+            else:
+                self.boundingRadius = float(np.abs(params).max())
+
+    @property
+    def vao(self):
+        if ProceduralMesh.emptyVao is None or ProceduralMesh.emptyVao.vao is None:
+            # shared by every scene, kept until the program ends
+            with ResourceManager.ownedBy(None):
+                ProceduralMesh.emptyVao = VAO()
+        return ProceduralMesh.emptyVao
+
+    def delete(self):
+        pass
+
+    def setShapeUniforms(self, shaderProg):
+        """
+        Set the uniforms the vertex shader rebuilds this shape from, set proceduralShape back to 0 after drawing
+        """
+        shaderProg.setInt("proceduralShape", self.shape)
+        shaderProg.setVec4("shapeParams", self.params)
+        shaderProg.setInt("shapeRows", self.rows)
+        shaderProg.setInt("shapeColumns", self.columns)
+        shaderProg.setVec3("shapeColor", self.color)
+
+    def draw(self, shaderProg):
+        """
+        Draw with the shape uniforms set, and set proceduralShape back to 0 for buffer based meshes
+        """
+        self.setShapeUniforms(shaderProg)
+        self.vao.bind()
+        gl.glDrawArrays(gl.GL_TRIANGLES, 0, self.vertexNum)
+        self.vao.unbind()
+        shaderProg.setInt("proceduralShape", 0)
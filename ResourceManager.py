@@ -0,0 +1,208 @@
+"""
+Define a manager for the lifetime of GL objects here. Every buffer, vertex array, texture and program created through
+GLBuffer and GLProgram is tracked with its size, a reference count, the tag of the owner it was created for, like a
+scene, and a category of memory use, like meshes or textures. Everything an owner created can be released at once when
+it goes away.
+
+:author: agent
+:version: 2026.10.18
+"""
+
+import contextlib
+
+
+class Resource:
+    """
+    One tracked GL object
+    """
+    kind = None  # "buffer", "vertexArray", "texture" or "program"
+    category = None  # what the memory is used for, like "mesh" or "meshArena", the kind if nothing more specific
+    handle = None  # GL name of the object
+    byteSize = 0  # estimated GPU memory it holds
+    owner = None  # tag of the owner it was created for, None for objects kept until the program ends
+    refCount = 0
+    deleter = None  # callable with no arguments which deletes the GL object
+
+    def __init__(self, kind, handle, deleter, owner, byteSize=0, category=None):
+        self.kind = kind
+        self.category = kind if category is None else category
+        self.handle = handle
+        self.deleter = deleter
+        self.owner = owner
+        self.byteSize = byteSize
+        self.refCount = 1
+
+
+class ResourceManager:
+    """
+    Registry of all GL objects alive. All methods are class level, so there is one manager for the whole program.
+    """
+    resources = {}  # id(Resource) -> Resource, in creation order
+    owner = None  # owner tag given to new resources, see ownedBy
+    category = None  # category given to new resources, see categorized
+
+    @classmethod
+    def track(cls, kind, handle, deleter, byteSize=0):
+        """
+        Start tracking a new GL object, owned by the current owner tag with one reference
+
+        :param kind: resource type, used to group stats
+        :param handle: GL name
+        :param deleter: callable with no arguments which deletes the GL object
+        :param byteSize: estimated GPU memory, can be updated later on the returned Resource
+        :rtype: Resource
+        """
+        resource = Resource(kind, handle, deleter, cls.owner, byteSize, cls.category)
+        cls.resources[id(resource)] = resource
+        return resource
+
+    @classmethod
+    def forget(cls, resource):
+        """
+        Stop tracking resource, for objects which deleted themselves
+        """
+        if resource is not None:
+            cls.resources.pop(id(resource), None)
+
+    @classmethod
+    @contextlib.contextmanager
+    def ownedBy(cls, owner):
+        """
+        Tag every resource created in this with block as owned by owner
+
+        :param owner: hashable tag, like the name of a scene. None means the resource is kept until releaseAll
+        """
+        previous = cls.owner
+        cls.owner = owner
+        try:
+            yield
+        finally:
+            cls.owner = previous
+
+    @classmethod
+    @contextlib.contextmanager
+    def categorized(cls, category):
+        """
+        Count the memory of every resource created in this with block under category, see MemoryBudget.report
+
+        :param category: name of the use, like "mesh". None means the resource kind
+        """
+        previous = cls.category
+        cls.category = category
+        try:
+            yield
+        finally:
+            cls.category = previous
+
+    @classmethod
+    def retain(cls, resource):
+        """
+        Add a reference to resource
+        """
+        resource.refCount += 1
+
+    @classmethod
+    def release(cls, resource):
+        """
+        Drop a reference to resource, it is deleted when the last one is gone
+        """
+        resource.refCount -= 1
+        if resource.refCount <= 0:
+            cls.destroy(resource)
+
+    @classmethod
+    def destroy(cls, resource):
+        """
+        Delete resource now, whatever its reference count
+        """
+        if cls.resources.pop(id(resource), None) is not None:
+            resource.refCount = 0
+            resource.deleter()
+
+    @classmethod
+    def contextChanged(cls):
+        """
+        Drop every record without deleting its object, call it whenever a GL context is made. Objects of a context
+        freed before are gone with it, and their names may be given again to new objects of this one.
+
+        :return: number of records dropped
+        :rtype: int
+        """
+        dropped = len(cls.resources)
+        for resource in cls.resources.values():
+            resource.refCount = 0
+        cls.resources = {}
+        return dropped
+
+    @classmethod
+    def releaseOwner(cls, owner):
+        """
+        Delete every resource owned by owner, like all buffers and textures of a scene which is switched away
+
+        :return: number of resources deleted
+        :rtype: int
+        """
+        owned = [r for r in cls.resources.values() if r.owner == owner]
+        for resource in owned:
+            cls.destroy(resource)
+        return len(owned)
+
+    @classmethod
+    def releaseAll(cls):
+        """
+        Delete every resource, newest first. The GL context must still be current.
+
+        :return: number of resources deleted
+        :rtype: int
+        """
+        alive = list(cls.resources.values())
+        for resource in reversed(alive):
+            cls.destroy(resource)
+        return len(alive)
+
+    @classmethod
+    def stats(cls):
+        """
+        :return: resource kind -> (number alive, estimated bytes)
+        :rtype: dict
+        """
+        result = {}
+        for resource in cls.resources.values():
+            count, byteSize = result.get(resource.kind, (0, 0))
+            result[resource.kind] = (count + 1, byteSize + resource.byteSize)
+        return result
+
+    @classmethod
+    def categoryStats(cls):
+        """
+        :return: category -> (number alive, estimated bytes)
+        :rtype: dict
+        """
+        result = {}
+        for resource in cls.resources.values():
+            count, byteSize = result.get(resource.category, (0, 0))
+            result[resource.category] = (count + 1, byteSize + resource.byteSize)
+        return result
+
+    @classmethod
+    def usedBytes(cls):
+        """
+        :return: estimated GPU memory of every resource alive
+        :rtype: int
+        """
+        return sum(resource.byteSize for resource in cls.resources.values())
+
+    @classmethod
+    def report(cls):
+        """
+        One line per resource kind with its count and size, then one line per owner
+
+        :rtype: str
+        """
+        lines = [f"{kind}: {count} alive, {byteSize / 2 ** 20:.2f} MB"
+                 for kind, (count, byteSize) in sorted(cls.stats().items())]
+        owners = {}
+        for resource in cls.resources.values():
+            owners[resource.owner] = owners.get(resource.owner, 0) + 1
+        lines.extend(f"owner {owner}: {count} resources" for owner, count in owners.items())
+        return "\n".join(lines)
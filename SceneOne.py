@@ -18,7 +18,7 @@ from Point import Point
 import GLUtility
 
 from DisplayableCube import DisplayableCube
-from DisplayableEllipsoid import DisplayableEllipsoid
+from DisplayableIcosphere import DisplayableIcosphere
 from DisplayableTorus import DisplayableTorus
 
 class SceneOne(Component, Animation):
@@ -42,14 +42,14 @@ class SceneOne(Component, Animation):
         self.lRadius = 3
         self.lAngles = [0, 0, 0]
 
-        cube = Component(Point((0, 0, 0)), DisplayableCube(shaderProg, 1.0))
+        cube = Component(Point((0, 0, 0)), DisplayableCube(shaderProg, 1.0, unitMesh=True))
         m1 = Material(np.array((0.1, 0.1, 0.1, 0.1)), np.array((0.2, 0.2, 0.2, 1)),
                       np.array((0.4, 0.8, 0.6, 0.1)), 64)
         cube.setMaterial(m1)
         cube.renderingRouting = "lighting"
         self.addChild(cube)
 
-        torus = Component(Point((1, 0, 0)), DisplayableTorus(shaderProg, 0.15, 0.3, 36, 36))
+        torus = Component(Point((1, 0, 0)), DisplayableTorus(shaderProg, 0.15, 0.3, 36, 36, unitMesh=True))
         m2 = Material(np.array((0.1, 0.1, 0.1, 0.1)), np.array((0.2, 0.2, 0.2, 1)),
                       np.array((0.8, 0.6, 0.4, 1.0)), 64)
         torus.setMaterial(m2)
@@ -57,7 +57,7 @@ class SceneOne(Component, Animation):
         torus.rotate(90, torus.uAxis)
         self.addChild(torus)
 
-        sphere = Component(Point((-1, 0, 0)), DisplayableEllipsoid(shaderProg, 0.4, 0.4, 0.4, 36, 36))
+        sphere = Component(Point((-1, 0, 0)), DisplayableIcosphere(shaderProg, 0.4, 0.4, 0.4, 3, unitMesh=True))
         m3 = Material(np.array((0.1, 0.1, 0.1, 0.1)), np.array((0.2, 0.2, 0.2, 1)),
                       np.array((0.6, 0.4, 0.8, 1.0)), 64)
         sphere.setMaterial(m3)
@@ -66,15 +66,15 @@ class SceneOne(Component, Animation):
 
         l0 = Light(self.lightPos(self.lRadius, self.lAngles[0], self.lTransformations[0]),
                    np.array((*ColorType.SOFTRED, 1.0)))
-        lightCube0 = Component(Point((0, 0, 0)), DisplayableCube(shaderProg, 0.1, 0.1, 0.1, ColorType.SOFTRED))
+        lightCube0 = Component(Point((0, 0, 0)), DisplayableCube(shaderProg, 0.1, 0.1, 0.1, ColorType.SOFTRED, unitMesh=True))
         lightCube0.renderingRouting = "vertex"
         l1 = Light(self.lightPos(self.lRadius, self.lAngles[1], self.lTransformations[1]),
                    np.array((*ColorType.SOFTBLUE, 1.0)))
-        lightCube1 = Component(Point((0, 0, 0)), DisplayableCube(shaderProg, 0.1, 0.1, 0.1, ColorType.SOFTBLUE))
+        lightCube1 = Component(Point((0, 0, 0)), DisplayableCube(shaderProg, 0.1, 0.1, 0.1, ColorType.SOFTBLUE, unitMesh=True))
         lightCube1.renderingRouting = "vertex"
         l2 = Light(self.lightPos(self.lRadius, self.lAngles[2], self.lTransformations[2]),
                    np.array((*ColorType.SOFTGREEN, 1.0)))
-        lightCube2 = Component(Point((0, 0, 0)), DisplayableCube(shaderProg, 0.1, 0.1, 0.1, ColorType.SOFTGREEN))
+        lightCube2 = Component(Point((0, 0, 0)), DisplayableCube(shaderProg, 0.1, 0.1, 0.1, ColorType.SOFTGREEN, unitMesh=True))
         lightCube2.renderingRouting = "vertex"
 
         self.addChild(lightCube0)
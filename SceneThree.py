@@ -17,7 +17,7 @@ from Material import Material
 from Point import Point
 import GLUtility
 
-from DisplayableEllipsoid import DisplayableEllipsoid
+from DisplayableIcosphere import DisplayableIcosphere
 from DisplayableTorus import DisplayableTorus
 from DisplayableCube import DisplayableCube
 from DisplayableCylinder import DisplayableCylinder
@@ -44,7 +44,7 @@ class SceneThree(Component, Animation):
         self.lTransformations = [self.glutility.translate(0, 2, 0, False)]
 
         # Cylinder (Teal)
-        cylinder = Component(Point((-3, 0, 0)), DisplayableCylinder(shaderProg, 1.0, 1.5, 36))
+        cylinder = Component(Point((-3, 0, 0)), DisplayableCylinder(shaderProg, 1.0, 1.5, 36, unitMesh=True))
         m_cylinder = Material(
             np.array((0.1, 0.1, 0.1, 1.0)),
             np.array((0.0, 0.7, 0.7, 1.0)),  # Teal
@@ -56,7 +56,7 @@ class SceneThree(Component, Animation):
         self.addChild(cylinder)
 
         # Torus (Pink, Moving)
-        self.torus = Component(Point((0, 0, 0)), DisplayableTorus(shaderProg, 0.5, 1, 36, 36))
+        self.torus = Component(Point((0, 0, 0)), DisplayableTorus(shaderProg, 0.5, 1, 36, 36, unitMesh=True))
         m_torus = Material(
             np.array((0.1, 0.1, 0.1, 1.0)),
             np.array((1.0, 0.0, 0.5, 1.0)),  # Pink
@@ -68,7 +68,7 @@ class SceneThree(Component, Animation):
         self.addChild(self.torus)
 
         # Ellipsoid (Yellow)
-        ellipsoid = Component(Point((3, 0, 0)), DisplayableEllipsoid(shaderProg, 0.4, 0.6, 0.4, 36, 36))
+        ellipsoid = Component(Point((3, 0, 0)), DisplayableIcosphere(shaderProg, 0.4, 0.6, 0.4, 3, unitMesh=True))
         m_ellipsoid = Material(
             np.array((0.1, 0.1, 0.1, 1.0)),
             np.array((1.0, 1.0, 0.0, 1.0)),  # Yellow
@@ -84,14 +84,14 @@ class SceneThree(Component, Animation):
             self.lightPos(self.lRadius, self.lAngles[0], self.lTransformations[0]),
             np.array((0.0, 1.0, 1.0, 1.0)),  # Cyan
         )
-        lightCube0 = Component(Point((0, 0, 0)), DisplayableCube(shaderProg, 0.1, 0.1, 0.1, ColorType.CYAN))
+        lightCube0 = Component(Point((0, 0, 0)), DisplayableCube(shaderProg, 0.1, 0.1, 0.1, ColorType.CYAN, unitMesh=True))
         lightCube0.renderingRouting = "vertex"
 
         l1 = Light(
             self.lightPos(self.lRadius, self.lAngles[0], self.lTransformations[0]),
             np.array((0.5, 0.0, 0.5, 1.0)),  # Purple
         )
-        lightCube1 = Component(Point((0, 0, 0)), DisplayableCube(shaderProg, 0.1, 0.1, 0.1, ColorType.PURPLE))
+        lightCube1 = Component(Point((0, 0, 0)), DisplayableCube(shaderProg, 0.1, 0.1, 0.1, ColorType.PURPLE, unitMesh=True))
         lightCube1.renderingRouting = "vertex"
 
         self.addChild(lightCube0)
@@ -17,7 +17,7 @@ from Point import Point
 import GLUtility
 
 from DisplayableCube import DisplayableCube
-from DisplayableEllipsoid import DisplayableEllipsoid
+from DisplayableIcosphere import DisplayableIcosphere
 from DisplayableCylinder import DisplayableCylinder
 
 
@@ -42,7 +42,7 @@ class SceneTwo(Component, Animation):
         self.lTransformations = [self.glutility.translate(0, 2, 0, False)]
 
         # Cube
-        cube = Component(Point((-2, 0, 0)), DisplayableCube(shaderProg, 1.0))
+        cube = Component(Point((-2, 0, 0)), DisplayableCube(shaderProg, 1.0, unitMesh=True))
         m_cube = Material(
             np.array((0.1, 0.1, 0.1, 1.0)),
             np.array((0.8, 0.2, 0.2, 1.0)),
@@ -54,7 +54,7 @@ class SceneTwo(Component, Animation):
         self.addChild(cube)
 
         # Cylinder
-        cylinder = Component(Point((0, 0, 0)), DisplayableCylinder(shaderProg, 0.5, 1, 36))
+        cylinder = Component(Point((0, 0, 0)), DisplayableCylinder(shaderProg, 0.5, 1, 36, unitMesh=True))
         m_cylinder = Material(
             np.array((0.1, 0.1, 0.1, 1.0)),
             np.array((0.2, 0.8, 0.2, 1.0)),
@@ -66,7 +66,7 @@ class SceneTwo(Component, Animation):
         self.addChild(cylinder)
 
         # Ellipsoid
-        ellipsoid = Component(Point((2, 0, 0)), DisplayableEllipsoid(shaderProg, 0.4, 0.4, 0.4, 36, 36))
+        ellipsoid = Component(Point((2, 0, 0)), DisplayableIcosphere(shaderProg, 0.4, 0.4, 0.4, 3, unitMesh=True))
         m_ellipsoid = Material(
             np.array((0.1, 0.1, 0.1, 1.0)),
             np.array((0.2, 0.2, 0.8, 1.0)),
@@ -82,14 +82,14 @@ class SceneTwo(Component, Animation):
             self.lightPos(self.lRadius, self.lAngles[0], self.lTransformations[0]),
             np.array((*ColorType.SOFTRED, 1.0)),
         )
-        lightCube0 = Component(Point((0, 0, 0)), DisplayableCube(shaderProg, 0.1, 0.1, 0.1, ColorType.SOFTRED))
+        lightCube0 = Component(Point((0, 0, 0)), DisplayableCube(shaderProg, 0.1, 0.1, 0.1, ColorType.SOFTRED, unitMesh=True))
         lightCube0.renderingRouting = "vertex"
 
         l1 = Light(
             self.lightPos(self.lRadius, self.lAngles[0], self.lTransformations[0]),
             np.array((*ColorType.SOFTBLUE, 1.0)),
         )
-        lightCube1 = Component(Point((0, 0, 0)), DisplayableCube(shaderProg, 0.1, 0.1, 0.1, ColorType.SOFTBLUE))
+        lightCube1 = Component(Point((0, 0, 0)), DisplayableCube(shaderProg, 0.1, 0.1, 0.1, ColorType.SOFTBLUE, unitMesh=True))
         lightCube1.renderingRouting = "vertex"
 
         self.addChild(lightCube0)
@@ -19,7 +19,15 @@ from ModelAxes import ModelAxes
 from Point import Point
 from CanvasBase import CanvasBase
 from GLProgram import GLProgram
-from GLBuffer import VAO, VBO, EBO, Texture
+from LevelOfDetail import LevelOfDetail
+from MemoryBudget import MemoryBudget
+from MeshArena import MeshArena
+from MeshRegistry import MeshRegistry
+from TextureCache import TextureCache
+from ResourceManager import ResourceManager
+from TextureStreamer import TextureStreamer
+from VirtualTexture import VirtualTexture
+from GLBuffer import VAO, VBO, EBO, RingVBO, Texture, TextureUnits, UploadStats
 import GLUtility
 from SceneOne import SceneOne
 from SceneTwo import SceneTwo
@@ -121,6 +129,8 @@ class Sketch(CanvasBase):
     # models
     basisAxes = None
     scene = None
+    sceneTag = None  # owner tag of the GL resources created for the current scene
+    sceneCount = 0
 
     # If you are having trouble rotating the camera, try increasing this parameter
     # (Windows users with trackpads may need this)
@@ -135,7 +145,13 @@ class Sketch(CanvasBase):
         # prepare OpenGL context
         contextAttrib = glcanvas.GLContextAttrs()
         contextAttrib.PlatformDefaults().CoreProfile().MajorVersion(3).MinorVersion(3).EndList()
+        # made once, GL names and the ResourceManager records of them are only valid in this context
         self.context = glcanvas.GLContext(self, ctxAttrs=contextAttrib)
+        GLProgram.contextChanged()
+        ResourceManager.contextChanged()
+        TextureUnits.contextChanged()
+        Texture.contextChanged()
+        TextureCache.contextChanged()
         # Initialize Parameters
         self.last_mouse_leftPosition = [0, 0]
         self.last_mouse_middlePosition = [0, 0]
@@ -158,11 +174,23 @@ class Sketch(CanvasBase):
         self.cameraTheta = math.pi / 2
 
 
-    def switchScene(self, scene):
-        self.scene = scene
-        self.topLevelComponent.clear()
-        self.topLevelComponent.addChild(self.scene)
-        self.topLevelComponent.initialize()
+    def switchScene(self, sceneClass):
+        """
+        Build a scene and show it instead of the current one. GL resources created for the old scene are released,
+        meshes it shares with the new scene are kept.
+
+        :param sceneClass: scene type, built with the shader program
+        """
+        oldTag = self.sceneTag
+        self.sceneCount += 1
+        self.sceneTag = f"{sceneClass.__name__}#{self.sceneCount}"
+        with ResourceManager.ownedBy(self.sceneTag):
+            self.scene = sceneClass(self.shaderProg)
+            self.topLevelComponent.clear()
+            self.topLevelComponent.addChild(self.scene)
+            self.topLevelComponent.initialize()
+        if oldTag is not None:
+            ResourceManager.releaseOwner(oldTag)
 
     def InitGL(self):
         self.shaderProg = GLProgram()
@@ -172,7 +200,7 @@ class Sketch(CanvasBase):
         self.basisAxes = ModelAxes(self.shaderProg, Point((0, 0, 0)))
         self.basisAxes.initialize()
 
-        #self.switchScene(SceneOne(self.shaderProg))
+        #self.switchScene(SceneOne)
 
         gl.glClearColor(*self.backgroundColor, 1.0)
         gl.glClearDepth(1.0)
@@ -186,6 +214,7 @@ class Sketch(CanvasBase):
         self.shaderProg.setMat4("projectionMat", self.perspMat)
         self.shaderProg.setMat4("viewMat", self.glutility.view(self.getCameraPos(), self.lookAtPt, self.upVector))
         self.shaderProg.setMat4("modelMat", np.identity(4))
+        self.shaderProg.setVec3("meshColor", np.ones(3))
         self.shaderProg.setVec3("viewPosition", np.array(self.getCameraPos()))
         self.shaderProg.setBool("imageFlag", self.ImageModeOn)
 
@@ -200,14 +229,15 @@ class Sketch(CanvasBase):
         return result
 
     def OnResize(self, event):
-        contextAttrib = glcanvas.GLContextAttrs()
-        contextAttrib.PlatformDefaults().CoreProfile().MajorVersion(3).MinorVersion(3).EndList()
-        self.context = glcanvas.GLContext(self, ctxAttrs=contextAttrib)
         self.size = self.GetClientSize()
         self.size[1] = max(1, self.size[1])  # avoid divided by 0
         self.SetCurrent(self.context)
 
-        self.init = False
+        # the context and everything in it stay, only the viewport and projection follow the new size
+        if self.init:
+            gl.glViewport(0, 0, self.size[0], self.size[1])
+            self.perspMat = self.glutility.perspective(45, self.size.width, self.size.height, 0.01, 100)
+            self.shaderProg.setMat4("projectionMat", self.perspMat)
         self.Refresh(eraseBackground=True)
         self.Update()
 
@@ -230,11 +260,14 @@ class Sketch(CanvasBase):
         self.viewMat = self.glutility.view(self.getCameraPos(), self.lookAtPt, self.upVector)
         self.shaderProg.setMat4("viewMat", self.viewMat)
         self.shaderProg.setVec3("viewPosition", np.array(self.getCameraPos()))
+        LevelOfDetail.setCamera(self.viewMat, self.perspMat, self.size.height)
         if self.ImageModeOn:
             self.shaderProg.setVec3("iResolution", np.array((float(self.size.width), float(self.size.height), 1.0)))
             self.shaderProg.setVec3("iMouse", np.array((float(self.last_mouse_leftPosition[0]), float(self.last_mouse_leftPosition[1]), float(self.left_mouse_down))))
             self.shaderProg.setFloat("iTime", time.time() - self.start_time)
 
+        TextureStreamer.update()
+        VirtualTexture.update()
         if not self.pauseScene and isinstance(self.scene, Animation):
             self.scene.animationUpdate()
         self.topLevelComponent.update(np.identity(4))
@@ -244,9 +277,22 @@ class Sketch(CanvasBase):
         resultPt = self.unprojectCanvas(0.9 * self.size[0], 0.1 * self.size[1], 0.3)
         self.basisAxes.setCurrentPosition(resultPt)
         self.basisAxes.draw(self.shaderProg)
+        # the Components submitted to mesh arenas are drawn here
+        MeshArena.flush(self.shaderProg)
 
+        VirtualTexture.renderFeedback(self.shaderProg, self.drawScene, self.size[0], self.size[1])
+        RingVBO.endFrame()
+        # evict what this frame did not draw if GPU memory is over budget
+        MemoryBudget.endFrame()
         self.SwapBuffers()
 
+    def drawScene(self):
+        """
+        Draw the Components of the scene, with the ones submitted to mesh arenas
+        """
+        self.topLevelComponent.draw(self.shaderProg)
+        MeshArena.flush(self.shaderProg)
+
     def OnDestroy(self, event):
         """
         Window destroy event binding
@@ -254,6 +300,10 @@ class Sketch(CanvasBase):
         :param event: Window destroy event
         :return: None
         """
+        # free every GL object while the context is still alive
+        self.SetCurrent(self.context)
+        self.topLevelComponent.clear()
+        ResourceManager.releaseAll()
         if self.shaderProg is not None:
             del self.shaderProg
         super(Sketch, self).OnDestroy(event)
@@ -446,19 +496,30 @@ class Sketch(CanvasBase):
             self.shaderProg.setBool("enablespecular", self.shaderProg.enablespecular)
             print(f"Specular {'enabled' if self.shaderProg.enablespecular else 'disabled'}")
         if chr(keycode) in "zZ":
-            self.switchScene(SceneOne(self.shaderProg))
+            self.switchScene(SceneOne)
             print("Switched to Scene 1 (Test Scene)")
 
         if chr(keycode) in "xX":
-            self.switchScene(SceneTwo(self.shaderProg))
+            self.switchScene(SceneTwo)
             print("Switched to Scene 2 (Custom Scene 2)")
 
         if chr(keycode) in "cC":
-            self.switchScene(SceneThree(self.shaderProg))
+            self.switchScene(SceneThree)
             print("Switched to Scene 3 (Custom Scene 3)")
         if chr(keycode) in "nN":
             self.shaderProg.setFragmentShaderRouting("normal")
             print("Switched to Normal Rendering")
+        if chr(keycode) in "mM":
+            print(MeshRegistry.report())
+            print(UploadStats.report())
+            print(TextureCache.report())
+            print(MeshArena.report())
+            print(ResourceManager.report())
+            print(MemoryBudget.report())
+        if chr(keycode) in "[]":
+            # level of detail bias, positive values draw coarser tessellations
+            LevelOfDetail.bias += 1 if chr(keycode) == "]" else -1
+            print(f"Level of detail bias is now {LevelOfDetail.bias}")
 
 
         if chr(keycode) in "123456789":
@@ -0,0 +1,354 @@
+"""
+Define subdivision surfaces here. Loop subdivision refines triangle meshes and Catmull-Clark refines
+polygon meshes. All topology work is done once per base mesh, refining new positions of the same mesh is
+then a sparse matrix product.
+
+:author: agent
+:version: 2026.10.18
+"""
+
+import hashlib
+import math
+
+import numpy as np
+
+
+class Subdivision:
+    """
+    Refinement of one base mesh topology to a number of levels. Every level is a sparse matrix in CSR form from
+    the vertices of the level before, so any per vertex attribute (position, color, texture coordinates) is
+    refined the same way.
+    """
+    LOOP = "loop"
+    CATMULL_CLARK = "catmull-clark"
+
+    # (scheme, levels, vertexNum, faces digest) -> Subdivision, shared by every mesh with the same topology
+    topologyCache = {}
+
+    scheme = None
+    levels = 0
+    vertexNum = 0  # vertices of the base mesh
+    refinedVertexNum = 0
+    stencils = None  # list of (rowStarts, cols, weights, vertexNum) of each level
+    triangles = None  # (M, 3) triangles of the refined mesh
+
+    def __init__(self, scheme, levels, vertexNum, faceVerts, faceSizes):
+        """
+        :param scheme: LOOP or CATMULL_CLARK
+        :param levels: number of refinement steps
+        :param vertexNum: vertices in the base mesh
+        :param faceVerts: vertex ids of all faces one after another, counterclockwise
+        :param faceSizes: number of vertices of each face, LOOP only accepts triangles
+        """
+        self.scheme = scheme
+        self.levels = levels
+        self.vertexNum = vertexNum
+        self.stencils = []
+        if scheme == self.LOOP and np.any(faceSizes != 3):
+            raise ValueError("Loop subdivision only works on triangles")
+
+        for _ in range(levels):
+            if scheme == self.LOOP:
+                stencil, faceVerts, vertexNum = self.loopStep(vertexNum, faceVerts.reshape((-1, 3)))
+            elif scheme == self.CATMULL_CLARK:
+                stencil, faceVerts, vertexNum = self.catmullClarkStep(vertexNum, faceVerts, faceSizes)
+            else:
+                raise ValueError(f"Unknown subdivision scheme {scheme}")
+            faceSizes = np.full(faceVerts.size // (3 if scheme == self.LOOP else 4), 3 if scheme == self.LOOP else 4)
+            self.stencils.append(stencil)
+
+        self.refinedVertexNum = vertexNum
+        self.triangles = self.triangulate(faceVerts, faceSizes)
+
+    @classmethod
+    def get(cls, scheme, levels, vertexNum, faceVerts, faceSizes):
+        """
+        Cached Subdivision for this topology, built on the first request
+
+        :rtype: Subdivision
+        """
+        faceVerts = np.ascontiguousarray(faceVerts, dtype=np.int64)
+        faceSizes = np.ascontiguousarray(faceSizes, dtype=np.int64)
+        digest = hashlib.sha1(faceVerts.tobytes() + b"|" + faceSizes.tobytes()).hexdigest()
+        key = (scheme, levels, vertexNum, digest)
+        if key not in cls.topologyCache:
+            cls.topologyCache[key] = Subdivision(scheme, levels, vertexNum, faceVerts, faceSizes)
+        return cls.topologyCache[key]
+
+    def refine(self, attributes):
+        """
+        :param attributes: (vertexNum, K) per vertex values of the base mesh
+        :return: (refinedVertexNum, K) values of the refined mesh
+        :rtype: numpy.ndarray
+        """
+        values = np.asarray(attributes, dtype=np.float64)
+        for rowStarts, cols, weights, _ in self.stencils:
+            values = np.add.reduceat(weights[:, None] * values[cols], rowStarts, axis=0)
+        return values
+
+    @staticmethod
+    def csr(rows, cols, weights, vertexNum):
+        """
+        Sum duplicated entries and sort by row. Every row must have an entry.
+
+        :return: (rowStarts, cols, weights, vertexNum)
+        """
+        colNum = int(cols.max()) + 1
+        keys, inverse = np.unique(rows * colNum + cols, return_inverse=True)
+        weights = np.bincount(inverse.ravel(), weights=weights)
+        rows = keys // colNum
+        cols = keys % colNum
+        rowStarts = np.searchsorted(rows, np.arange(vertexNum))
+        return rowStarts, cols, weights, vertexNum
+
+    @staticmethod
+    def edgeTable(vertexNum, cornerFrom, cornerTo):
+        """
+        :return: unique edges (E, 2) with the smaller id first, edge id of every corner, faces around every edge,
+                 and whether each vertex is on a boundary, where an edge has only one face
+        """
+        edges, cornerEdge = np.unique(np.sort(np.stack([cornerFrom, cornerTo], axis=1), axis=1), axis=0,
+                                      return_inverse=True)
+        cornerEdge = cornerEdge.ravel()
+        edgeFaces = np.bincount(cornerEdge, minlength=edges.shape[0])
+        boundaryEdge = edgeFaces != 2
+        boundaryVertex = np.zeros(vertexNum, dtype=bool)
+        boundaryVertex[edges[boundaryEdge].ravel()] = True
+        return edges, cornerEdge, edgeFaces, boundaryEdge, boundaryVertex
+
+    @staticmethod
+    def boundaryVertexRule(vertexNum, edges, boundaryEdge, boundaryVertex):
+        """
+        Stencil entries of boundary vertices, 3/4 of the vertex and 1/8 of its two boundary neighbours.
+        Corners where the boundary is not a simple curve stay where they are.
+        """
+        boundaryEdges = edges[boundaryEdge]
+        boundaryValence = np.bincount(boundaryEdges.ravel(), minlength=vertexNum)
+        curve = boundaryValence[boundaryEdges] == 2  # (B, 2), the end is on a simple boundary curve
+        rows = [np.nonzero(boundaryVertex)[0]]
+        cols = [rows[0]]
+        weights = [np.where(boundaryValence[rows[0]] == 2, 0.75, 1.0)]
+        for end in (0, 1):
+            m = curve[:, end]
+            rows.append(boundaryEdges[m, end])
+            cols.append(boundaryEdges[m, 1 - end])
+            weights.append(np.full(m.sum(), 0.125))
+        return rows, cols, weights
+
+    @staticmethod
+    def loopStep(vertexNum, triangles):
+        """
+        One Loop subdivision step. New vertices are the old vertices moved, then one vertex per edge.
+
+        :return: stencil, new flattened triangles, new vertex count
+        """
+        cornerFrom = triangles.ravel()
+        cornerTo = np.roll(triangles, -1, axis=1).ravel()
+        cornerOpposite = np.roll(triangles, -2, axis=1).ravel()
+        edges, cornerEdge, edgeFaces, boundaryEdge, boundaryVertex = \
+            Subdivision.edgeTable(vertexNum, cornerFrom, cornerTo)
+        edgeNum = edges.shape[0]
+        rows, cols, weights = [], [], []
+
+        # edge points, 3/8 of both ends and 1/8 of both opposite vertices, the midpoint on boundaries
+        edgeRows = vertexNum + np.arange(edgeNum)
+        endWeight = np.where(boundaryEdge, 0.5, 0.375)
+        for end in (0, 1):
+            rows.append(edgeRows)
+            cols.append(edges[:, end])
+            weights.append(endWeight)
+        interiorCorner = ~boundaryEdge[cornerEdge]
+        rows.append(vertexNum + cornerEdge[interiorCorner])
+        cols.append(cornerOpposite[interiorCorner])
+        weights.append(np.full(interiorCorner.sum(), 0.125))
+
+        # interior vertices, (1 - n beta) of the vertex and beta of each neighbour
+        valence = np.bincount(edges.ravel(), minlength=vertexNum)
+        n = np.maximum(valence, 1).astype(np.float64)
+        beta = (0.625 - (0.375 + 0.25 * np.cos(2 * math.pi / n)) ** 2) / n
+        interior = ~boundaryVertex
+        rows.append(np.nonzero(interior)[0])
+        cols.append(rows[-1])
+        weights.append((1 - n * beta)[interior])
+        for end in (0, 1):
+            m = interior[edges[:, end]]
+            rows.append(edges[m, end])
+            cols.append(edges[m, 1 - end])
+            weights.append(beta[edges[m, end]])
+        boundaryRows, boundaryCols, boundaryWeights = \
+            Subdivision.boundaryVertexRule(vertexNum, edges, boundaryEdge, boundaryVertex)
+        rows += boundaryRows
+        cols += boundaryCols
+        weights += boundaryWeights
+
+        newVertexNum = vertexNum + edgeNum
+        stencil = Subdivision.csr(np.concatenate(rows), np.concatenate(cols), np.concatenate(weights), newVertexNum)
+
+        # every triangle (a, b, c) becomes 4 around its edge points ab, bc, ca
+        a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+        ab, bc, ca = (vertexNum + cornerEdge.reshape((-1, 3))).T
+        newTriangles = np.stack([np.stack([a, ab, ca], axis=1), np.stack([b, bc, ab], axis=1),
+                                 np.stack([c, ca, bc], axis=1), np.stack([ab, bc, ca], axis=1)], axis=1)
+        return stencil, newTriangles.ravel(), newVertexNum
+
+    @staticmethod
+    def catmullClarkStep(vertexNum, faceVerts, faceSizes):
+        """
+        One Catmull-Clark subdivision step over polygons of any size. New vertices are the old vertices moved,
+        then one vertex per edge, then one per face.
+
+        :return: stencil, new flattened quads, new vertex count
+        """
+        faceNum = faceSizes.shape[0]
+        faceStarts = np.concatenate([[0], np.cumsum(faceSizes)[:-1]])
+        cornerFace = np.repeat(np.arange(faceNum), faceSizes)
+        cornerLocal = np.arange(faceVerts.size) - faceStarts[cornerFace]
+        cornerNext = faceStarts[cornerFace] + (cornerLocal + 1) % faceSizes[cornerFace]
+        cornerPrevious = faceStarts[cornerFace] + (cornerLocal - 1) % faceSizes[cornerFace]
+        cornerFrom = faceVerts
+        cornerTo = faceVerts[cornerNext]
+        edges, cornerEdge, edgeFaces, boundaryEdge, boundaryVertex = \
+            Subdivision.edgeTable(vertexNum, cornerFrom, cornerTo)
+        edgeNum = edges.shape[0]
+        faceBase = vertexNum + edgeNum
+        rows, cols, weights = [], [], []
+
+        def spreadOverFaces(owners, faces, ownerWeights):
+            # entries of owners[i] * ownerWeights[i] times the face point of faces[i]
+            sizes = faceSizes[faces]
+            owner = np.repeat(np.arange(faces.shape[0]), sizes)
+            local = np.arange(owner.shape[0]) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+            rows.append(owners[owner])
+            cols.append(faceVerts[faceStarts[faces][owner] + local])
+            weights.append((ownerWeights / sizes)[owner])
+
+        # face points, average of the face
+        spreadOverFaces(faceBase + np.arange(faceNum), np.arange(faceNum), np.ones(faceNum))
+
+        # edge points, average of both ends and both face points, the midpoint on boundaries
+        endWeight = np.where(boundaryEdge, 0.5, 0.25)
+        for end in (0, 1):
+            rows.append(vertexNum + np.arange(edgeNum))
+            cols.append(edges[:, end])
+            weights.append(endWeight)
+        interiorCorner = ~boundaryEdge[cornerEdge]
+        spreadOverFaces(vertexNum + cornerEdge[interiorCorner], cornerFace[interiorCorner],
+                        np.full(interiorCorner.sum(), 0.25))
+
+        # interior vertices, (F + 2R + (n - 3)P) / n with F the average face point, R the average edge midpoint
+        valence = np.bincount(edges.ravel(), minlength=vertexNum)
+        n = np.maximum(valence, 1).astype(np.float64)
+        interior = ~boundaryVertex
+        rows.append(np.nonzero(interior)[0])
+        cols.append(rows[-1])
+        weights.append(((n - 3) / n)[interior])
+        interiorCorner = interior[cornerFrom]
+        spreadOverFaces(cornerFrom[interiorCorner], cornerFace[interiorCorner],
+                        1 / n[cornerFrom[interiorCorner]] ** 2)
+        for end in (0, 1):
+            m = interior[edges[:, end]]
+            for col in (edges[m, end], edges[m, 1 - end]):
+                rows.append(edges[m, end])
+                cols.append(col)
+                weights.append(1 / n[edges[m, end]] ** 2)
+        boundaryRows, boundaryCols, boundaryWeights = \
+            Subdivision.boundaryVertexRule(vertexNum, edges, boundaryEdge, boundaryVertex)
+        rows += boundaryRows
+        cols += boundaryCols
+        weights += boundaryWeights
+
+        newVertexNum = faceBase + faceNum
+        stencil = Subdivision.csr(np.concatenate(rows), np.concatenate(cols), np.concatenate(weights), newVertexNum)
+
+        # every corner becomes a quad: vertex, edge point to the next corner, face point, edge point from the last
+        quads = np.stack([cornerFrom, vertexNum + cornerEdge, faceBase + cornerFace,
+                          vertexNum + cornerEdge[cornerPrevious]], axis=1)
+        return stencil, quads.ravel(), newVertexNum
+
+    @staticmethod
+    def triangulate(faceVerts, faceSizes):
+        """
+        Fan every polygon into triangles
+
+        :rtype: numpy.ndarray
+        """
+        faceStarts = np.concatenate([[0], np.cumsum(faceSizes)[:-1]])
+        fanFace = np.repeat(np.arange(faceSizes.shape[0]), faceSizes - 2)
+        fanLocal = np.arange(fanFace.shape[0]) - np.repeat(np.cumsum(faceSizes - 2) - (faceSizes - 2),
+                                                           faceSizes - 2)
+        first = faceStarts[fanFace]
+        return np.stack([faceVerts[first], faceVerts[first + fanLocal + 1], faceVerts[first + fanLocal + 2]],
+                        axis=1)
+
+    @staticmethod
+    def weld(positions, triangles):
+        """
+        Merge vertices at the same position so the mesh is connected, like the unindexed cube
+
+        :return: welded positions, triangles on them without the collapsed ones, and the welded id of each input
+                 vertex
+        :rtype: tuple(numpy.ndarray, numpy.ndarray, numpy.ndarray)
+        """
+        positions = np.asarray(positions, dtype=np.float64)
+        scale = max(np.abs(positions).max(), 1e-12)
+        keys = np.round(positions / (scale * 1e-6)).astype(np.int64)
+        _, first, remap = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        # keep the order of first appearance
+        order = np.argsort(first)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(order.shape[0])
+        remap = rank[remap.ravel()]
+        triangles = remap[np.asarray(triangles).reshape((-1, 3))]
+        triangles = triangles[(triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) &
+                              (triangles[:, 2] != triangles[:, 0])]
+        return positions[first[order]], triangles, remap
+
+    @staticmethod
+    def mergeCoplanarTriangles(positions, triangles):
+        """
+        Join pairs of triangles which share an edge and lie in one plane into quads, so Catmull-Clark refines
+        a triangulated box like a box
+
+        :return: faceVerts and faceSizes of the quads and the triangles left
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        p = positions[triangles]
+        normals = np.cross(p[:, 1] - p[:, 0], p[:, 2] - p[:, 0])
+        normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-300)
+        edgeOwner = {}
+        for t, tri in enumerate(triangles.tolist()):
+            for k in range(3):
+                edgeOwner[(tri[k], tri[(k + 1) % 3])] = (t, k)
+
+        used = np.zeros(triangles.shape[0], dtype=bool)
+        faces = []
+        for t, tri in enumerate(triangles.tolist()):
+            if used[t]:
+                continue
+            used[t] = True
+            for k in range(3):
+                a, b, c = tri[k], tri[(k + 1) % 3], tri[(k + 2) % 3]
+                other = edgeOwner.get((b, a))
+                if other is None or used[other[0]] or normals[t] @ normals[other[0]] < 1 - 1e-9:
+                    continue
+                otherTri = triangles[other[0]]
+                d = int(otherTri[(other[1] + 2) % 3])
+                used[other[0]] = True
+                faces.append([a, d, b, c])
+                break
+            else:
+                faces.append(tri)
+        return np.array([v for f in faces for v in f], dtype=np.int64), np.array([len(f) for f in faces])
+
+    @staticmethod
+    def vertexNormals(positions, triangles):
+        """
+        Area weighted average of the face normals around every vertex
+
+        :rtype: numpy.ndarray
+        """
+        p = positions[triangles]
+        faceNormals = np.cross(p[:, 1] - p[:, 0], p[:, 2] - p[:, 0])
+        normals = np.stack([np.bincount(triangles.ravel(), weights=np.repeat(faceNormals[:, axis], 3),
+                                        minlength=positions.shape[0]) for axis in range(3)], axis=1)
+        return normals / np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-300)
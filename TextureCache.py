@@ -0,0 +1,149 @@
+"""
+Define a cache to share textures loaded from files between Components.
+Components setting the same image file get the same Texture, so it is decoded and uploaded only once. Textures nobody
+holds anymore are kept for reuse until the cache grows over its memory budget, then the least recently used go first.
+
+:author: agent
+:version: 2026.10.18
+"""
+
+import os
+from collections import OrderedDict
+
+from GLBuffer import Texture
+from MemoryBudget import MemoryBudget
+from TextureStreamer import TextureStreamer
+
+
+class TextureCache:
+    """
+    Map from (image file, modification time, size, packed) to a shared Texture. All methods are class level, so there
+    is one cache for the whole program.
+    """
+    budget = 256 << 20  # bytes of GPU memory the cached textures may take before unused ones are evicted
+
+    textures = OrderedDict()  # key -> Texture, least recently used first
+    refCounts = {}  # key -> number of holders
+    keys = {}  # id(Texture) -> key
+
+    hits = 0
+    misses = 0
+    evictions = 0
+
+    @staticmethod
+    def keyOf(imgFilePath, packed):
+        """
+        The file is identified by its path, modification time and size, so an edited file is loaded again
+
+        :rtype: tuple
+        """
+        path = os.path.realpath(imgFilePath)
+        stat = os.stat(path)
+        return path, stat.st_mtime_ns, stat.st_size, packed
+
+    @classmethod
+    def acquire(cls, imgFilePath, packed=False):
+        """
+        Get a reference to the texture of an image file, start loading it with TextureStreamer if it is not cached
+
+        :param packed: see Texture.packed, packed and unpacked textures of one file are cached apart
+        :rtype: Texture
+        """
+        key = cls.keyOf(imgFilePath, packed)
+        texture = cls.textures.get(key)
+        # reload textures which were deleted outside of the cache, like by ResourceManager.releaseAll
+        if texture is not None and (texture.resource is not None or texture.streamJob is not None or texture.evicted):
+            cls.hits += 1
+            cls.textures.move_to_end(key)
+            if texture.evicted:
+                MemoryBudget.use(texture)
+        else:
+            cls.misses += 1
+            if texture is not None:
+                del cls.keys[id(texture)]
+            texture = Texture(packed)
+            TextureStreamer.load(texture, imgFilePath)
+            cls.textures[key] = texture
+            cls.keys[id(texture)] = key
+            cls.refCounts[key] = 0
+        cls.refCounts[key] += 1
+        texture.priority = MemoryBudget.RESIDENT
+        cls.evict()
+        return texture
+
+    @classmethod
+    def release(cls, texture):
+        """
+        Drop one reference to texture. Textures not from the cache are deleted right away, cached ones are kept for
+        reuse until evicted.
+        """
+        key = cls.keys.get(id(texture))
+        if key is None:
+            texture.delete()
+            return
+        cls.refCounts[key] -= 1
+        if cls.refCounts[key] == 0:
+            texture.priority = MemoryBudget.CACHED
+        cls.evict()
+
+    @classmethod
+    def evict(cls):
+        """
+        Delete textures nobody holds, least recently used first, until the cache fits in budget
+
+        :return: number of textures evicted
+        :rtype: int
+        """
+        total = sum(texture.byteSize for texture in cls.textures.values())
+        evicted = 0
+        for key, texture in list(cls.textures.items()):
+            if total <= cls.budget:
+                break
+            if cls.refCounts[key] > 0:
+                continue
+            total -= texture.byteSize
+            del cls.textures[key]
+            del cls.refCounts[key]
+            del cls.keys[id(texture)]
+            MemoryBudget.forget(texture)
+            texture.delete()
+            evicted += 1
+        cls.evictions += evicted
+        return evicted
+
+    @classmethod
+    def contextChanged(cls):
+        """
+        Empty the cache without deleting anything, call it whenever a GL context is made. Cached textures of a context
+        freed before have names which may be given again to textures of this one.
+        """
+        for texture in cls.textures.values():
+            MemoryBudget.forget(texture)
+            texture.abandon()
+        cls.textures.clear()
+        cls.refCounts.clear()
+        cls.keys.clear()
+
+    @classmethod
+    def stats(cls):
+        """
+        :return: number of textures cached, total references held on them and their estimated bytes
+        :rtype: tuple(int, int, int)
+        """
+        return (len(cls.textures), sum(cls.refCounts.values()),
+                sum(texture.byteSize for texture in cls.textures.values()))
+
+    @classmethod
+    def report(cls):
+        """
+        One line per cached texture with its size and references, then the hit, miss and eviction counts
+
+        :rtype: str
+        """
+        lines = [f"{os.path.basename(key[0])}{' (packed)' if key[3] else ''}: "
+                 f"{texture.byteSize / 2 ** 20:.2f} MB, refs {cls.refCounts[key]}"
+                 for key, texture in cls.textures.items()]
+        textureNum, _, byteSize = cls.stats()
+        lines.append(f"texture cache: {textureNum} textures, {byteSize / 2 ** 20:.2f} of {cls.budget / 2 ** 20:.0f} "
+                     f"MB, {cls.hits} hits, {cls.misses} misses, {cls.evictions} evictions")
+        return "\n".join(lines)
@@ -0,0 +1,297 @@
+"""
+Define a cache of decoded textures on disk here. The first load of an image file decodes it, reduces it into mip levels
+and stores them, compressed to BC1 when the driver supports it, in a file under TextureDiskCache.cacheDir. Later
+loads, also in later runs, memory-map that file and upload the levels from it without decoding anything.
+Levels are stored bottom row first as OpenGL expects, so they are uploaded as they are.
+
+:author: agent
+:version: 2026.10.18
+"""
+
+import hashlib
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+
+try:
+    import OpenGL
+
+    try:
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+    except ImportError:
+        from ctypes import util
+
+        orig_util_find_library = util.find_library
+
+        def new_util_find_library(name):
+            res = orig_util_find_library(name)
+            if res:
+                return res
+            return '/System/Library/Frameworks/' + name + '.framework/' + name
+
+        util.find_library = new_util_find_library
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+except ImportError:
+    raise ImportError("Required dependency PyOpenGL not present")
+
+# from GL_EXT_texture_compression_s3tc
+GL_COMPRESSED_RGB_S3TC_DXT1_EXT = 0x83F0
+
+
+class TextureDiskCache:
+    """
+    Stored mip chains of image files. All methods are class level, load runs in TextureStreamer decoding threads.
+    """
+    RAW = 0  # (height, width, 3) uint8 RGB levels
+    BC1 = 1  # (ceil(height / 4), ceil(width / 4), 8) uint8 levels of BC1 blocks, 8 times smaller on GPU than RGB
+
+    cacheDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".textureCache")
+    compress = True  # store new textures as BC1 when the driver supports it
+    version = 1  # stored in every file, files of other versions are made again
+    headerSize = 32  # bytes before the first level: magic, version, format, width, height and level count
+
+    supportedFormats = None  # formats the driver can sample, checked on first use
+
+    @classmethod
+    def preferredFormat(cls):
+        """
+        Format of new textures, needs the GL context current
+
+        :rtype: int
+        """
+        if cls.supportedFormats is None:
+            extensions = {gl.glGetStringi(gl.GL_EXTENSIONS, i).decode()
+                          for i in range(gl.glGetIntegerv(gl.GL_NUM_EXTENSIONS))}
+            cls.supportedFormats = {cls.RAW}
+            if "GL_EXT_texture_compression_s3tc" in extensions:
+                cls.supportedFormats.add(cls.BC1)
+        return cls.BC1 if cls.compress and cls.BC1 in cls.supportedFormats else cls.RAW
+
+    @staticmethod
+    def internalFormat(textureFormat):
+        """
+        :return: GL internal format of textures stored in textureFormat
+        :rtype: int
+        """
+        return GL_COMPRESSED_RGB_S3TC_DXT1_EXT if textureFormat == TextureDiskCache.BC1 else gl.GL_RGB
+
+    @staticmethod
+    def levelShape(textureFormat, width, height, level):
+        """
+        :return: array shape of a mip level of a width x height image
+        :rtype: tuple
+        """
+        width = max(width >> level, 1)
+        height = max(height >> level, 1)
+        if textureFormat == TextureDiskCache.BC1:
+            return (height + 3) // 4, (width + 3) // 4, 8
+        return height, width, 3
+
+    @classmethod
+    def pathOf(cls, imgFilePath, textureFormat):
+        """
+        The file is identified by its path, modification time and size, so an edited file is stored again
+
+        :rtype: str
+        """
+        path = os.path.realpath(imgFilePath)
+        stat = os.stat(path)
+        digest = hashlib.sha1(f"{path}|{stat.st_mtime_ns}|{stat.st_size}".encode()).hexdigest()
+        return os.path.join(cls.cacheDir, f"{digest}.{'bc1' if textureFormat == cls.BC1 else 'rgb'}.tex")
+
+    @classmethod
+    def load(cls, imgFilePath, textureFormat, levelNum=None):
+        """
+        Get the mip levels of an image file, from its stored file if there is one, otherwise decoded and stored
+
+        :param levelNum: most levels to return, None for all down to 1x1
+        :return: levels finest first and bottom row first, memory-mapped from the stored file when it could be
+                 written, then the width and height of the finest level in texels
+        :rtype: tuple(list<numpy.ndarray>, int, int)
+        """
+        cachePath = cls.pathOf(imgFilePath, textureFormat)
+        stored = cls.read(cachePath, textureFormat)
+        if stored is None:
+            with Image.open(imgFilePath) as img:
+                image = np.asarray(img.convert("RGB"), dtype=np.uint8)
+            levels = [np.ascontiguousarray(level[::-1]) for level in cls.mipChain(image)]
+            if textureFormat == cls.BC1:
+                levels = [cls.encodeBC1(level) for level in levels]
+            stored = levels, image.shape[1], image.shape[0]
+            try:
+                cls.write(cachePath, textureFormat, image.shape[1], image.shape[0], levels)
+                stored = cls.read(cachePath, textureFormat)
+            except OSError as e:
+                print(f"Warning: texture cache not written: {e}")
+        levels, width, height = stored
+        return levels[0:levelNum], width, height
+
+    @classmethod
+    def read(cls, cachePath, textureFormat):
+        """
+        :return: memory-mapped levels of a stored file with the width and height of the finest, None if the file is
+                 missing or not readable
+        :rtype: tuple(list<numpy.ndarray>, int, int)
+        """
+        try:
+            mapped = np.memmap(cachePath, dtype=np.uint8, mode="r")
+        except (OSError, ValueError):
+            return None
+        if mapped.shape[0] < cls.headerSize:
+            return None
+        magic, version, storedFormat, width, height, levelNum = mapped[0:24].view("<u4")
+        if magic != 0x43584554 or version != cls.version or storedFormat != textureFormat:
+            return None
+        levels = []
+        offset = cls.headerSize
+        for level in range(levelNum):
+            shape = cls.levelShape(textureFormat, int(width), int(height), level)
+            size = shape[0] * shape[1] * shape[2]
+            if offset + size > mapped.shape[0]:
+                return None
+            levels.append(mapped[offset:offset + size].reshape(shape))
+            offset += size
+        return levels, int(width), int(height)
+
+    @classmethod
+    def write(cls, cachePath, textureFormat, width, height, levels):
+        os.makedirs(cls.cacheDir, exist_ok=True)
+        header = np.zeros(cls.headerSize // 4, dtype="<u4")
+        header[0:6] = (0x43584554, cls.version, textureFormat, width, height, len(levels))  # magic is b"TEXC"
+        # written aside and renamed, so other threads and runs never read a partial file
+        partPath = f"{cachePath}.{os.getpid()}.{threading.get_ident()}.part"
+        with open(partPath, "wb") as f:
+            f.write(header.tobytes())
+            for level in levels:
+                f.write(level.tobytes())
+        os.replace(partPath, cachePath)
+
+    @staticmethod
+    def mipChain(image):
+        """
+        Reduce an image into mip levels with a 2x2 box filter
+
+        :param image: (height, width, 3) uint8 array
+        :return: mip levels, finest first, down to 1x1
+        :rtype: list<numpy.ndarray>
+        """
+        levels = [image]
+        while image.shape[0] > 1 or image.shape[1] > 1:
+            image = TextureDiskCache.halve(image)
+            levels.append(image)
+        return levels
+
+    @staticmethod
+    def halve(image):
+        """
+        One 2x2 box filter step, a last odd row or column is dropped and sides of 1 texel are kept
+
+        :param image: (height, width, 3) uint8 array, or a band of an even number of its rows
+        :rtype: numpy.ndarray
+        """
+        image = image.astype(np.uint16)
+        if image.shape[0] > 1:
+            half = image.shape[0] // 2
+            image = image[0:2 * half:2] + image[1:2 * half:2]
+        else:
+            image = image * 2
+        if image.shape[1] > 1:
+            half = image.shape[1] // 2
+            image = image[:, 0:2 * half:2] + image[:, 1:2 * half:2]
+        else:
+            image = image * 2
+        return ((image + 2) // 4).astype(np.uint8)
+
+    @staticmethod
+    def encodeBC1(image):
+        """
+        Compress an image to BC1 blocks of 4x4 texels. The endpoints of each block start as its two texels farthest
+        apart along the principal axis of its colors, then are refit by least squares to the palette entries the
+        texels selected. Every texel takes the closest of the 4 interpolated colors.
+
+        :param image: (height, width, 3) uint8 array, the first row goes to the first row of blocks
+        :return: (ceil(height / 4), ceil(width / 4), 8) uint8 array of blocks
+        :rtype: numpy.ndarray
+        """
+        height, width, _ = image.shape
+        blockRows, blockColumns = (height + 3) // 4, (width + 3) // 4
+        padded = np.pad(image, ((0, blockRows * 4 - height), (0, blockColumns * 4 - width), (0, 0)), mode="edge")
+        texels = padded.reshape(blockRows, 4, blockColumns, 4, 3).transpose(0, 2, 1, 3, 4).reshape(-1, 16, 3)
+        result = np.empty(texels.shape[0], dtype=[("color0", "<u2"), ("color1", "<u2"), ("indices", "<u4")])
+        # in chunks, the texel to palette distances of a whole large image would take hundreds of MB
+        chunk = 1 << 14
+        for start in range(0, texels.shape[0], chunk):
+            TextureDiskCache.encodeBC1Blocks(texels[start:start + chunk].astype(np.float32),
+                                             result[start:start + chunk])
+        return result.view(np.uint8).reshape(blockRows, blockColumns, 8)
+
+    @staticmethod
+    def encodeBC1Blocks(texels, result):
+        """
+        :param texels: (N, 16, 3) float32 texels of N blocks, row by row
+        :param result: N records of color0, color1 and indices to fill
+        """
+        # principal axis of the colors of each block, by power iteration from its bounding box diagonal
+        centered = texels - texels.mean(axis=1, keepdims=True)
+        covariance = np.einsum("nki,nkj->nij", centered, centered)
+        axis = texels.max(axis=1) - texels.min(axis=1)
+        for _ in range(4):
+            axis = np.einsum("nij,nj->ni", covariance, axis)
+            axis /= np.maximum(np.abs(axis).max(axis=1, keepdims=True), 1e-6)
+        projection = np.einsum("nkc,nc->nk", centered, axis)
+        blocks = np.arange(texels.shape[0])
+        ends = np.stack([texels[blocks, projection.argmax(axis=1)], texels[blocks, projection.argmin(axis=1)]], axis=1)
+
+        packed, selectors = TextureDiskCache.selectBC1(texels, ends)
+        # refit the endpoints to the selected palette entries by least squares, then select again
+        weights = np.array([1, 0, 2 / 3, 1 / 3], dtype=np.float32)[selectors]
+        a = (weights * weights).sum(axis=1)
+        b = (weights * (1 - weights)).sum(axis=1)
+        c = ((1 - weights) * (1 - weights)).sum(axis=1)
+        determinant = a * c - b * b
+        solvable = np.abs(determinant) > 1e-6
+        wx = np.einsum("nk,nkc->nc", weights, texels)
+        vx = np.einsum("nk,nkc->nc", 1 - weights, texels)
+        determinant = np.where(solvable, determinant, 1)[:, None]
+        fitted = np.stack([(c[:, None] * wx - b[:, None] * vx) / determinant,
+                           (a[:, None] * vx - b[:, None] * wx) / determinant], axis=1)
+        ends = np.where(solvable[:, None, None], np.clip(fitted, 0, 255), ends)
+        packed, selectors = TextureDiskCache.selectBC1(texels, ends)
+
+        result["color0"] = packed[:, 0]
+        result["color1"] = packed[:, 1]
+        result["indices"] = (selectors << (2 * np.arange(16, dtype=np.uint32))).sum(axis=1, dtype=np.uint32)
+
+    @staticmethod
+    def selectBC1(texels, ends):
+        """
+        Quantize the endpoints of blocks to 5-6-5 colors and pick the closest palette entry for each texel
+
+        :param texels: (N, 16, 3) float32 texels
+        :param ends: (N, 2, 3) endpoint colors
+        :return: (N, 2) packed endpoints with color0 > color1 when they differ, and (N, 16) selectors
+        :rtype: tuple(numpy.ndarray, numpy.ndarray)
+        """
+        bits = np.array([31, 63, 31], dtype=np.float32)
+        quantized = np.rint(ends * bits / 255).astype(np.uint16)
+        packed = quantized[..., 0] << 11 | quantized[..., 1] << 5 | quantized[..., 2]
+        # the 4 color mode needs color0 > color1
+        swap = packed[:, 0] < packed[:, 1]
+        packed[swap] = packed[swap][:, ::-1]
+        quantized[swap] = quantized[swap][:, ::-1]
+        expanded = np.empty(quantized.shape, dtype=np.float32)
+        expanded[..., 0] = quantized[..., 0] << 3 | quantized[..., 0] >> 2
+        expanded[..., 1] = quantized[..., 1] << 2 | quantized[..., 1] >> 4
+        expanded[..., 2] = quantized[..., 2] << 3 | quantized[..., 2] >> 2
+        color0, color1 = expanded[:, 0], expanded[:, 1]
+        palette = np.stack([color0, color1, (2 * color0 + color1) / 3, (color0 + 2 * color1) / 3], axis=1)
+
+        distance = ((texels[:, :, None, :] - palette[:, None, :, :]) ** 2).sum(axis=3)
+        selectors = distance.argmin(axis=2).astype(np.uint32)
+        # equal endpoints mean the 3 color mode, where only selector 0 is the endpoint color
+        selectors[packed[:, 0] == packed[:, 1]] = 0
+        return packed, selectors
@@ -0,0 +1,275 @@
+"""
+Define texture streaming here. Image files are decoded and reduced into mip levels in a thread pool, or read from
+TextureDiskCache when they were before, then uploaded through a pixel buffer object a few rows at a time, within a
+byte budget per frame, so loading a large texture never freezes the window. Levels are uploaded coarsest first and
+every finished level is shown at once, until then the texture shows the placeholder. Packed textures only keep the
+finest level, in a layer of a shared TextureArray. Fine levels dropped by MemoryBudget are streamed again the same
+way, into the texture as it is.
+
+:author: agent
+:version: 2026.10.18
+"""
+
+import ctypes
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from GLBuffer import UploadStats
+from MemoryBudget import MemoryBudget
+from ResourceManager import ResourceManager
+from TextureDiskCache import TextureDiskCache
+
+try:
+    import OpenGL
+
+    try:
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+    except ImportError:
+        from ctypes import util
+
+        orig_util_find_library = util.find_library
+
+        def new_util_find_library(name):
+            res = orig_util_find_library(name)
+            if res:
+                return res
+            return '/System/Library/Frameworks/' + name + '.framework/' + name
+
+        util.find_library = new_util_find_library
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+except ImportError:
+    raise ImportError("Required dependency PyOpenGL not present")
+
+
+class TextureUpload:
+    """
+    Upload of one decoded image into a Texture, level by level from the coarsest, in bands of rows
+    """
+    texture = None
+    textureFormat = TextureDiskCache.RAW
+    levels = None  # list<numpy.ndarray> of levels from TextureDiskCache, finest first, bottom row first
+    width = 0  # of the finest level
+    height = 0
+    level = 0  # level being uploaded
+    row = 0  # rows of that level uploaded so far, of texels or of BC1 blocks
+    pixelBufferResource = None  # reference held on the pixel buffer of TextureStreamer until the upload is dropped
+
+    def __init__(self, texture, textureFormat, levels, width, height):
+        self.texture = texture
+        self.textureFormat = textureFormat
+        self.levels = levels
+        self.width = width
+        self.height = height
+        self.level = len(levels) - 1
+        self.row = 0
+
+    @property
+    def done(self):
+        return self.level < 0
+
+    def step(self, budget):
+        """
+        Upload the next rows of the current level, at most budget bytes but at least one row.
+        The texture and the pixel unpack buffer must be bound.
+
+        :return: bytes uploaded
+        :rtype: int
+        """
+        image = self.levels[self.level]
+        rowNum = image.shape[0]
+        rowBytes = image.shape[1] * image.shape[2]
+        rows = max(1, min(rowNum - self.row, budget // rowBytes))
+
+        band = image[self.row:self.row + rows]
+        TextureStreamer.writePixelBuffer(band)
+        width = max(self.width >> self.level, 1)
+        if self.textureFormat == TextureDiskCache.BC1:
+            # rows of 4x4 blocks, the last one may reach past the top of the level
+            height = max(self.height >> self.level, 1)
+            self.texture.writeRows(self.level, self.row * 4, width, min(rows * 4, height - self.row * 4),
+                                   ctypes.c_void_p(0), byteLength=band.nbytes)
+        else:
+            self.texture.writeRows(self.level, self.row, width, rows, ctypes.c_void_p(0))
+        self.row += rows
+
+        if self.row == rowNum:
+            # the finished level is complete, sample from it
+            self.texture.showLevel(self.level)
+            self.level -= 1
+            self.row = 0
+        return rows * rowBytes
+
+
+class TextureStreamer:
+    """
+    Queue of textures to load. All methods are class level, so there is one queue for the whole program.
+    Call TextureStreamer.update() once per frame, with the GL context current.
+    """
+    frameBudget = 4 << 20  # most bytes uploaded per frame
+    workers = 2  # decoding threads
+
+    executor = None  # ThreadPoolExecutor, made on first use
+    decoding = []  # list<(Texture, Future)> of images being decoded
+    uploads = []  # list<TextureUpload> waiting for upload, in request order
+
+    pixelBuffer = None  # pixel unpack buffer every band goes through, while uploads are queued
+    pixelBufferResource = None  # with one reference per queued upload
+
+    @classmethod
+    def load(cls, texture, imgFilePath, refine=False):
+        """
+        Start loading an image file into texture. The texture shows the placeholder until its first level is
+        uploaded. Loading it again before it is done drops the older load. Textures of their own, not packed, can be
+        evicted or reduced by MemoryBudget and are loaded again the same way.
+
+        :param refine: only load the levels texture.reduce dropped, the texture keeps showing the coarser ones
+        """
+        if not texture.packed and texture.reload is None:
+            texture.reload = functools.partial(cls.load, texture, imgFilePath)
+            MemoryBudget.register(texture)
+        if cls.executor is None:
+            cls.executor = ThreadPoolExecutor(max_workers=cls.workers, thread_name_prefix="TextureDecode")
+        if refine:
+            # the dropped levels are the finest ones, the upload starts at the coarsest of them
+            levelNum = texture.droppedLevels
+            textureFormat = TextureDiskCache.RAW if texture.internalFormat == gl.GL_RGB else TextureDiskCache.BC1
+            texture.allocateDroppedLevels()
+        else:
+            texture.delete()
+            levelNum = 1 if texture.packed else None
+            # texture arrays are not compressed
+            textureFormat = TextureDiskCache.RAW if texture.packed else TextureDiskCache.preferredFormat()
+        future = cls.executor.submit(cls.decode, imgFilePath, textureFormat, levelNum)
+        texture.streamJob = future
+        cls.decoding.append((texture, future))
+
+    @staticmethod
+    def decode(imgFilePath, textureFormat, levelNum=None):
+        """
+        Get the mip levels of an image file from TextureDiskCache, runs in a worker thread
+
+        :param levelNum: most levels to get, None for all down to 1x1
+        :return: texture format, levels finest first, and the size of the finest level in texels
+        :rtype: tuple(int, list<numpy.ndarray>, int, int)
+        """
+        levels, width, height = TextureDiskCache.load(imgFilePath, textureFormat, levelNum)
+        return textureFormat, levels, width, height
+
+    @classmethod
+    def writePixelBuffer(cls, band):
+        """
+        Fill the pixel unpack buffer with band, bottom row first as textures store it. It must be bound.
+        """
+        byteLength = band.nbytes
+        # orphan, so the driver does not wait for the transfer of the previous band
+        gl.glBufferData(gl.GL_PIXEL_UNPACK_BUFFER, byteLength, None, gl.GL_STREAM_DRAW)
+        address = gl.glMapBufferRange(gl.GL_PIXEL_UNPACK_BUFFER, 0, byteLength,
+                                      gl.GL_MAP_WRITE_BIT | gl.GL_MAP_INVALIDATE_BUFFER_BIT)
+        mapped = (ctypes.c_ubyte * byteLength).from_address(ctypes.cast(address, ctypes.c_void_p).value)
+        # the one copy, from the memory-mapped cache file into the mapped buffer
+        np.copyto(np.frombuffer(mapped, dtype=np.uint8).reshape(band.shape), band)
+        gl.glUnmapBuffer(gl.GL_PIXEL_UNPACK_BUFFER)
+        UploadStats.record(byteLength, 0)
+
+    @classmethod
+    def retainPixelBuffer(cls):
+        """
+        Take a reference to the pixel buffer for a new upload, made if no upload holds one
+
+        :return: the pixel buffer record, to release when the upload is dropped
+        :rtype: Resource
+        """
+        if cls.pixelBuffer is None or cls.pixelBufferResource.refCount == 0:
+            with ResourceManager.ownedBy(None), ResourceManager.categorized("streaming"):
+                pixelBuffer = gl.glGenBuffers(1)
+                cls.pixelBuffer = pixelBuffer
+                cls.pixelBufferResource = ResourceManager.track("buffer", pixelBuffer,
+                                                                lambda: gl.glDeleteBuffers(1, [pixelBuffer]))
+        else:
+            ResourceManager.retain(cls.pixelBufferResource)
+        return cls.pixelBufferResource
+
+    @classmethod
+    def dropUpload(cls, upload):
+        """
+        Take the first upload off the queue and its reference off the pixel buffer, deleted with the last one
+        """
+        cls.uploads.pop(0)
+        if upload.pixelBufferResource.refCount > 0:
+            ResourceManager.release(upload.pixelBufferResource)
+        if upload.pixelBufferResource.refCount == 0 and upload.pixelBufferResource is cls.pixelBufferResource:
+            cls.pixelBuffer = None
+
+    @classmethod
+    def bindPixelBuffer(cls):
+        # none while only uploads dropped by ResourceManager.releaseAll are queued
+        gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, cls.pixelBuffer if cls.pixelBufferResource.refCount > 0 else 0)
+
+    @classmethod
+    def update(cls):
+        """
+        Queue the images decoded since the last frame, and upload queued levels up to frameBudget bytes
+
+        :return: bytes uploaded
+        :rtype: int
+        """
+        stillDecoding = []
+        for texture, future in cls.decoding:
+            if not future.done():
+                stillDecoding.append((texture, future))
+            elif texture.streamJob is future:
+                try:
+                    upload = TextureUpload(texture, *future.result())
+                except Exception as e:
+                    print(f"Error loading texture: {e}")
+                    texture.streamJob = None
+                    continue
+                upload.pixelBufferResource = cls.retainPixelBuffer()
+                texture.streamJob = upload
+                cls.uploads.append(upload)
+        cls.decoding = stillDecoding
+
+        spent = 0
+        if not cls.uploads:
+            return spent
+        cls.bindPixelBuffer()
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
+        while cls.uploads and spent < cls.frameBudget:
+            upload = cls.uploads[0]
+            texture = upload.texture
+            # dropped when the texture was deleted or loaded again
+            if texture.streamJob is not upload:
+                cls.dropUpload(upload)
+                continue
+            if texture.resource is None:
+                # with an unpack buffer bound, allocate would read its empty levels from it
+                gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, 0)
+                if texture.packed:
+                    texture.allocateLayer(upload.width, upload.height)
+                else:
+                    texture.allocate(upload.width, upload.height, len(upload.levels),
+                                     TextureDiskCache.internalFormat(upload.textureFormat))
+                texture.streamJob = upload
+                gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, cls.pixelBuffer)
+            gl.glBindTexture(texture.target, texture.textureName)
+            spent += upload.step(cls.frameBudget - spent)
+            if upload.done:
+                texture.streamJob = None
+                cls.dropUpload(upload)
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 4)
+        gl.glBindBuffer(gl.GL_PIXEL_UNPACK_BUFFER, 0)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+        gl.glBindTexture(gl.GL_TEXTURE_2D_ARRAY, 0)
+        return spent
+
+    @classmethod
+    def pending(cls):
+        """
+        :return: number of textures still decoding or uploading
+        :rtype: int
+        """
+        return len(cls.decoding) + len(cls.uploads)
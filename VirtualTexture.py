@@ -0,0 +1,584 @@
+"""
+Define virtual texturing here, for images too large for one texture or for GPU memory, like 16K to 32K planet
+imagery. The image and its mip levels are cut into pages stored in a memory-mapped page file. A low resolution
+feedback pass records which pages are on screen, they are read in a thread pool and copied into a page cache shared
+by all virtual textures, in place of the pages seen longest ago. An indirection texture per virtual texture maps every
+page to its slot in the page cache, or to the closest coarser page loaded, and GLProgram samples through it.
+
+:author: agent
+:version: 2026.10.18
+"""
+
+import hashlib
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from GLBuffer import Texture, TextureUnits, UploadStats
+from ResourceManager import ResourceManager
+from TextureDiskCache import TextureDiskCache
+
+try:
+    import OpenGL
+
+    try:
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+    except ImportError:
+        from ctypes import util
+
+        orig_util_find_library = util.find_library
+
+        def new_util_find_library(name):
+            res = orig_util_find_library(name)
+            if res:
+                return res
+            return '/System/Library/Frameworks/' + name + '.framework/' + name
+
+        util.find_library = new_util_find_library
+        import OpenGL.GL as gl
+        import OpenGL.GLU as glu
+except ImportError:
+    raise ImportError("Required dependency PyOpenGL not present")
+
+
+class PageFile:
+    """
+    Pages of every mip level of an image. Each page is one contiguous tile with a border of 1 texel copied from its
+    neighbors, so filtering across page edges in the page cache is seamless. Rows are bottom first, as OpenGL expects.
+    """
+    magic = 0x45474150  # b"PAGE"
+    version = 1
+    headerSize = 32  # bytes before the first tile: magic, version, width, height, page size and level count
+    border = 1
+
+    width = 0
+    height = 0
+    pageSize = 0
+    levelNum = 0
+    levelPages = None  # list<(int, int)> pages across and up of each level
+    levelFirstTile = None  # list<int> index of the first tile of each level
+    tiles = None  # (tileNum, tileSize, tileSize, 3) uint8 memmap
+
+    def __init__(self, path):
+        """
+        Open a page file, raises ValueError if it is not one of this version
+        """
+        mapped = np.memmap(path, dtype=np.uint8, mode="r")
+        if mapped.shape[0] < self.headerSize:
+            raise ValueError(f"{path} is not a page file")
+        magic, version, self.width, self.height, self.pageSize, self.levelNum = \
+            (int(v) for v in mapped[0:24].view("<u4"))
+        if magic != self.magic or version != self.version:
+            raise ValueError(f"{path} is not a page file of version {self.version}")
+        self.levelPages = [self.pagesOf(self.width, self.height, self.pageSize, level)
+                           for level in range(self.levelNum)]
+        counts = [across * up for across, up in self.levelPages]
+        self.levelFirstTile = [sum(counts[0:level]) for level in range(self.levelNum)]
+        tileSize = self.pageSize + 2 * self.border
+        if mapped.shape[0] != self.headerSize + sum(counts) * tileSize * tileSize * 3:
+            raise ValueError(f"{path} is truncated")
+        self.tiles = mapped[self.headerSize:].reshape(sum(counts), tileSize, tileSize, 3)
+
+    @staticmethod
+    def levelSize(width, height, level):
+        """
+        :return: width and height of a mip level, as made by TextureDiskCache.halve
+        :rtype: tuple(int, int)
+        """
+        return max(width >> level, 1), max(height >> level, 1)
+
+    @staticmethod
+    def pagesOf(width, height, pageSize, level):
+        """
+        :return: pages across and up of a mip level
+        :rtype: tuple(int, int)
+        """
+        levelWidth, levelHeight = PageFile.levelSize(width, height, level)
+        return (levelWidth + pageSize - 1) // pageSize, (levelHeight + pageSize - 1) // pageSize
+
+    @staticmethod
+    def levelCount(width, height, pageSize):
+        """
+        :return: number of levels, down to the first one fitting in one page
+        :rtype: int
+        """
+        levelNum = 1
+        while max(PageFile.levelSize(width, height, levelNum - 1)) > pageSize:
+            levelNum += 1
+        return levelNum
+
+    def tile(self, level, x, y):
+        """
+        :return: (tileSize, tileSize, 3) memory-mapped tile of page x, y of a level, counted from the bottom left
+        :rtype: numpy.ndarray
+        """
+        return self.tiles[self.levelFirstTile[level] + y * self.levelPages[level][0] + x]
+
+    @classmethod
+    def build(cls, source, path, pageSize):
+        """
+        Cut an image and its mip levels into a page file. Levels are made band by band in temporary files, so sources
+        larger than memory can be given as np.memmap.
+
+        :param source: (height, width, 3) uint8 array, top row first
+        """
+        height, width = source.shape[0:2]
+        levelNum = cls.levelCount(width, height, pageSize)
+        header = np.zeros(cls.headerSize // 4, dtype="<u4")
+        header[0:6] = (cls.magic, cls.version, width, height, pageSize, levelNum)
+
+        # written aside and renamed, so other threads and runs never read a partial file
+        partPath = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        levelPaths = []
+        try:
+            with open(partPath, "wb") as f:
+                f.write(header.tobytes())
+                level = source[::-1]
+                for levelIndex in range(levelNum):
+                    if levelIndex > 0:
+                        levelPaths.append(f"{partPath}.{levelIndex}")
+                        level = cls.halveInto(level, levelPaths[-1])
+                    cls.writeTiles(f, level, pageSize)
+            del level
+            os.replace(partPath, path)
+        finally:
+            for levelPath in levelPaths + [partPath]:
+                if os.path.exists(levelPath):
+                    os.remove(levelPath)
+
+    @staticmethod
+    def halveInto(image, path):
+        """
+        Reduce an image with TextureDiskCache.halve, band by band into a memory-mapped file
+
+        :rtype: numpy.memmap
+        """
+        height, width = image.shape[0:2]
+        result = np.memmap(path, dtype=np.uint8, mode="w+", shape=(max(height // 2, 1), max(width // 2, 1), 3))
+        band = max(1, (32 << 20) // (width * 6))  # result rows per band, from 64 MB of source rows at most
+        for row in range(0, result.shape[0], band):
+            if height > 1:
+                source = image[2 * row:2 * (row + band)]
+            else:
+                source = image[0:1]
+            result[row:row + band] = TextureDiskCache.halve(source)
+        result.flush()
+        return result
+
+    @classmethod
+    def writeTiles(cls, f, image, pageSize):
+        """
+        Append the tiles of every page of an image to f, row of pages by row of pages from the bottom
+        """
+        height, width = image.shape[0:2]
+        across, up = cls.pagesOf(width, height, pageSize, 0)
+        span = np.arange(-cls.border, pageSize + cls.border)
+        for y in range(up):
+            # texels past the image edges repeat the last ones
+            band = image[np.clip(y * pageSize + span, 0, height - 1)]
+            for x in range(across):
+                f.write(np.ascontiguousarray(band[:, np.clip(x * pageSize + span, 0, width - 1)]).tobytes())
+
+
+class VirtualTexture:
+    """
+    An image sampled through the page cache, bind it on a Component with Component.setVirtualTexture.
+    The page cache is class level and shared by every virtual texture. With the GL context current, call
+    VirtualTexture.update() once per frame and VirtualTexture.renderFeedback after drawing.
+    """
+    pageSize = 128  # texels per page side, the same for every virtual texture so they share the page cache
+    cacheSlots = 16  # pages per side of the page cache
+    pagesPerFrame = 8  # most pages copied into the page cache per frame
+    feedbackScale = 8  # the feedback pass renders at 1 / feedbackScale of the window size
+    feedbackInterval = 4  # frames between feedback passes
+    maxTextures = 255  # ids of virtual textures fit in 8 bits of the feedback
+
+    textures = {}  # id -> VirtualTexture alive
+    executor = None  # ThreadPoolExecutor opening page files and reading pages, made on first use
+    workers = 2
+    frame = 0
+    feedbackFrame = 0  # frame of the last feedback pass
+
+    cacheTexture = 0  # GL name of the page cache
+    cacheResource = None
+    slotOwners = []  # slot -> (VirtualTexture, page) in it, or None
+    slotLastUse = None  # slot -> frame its page was last seen, -1 for the pinned coarsest pages
+    loading = []  # list<(VirtualTexture, page, Future)> of pages being read
+
+    feedbackFramebuffer = 0
+    feedbackSize = (0, 0)
+    feedbackResource = None
+
+    textureId = 0  # feedback id of this virtual texture
+    imgFilePath = None
+    pageFile = None  # PageFile, once opened
+    buildJob = None  # Future of the page file being opened or built
+    ready = False
+    resident = None  # dict of page (level, x, y) -> slot of the pages in the page cache
+    requested = None  # set of pages being read
+    indirection = None  # (levelNum, pages up, pages across, 4) uint8 slot x, slot y and level of the page to sample
+    indirectionName = 0
+    dirty = False  # indirection changed since its upload
+    owner = None  # ResourceManager owner tag at creation
+    resource = None  # tracking record in ResourceManager
+
+    def __init__(self, imgFilePath):
+        """
+        Start opening the page file of an image, building it on the first use of that image. The texture samples the
+        placeholder until the page file is open.
+
+        :param imgFilePath: image file PIL can open, or a .npy file of a (height, width, 3) uint8 array, which is
+                            memory-mapped so it can be larger than memory
+        """
+        freeIds = set(range(1, self.maxTextures + 1)) - set(VirtualTexture.textures)
+        if not freeIds:
+            raise ValueError(f"At most {self.maxTextures} virtual textures can be alive")
+        self.textureId = min(freeIds)
+        VirtualTexture.textures[self.textureId] = self
+        self.imgFilePath = imgFilePath
+        self.resident = {}
+        self.requested = set()
+        self.owner = ResourceManager.owner
+        # tracked at once, so a scene released before the page file is open still deletes it
+        with ResourceManager.categorized("virtualTexture"):
+            self.resource = ResourceManager.track("texture", 0, self.delete)
+        if VirtualTexture.executor is None:
+            VirtualTexture.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="VirtualTexture")
+        self.buildJob = VirtualTexture.executor.submit(self.openPageFile, imgFilePath, self.pageSize)
+
+    @staticmethod
+    def openPageFile(imgFilePath, pageSize):
+        """
+        Open the stored page file of an image, or build it first. Runs in a worker thread.
+
+        :rtype: PageFile
+        """
+        path = os.path.realpath(imgFilePath)
+        stat = os.stat(path)
+        digest = hashlib.sha1(f"{path}|{stat.st_mtime_ns}|{stat.st_size}|{pageSize}".encode()).hexdigest()
+        pagePath = os.path.join(TextureDiskCache.cacheDir, f"{digest}.pages")
+        try:
+            return PageFile(pagePath)
+        except (OSError, ValueError):
+            pass
+
+        if path.endswith(".npy"):
+            source = np.load(path, mmap_mode="r")
+        else:
+            # the decompression bomb check of PIL stops at 179M pixels, this image is wanted that large
+            limit = Image.MAX_IMAGE_PIXELS
+            Image.MAX_IMAGE_PIXELS = None
+            try:
+                with Image.open(path) as img:
+                    source = np.asarray(img.convert("RGB"), dtype=np.uint8)
+            finally:
+                Image.MAX_IMAGE_PIXELS = limit
+        if source.ndim != 3 or source.shape[2] != 3 or source.dtype != np.uint8:
+            raise ValueError(f"Expected a (height, width, 3) uint8 image, got {source.shape} {source.dtype}")
+        os.makedirs(TextureDiskCache.cacheDir, exist_ok=True)
+        PageFile.build(source, pagePath, pageSize)
+        return PageFile(pagePath)
+
+    def finishOpening(self):
+        """
+        Make the indirection texture of the opened page file and load its coarsest page, which stays in the page
+        cache as what every page not loaded yet falls back to
+        """
+        try:
+            self.pageFile = self.buildJob.result()
+        except Exception as e:
+            print(f"Error loading virtual texture {self.imgFilePath}: {e}")
+            self.buildJob = None
+            return
+        self.buildJob = None
+        levelNum = self.pageFile.levelNum
+        across, up = self.pageFile.levelPages[0]
+        self.indirection = np.zeros((levelNum, up, across, 4), dtype=np.uint8)
+
+        self.indirectionName = gl.glGenTextures(1)
+        self.resource.handle = self.indirectionName
+        self.resource.byteSize = self.indirection.nbytes
+        gl.glBindTexture(gl.GL_TEXTURE_2D_ARRAY, self.indirectionName)
+        gl.glTexImage3D(gl.GL_TEXTURE_2D_ARRAY, 0, gl.GL_RGBA8, across, up, levelNum, 0, gl.GL_RGBA,
+                        gl.GL_UNSIGNED_BYTE, None)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D_ARRAY, gl.GL_TEXTURE_MAX_LEVEL, 0)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D_ARRAY, gl.GL_TEXTURE_MIN_FILTER, gl.GL_NEAREST)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D_ARRAY, gl.GL_TEXTURE_MAG_FILTER, gl.GL_NEAREST)
+
+        page = (levelNum - 1, 0, 0)
+        slot = VirtualTexture.freeSlot()
+        if slot is None:
+            print(f"Error loading virtual texture {self.imgFilePath}: the page cache is full of pinned pages")
+            return
+        VirtualTexture.copyPage(slot, self.pageFile.tile(*page))
+        self.place(page, slot)
+        VirtualTexture.slotLastUse[slot] = -1
+        self.ready = True
+
+    @classmethod
+    def makePageCache(cls):
+        tileSize = cls.pageSize + 2 * PageFile.border
+        size = cls.cacheSlots * tileSize
+        with ResourceManager.ownedBy(None), ResourceManager.categorized("virtualTexture"):
+            cacheTexture = gl.glGenTextures(1)
+            cls.cacheTexture = cacheTexture
+            cls.cacheResource = ResourceManager.track("texture", cacheTexture, cls.deletePageCache, size * size * 4)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, cacheTexture)
+        gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_RGB8, size, size, 0, gl.GL_RGB, gl.GL_UNSIGNED_BYTE, None)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAX_LEVEL, 0)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE)
+        cls.slotOwners = [None] * cls.cacheSlots ** 2
+        cls.slotLastUse = np.zeros(cls.cacheSlots ** 2, dtype=np.int64)
+
+    @classmethod
+    def deletePageCache(cls):
+        TextureUnits.release(gl.GL_TEXTURE_2D, cls.cacheTexture)
+        gl.glDeleteTextures([cls.cacheTexture])
+        cls.cacheTexture = 0
+        cls.cacheResource = None
+
+    @classmethod
+    def freeSlot(cls):
+        """
+        Find a page cache slot for a new page, a free one or else the one seen longest ago, not seen in the last
+        feedback pass. Its page is evicted.
+
+        :return: slot, None if every page was seen in the last feedback pass
+        :rtype: int
+        """
+        if cls.cacheResource is None:
+            cls.makePageCache()
+        lastUse = np.where(cls.slotLastUse < 0, np.iinfo(np.int64).max, cls.slotLastUse)
+        slot = int(lastUse.argmin())
+        if cls.slotOwners[slot] is not None:
+            if lastUse[slot] >= cls.feedbackFrame:
+                return None
+            owner, page = cls.slotOwners[slot]
+            owner.evict(page)
+        return slot
+
+    @classmethod
+    def copyPage(cls, slot, tile):
+        tileSize = tile.shape[0]
+        gl.glBindTexture(gl.GL_TEXTURE_2D, cls.cacheTexture)
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
+        gl.glTexSubImage2D(gl.GL_TEXTURE_2D, 0, slot % cls.cacheSlots * tileSize, slot // cls.cacheSlots * tileSize,
+                           tileSize, tileSize, gl.GL_RGB, gl.GL_UNSIGNED_BYTE, np.ascontiguousarray(tile))
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 4)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+        UploadStats.record(tile.nbytes, 0)
+
+    def place(self, page, slot):
+        self.resident[page] = slot
+        VirtualTexture.slotOwners[slot] = (self, page)
+        VirtualTexture.slotLastUse[slot] = VirtualTexture.frame
+        self.dirty = True
+
+    def evict(self, page):
+        slot = self.resident.pop(page)
+        VirtualTexture.slotOwners[slot] = None
+        VirtualTexture.slotLastUse[slot] = 0
+        self.dirty = True
+
+    def uploadIndirection(self):
+        """
+        Point every page at its slot if it is loaded, else at the slot its closest loaded coarser page is in
+        """
+        levelNum = self.pageFile.levelNum
+        byLevel = [[] for _ in range(levelNum)]
+        for page, slot in self.resident.items():
+            byLevel[page[0]].append((page, slot))
+        for level in reversed(range(levelNum)):
+            across, up = self.pageFile.levelPages[level]
+            if level < levelNum - 1:
+                parentAcross, parentUp = self.pageFile.levelPages[level + 1]
+                rows = np.minimum(np.arange(up) // 2, parentUp - 1)
+                columns = np.minimum(np.arange(across) // 2, parentAcross - 1)
+                self.indirection[level, 0:up, 0:across] = self.indirection[level + 1][rows[:, None], columns[None, :]]
+            for (_, x, y), slot in byLevel[level]:
+                self.indirection[level, y, x] = (slot % self.cacheSlots, slot // self.cacheSlots, level, 255)
+
+        across, up = self.pageFile.levelPages[0]
+        gl.glBindTexture(gl.GL_TEXTURE_2D_ARRAY, self.indirectionName)
+        gl.glTexSubImage3D(gl.GL_TEXTURE_2D_ARRAY, 0, 0, 0, 0, across, up, levelNum, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE,
+                           self.indirection)
+        gl.glBindTexture(gl.GL_TEXTURE_2D_ARRAY, 0)
+        self.dirty = False
+
+    def request(self, level, x, y):
+        """
+        Mark a page seen in feedback, and its coarser pages it falls back to. Start reading it if it is not loaded.
+        """
+        if level >= self.pageFile.levelNum:
+            return
+        across, up = self.pageFile.levelPages[level]
+        if x >= across or y >= up:
+            return
+        page = (level, x, y)
+        slot = self.resident.get(page)
+        if slot is not None:
+            if VirtualTexture.slotLastUse[slot] >= 0:
+                VirtualTexture.slotLastUse[slot] = VirtualTexture.frame
+        elif page not in self.requested and len(VirtualTexture.loading) < 4 * self.pagesPerFrame:
+            self.requested.add(page)
+            future = VirtualTexture.executor.submit(lambda: np.array(self.pageFile.tile(*page)))
+            VirtualTexture.loading.append((self, page, future))
+        if level + 1 < self.pageFile.levelNum:
+            parentAcross, parentUp = self.pageFile.levelPages[level + 1]
+            self.request(level + 1, min(x // 2, parentAcross - 1), min(y // 2, parentUp - 1))
+
+    @classmethod
+    def update(cls):
+        """
+        Finish opening page files and copy pages read since the last frame into the page cache, at most
+        pagesPerFrame of them
+        """
+        cls.frame += 1
+        for texture in list(cls.textures.values()):
+            if texture.buildJob is not None and texture.buildJob.done():
+                with ResourceManager.ownedBy(texture.owner):
+                    texture.finishOpening()
+
+        copied = 0
+        stillLoading = []
+        for texture, page, future in cls.loading:
+            if not future.done() or copied >= cls.pagesPerFrame:
+                stillLoading.append((texture, page, future))
+                continue
+            texture.requested.discard(page)
+            # dropped if the texture was deleted, a page not copied is requested again by the next feedback pass
+            if cls.textures.get(texture.textureId) is not texture:
+                continue
+            try:
+                tile = future.result()
+            except Exception as e:
+                print(f"Error reading virtual texture page {page}: {e}")
+                continue
+            slot = cls.freeSlot()
+            if slot is None:
+                continue
+            cls.copyPage(slot, tile)
+            texture.place(page, slot)
+            copied += 1
+        cls.loading = stillLoading
+
+        for texture in cls.textures.values():
+            if texture.ready and texture.dirty:
+                texture.uploadIndirection()
+
+    @classmethod
+    def renderFeedback(cls, shaderProg, drawScene, width, height):
+        """
+        Every feedbackInterval frames, draw the scene again at low resolution with the page of every virtual texture
+        texel seen instead of colors, read it back and request those pages
+
+        :param drawScene: callable with no arguments which draws the scene with shaderProg
+        :param width: window width, the feedback is drawn at 1 / feedbackScale of it
+        """
+        if not any(texture.ready for texture in cls.textures.values()) or cls.frame % cls.feedbackInterval:
+            return
+        size = (max(1, math.ceil(width / cls.feedbackScale)), max(1, math.ceil(height / cls.feedbackScale)))
+        if cls.feedbackResource is None or cls.feedbackSize != size:
+            cls.makeFeedbackFramebuffer(size)
+
+        viewport = gl.glGetIntegerv(gl.GL_VIEWPORT)
+        previousFramebuffer = gl.glGetIntegerv(gl.GL_DRAW_FRAMEBUFFER_BINDING)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, cls.feedbackFramebuffer)
+        gl.glViewport(0, 0, size[0], size[1])
+        gl.glClearBufferfv(gl.GL_COLOR, 0, np.zeros(4, dtype=np.float32))
+        gl.glClear(gl.GL_DEPTH_BUFFER_BIT)
+        shaderProg.setBool("virtualFeedback", True)
+        # texels are feedbackScale times larger on screen, pick the level the full size draw samples
+        shaderProg.setFloat("virtualLodBias", -math.log2(cls.feedbackScale))
+        drawScene()
+        shaderProg.setBool("virtualFeedback", False)
+        shaderProg.setFloat("virtualLodBias", 0)
+        gl.glPixelStorei(gl.GL_PACK_ALIGNMENT, 4)
+        pixels = gl.glReadPixels(0, 0, size[0], size[1], gl.GL_RGBA, gl.GL_UNSIGNED_BYTE)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, int(previousFramebuffer))
+        gl.glViewport(*viewport)
+
+        cls.feedbackFrame = cls.frame
+        codes = np.unique(np.frombuffer(pixels, dtype="<u4"))
+        codes = codes[codes != 0]
+        # red and green are the low bits of the page, blue the level and high bits of the page, alpha the texture id
+        textureIds = codes >> 24
+        levels = codes >> 16 & 15
+        xs = codes & 255 | (codes >> 20 & 3) << 8
+        ys = codes >> 8 & 255 | (codes >> 22 & 3) << 8
+        # coarse pages first, they are what finer pages fall back to
+        for i in np.argsort(-levels, kind="stable"):
+            texture = cls.textures.get(int(textureIds[i]))
+            if texture is not None and texture.ready:
+                texture.request(int(levels[i]), int(xs[i]), int(ys[i]))
+
+    @classmethod
+    def makeFeedbackFramebuffer(cls, size):
+        if cls.feedbackResource is not None:
+            ResourceManager.destroy(cls.feedbackResource)
+        framebuffer = gl.glGenFramebuffers(1)
+        color, depth = gl.glGenRenderbuffers(2)
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, color)
+        gl.glRenderbufferStorage(gl.GL_RENDERBUFFER, gl.GL_RGBA8, size[0], size[1])
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, depth)
+        gl.glRenderbufferStorage(gl.GL_RENDERBUFFER, gl.GL_DEPTH_COMPONENT24, size[0], size[1])
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, 0)
+        previousFramebuffer = gl.glGetIntegerv(gl.GL_DRAW_FRAMEBUFFER_BINDING)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, framebuffer)
+        gl.glFramebufferRenderbuffer(gl.GL_FRAMEBUFFER, gl.GL_COLOR_ATTACHMENT0, gl.GL_RENDERBUFFER, color)
+        gl.glFramebufferRenderbuffer(gl.GL_FRAMEBUFFER, gl.GL_DEPTH_ATTACHMENT, gl.GL_RENDERBUFFER, depth)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, int(previousFramebuffer))
+
+        def deleteFramebuffer():
+            gl.glDeleteFramebuffers(1, [framebuffer])
+            gl.glDeleteRenderbuffers(2, [color, depth])
+            cls.feedbackResource = None
+
+        with ResourceManager.ownedBy(None), ResourceManager.categorized("virtualTexture"):
+            cls.feedbackResource = ResourceManager.track("framebuffer", framebuffer, deleteFramebuffer,
+                                                         size[0] * size[1] * 8)
+        cls.feedbackFramebuffer = framebuffer
+        cls.feedbackSize = size
+
+    def bind(self, shaderProg):
+        """
+        Point the virtual texture samplers of shaderProg at this texture, or sample the placeholder while its page
+        file is not open
+        """
+        if not self.ready:
+            TextureUnits.setSamplers(shaderProg, textureImage=Texture.placeholder())
+            shaderProg.setInt("textureLayer", -1)
+            shaderProg.setInt("virtualTexture", 0)
+            return
+        TextureUnits.setSamplers(shaderProg, virtualPages=self.cacheTexture,
+                                 virtualIndirection=self.indirectionName)
+        shaderProg.setInt("virtualTexture", self.textureId)
+        pageFile = self.pageFile
+        shaderProg.setVec4("virtualInfo", np.array([pageFile.width, pageFile.height, pageFile.pageSize,
+                                                    pageFile.levelNum], dtype=np.float32))
+        shaderProg.setFloat("virtualCacheSize", self.cacheSlots * (pageFile.pageSize + 2 * PageFile.border))
+
+    def delete(self):
+        """
+        Free the indirection texture and the page cache slots of this texture
+        """
+        if VirtualTexture.textures.get(self.textureId) is self:
+            del VirtualTexture.textures[self.textureId]
+        for page in list(self.resident):
+            self.evict(page)
+        if self.indirectionName:
+            TextureUnits.release(gl.GL_TEXTURE_2D_ARRAY, self.indirectionName)
+            gl.glDeleteTextures([self.indirectionName])
+            self.indirectionName = 0
+        ResourceManager.forget(self.resource)
+        self.resource = None
+        self.buildJob = None
+        self.ready = False